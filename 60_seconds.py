@@ -1,10 +1,19 @@
 import tkinter as tk
 from tkinter import filedialog, ttk
-from PIL import Image, ImageTk, ImageEnhance
-import imageio
-import numpy as np
-import cv2
+from PIL import Image, ImageTk
 import threading
+import os
+import hashlib
+
+from preview_engine import PreviewCache, PreviewEngine, show_frame
+from lut import EffectBaker, load_cube
+from memory_budget import format_bytes
+from render_cache import effect_fingerprint, render_key
+from render_engine import Grader, Renderer, Timeline, get_backend
+from render_jobs import RenderJob
+from render_modes import DRAFT, FINAL
+from render_profile import RenderProfiler
+from segments import SegmentedRender
 
 # =========================
 # VIDEO CONFIG (FIXED)
@@ -18,6 +27,9 @@ PREVIEW_SIZE = 420
 BASE_EFFECTS = 50  # 50 core looks
 FRAMES_PER_EFFECT = TOTAL_FRAMES // BASE_EFFECTS
 
+LUT_GRADING = False  # bake generated looks into 3D LUTs (faster, approximate)
+RENDER_WORKERS = os.cpu_count() or 1  # processes used by "Render on all cores"
+
 
 # =========================
 # EXTREME EFFECT GENERATOR
@@ -38,32 +50,104 @@ def generate_effects():
     return effects
 
 
-# =========================
-# EFFECT APPLICATION
-# =========================
-def apply_effect(img, b, c, s, warmth, invert):
-    img = ImageEnhance.Brightness(img).enhance(b)
-    img = ImageEnhance.Contrast(img).enhance(c)
-    img = ImageEnhance.Color(img).enhance(s)
-
-    frame = np.array(img).astype(np.int16)
-
-    frame[:, :, 0] = np.clip(frame[:, :, 0] + warmth, 0, 255)
-    frame[:, :, 2] = np.clip(frame[:, :, 2] - warmth, 0, 255)
+def effect_schedule(luts=()):
+    """
+    The keyframe looks: loaded LUTs cycled over the 50 slots, or the
+    generated formulas when no LUTs are loaded.
+    """
+    if luts:
+        return [luts[i % len(luts)] for i in range(BASE_EFFECTS)]
+    return generate_effects()
 
-    if invert:
-        frame = 255 - frame
 
-    return frame.astype(np.uint8)
-
-
-def blend_frames(a, b, steps):
-    result = []
-    for i in range(steps):
-        alpha = i / steps
-        blended = cv2.addWeighted(a, 1 - alpha, b, alpha, 0)
-        result.append(blended)
-    return result
+# =========================
+# TIMELINE
+# =========================
+def effect_timeline(base_img, effects, baker=None, fps=VIDEO_FPS, backend=None):
+    """
+    One crossfade per look change, then the final look held up to the end
+    of the video. Segment i is the crossfade from look i to look i + 1.
+    """
+    backend = backend or get_backend()
+    total_frames = VIDEO_SECONDS * fps
+    return Timeline(
+        Grader(base_img, backend, baker),
+        effects,
+        total_frames // BASE_EFFECTS,
+        total=total_frames,
+        backend=backend,
+    )
+
+
+def render_fingerprint(base_img, effects, mode=FINAL, backend=None):
+    return render_key(
+        image=hashlib.sha256(base_img.tobytes()).hexdigest(),
+        size=base_img.size,
+        effects=[effect_fingerprint(e) for e in effects],
+        settings=[VIDEO_FPS, TOTAL_FRAMES, FRAMES_PER_EFFECT, LUT_GRADING],
+        mode=mode.fingerprint(),
+        backend=(backend or get_backend()).name,
+    )
+
+
+def render_video(base_img, effects, save_path, progress=None, profiler=None, workers=1, mode=FINAL,
+                 job=None):
+    """
+    Headless render of the full timeline to `save_path`, one checkpointed
+    segment per transition. Re-running after a crash resumes from the
+    segments already on disk. With workers > 1 the transitions are rendered
+    on a process pool (stage timings then only cover the join). `base_img`
+    is at final size; mode=DRAFT scales it and the frame rate down.
+    Cancelling `job` stops the render and discards the segments.
+    """
+    profiler = profiler or RenderProfiler()
+
+    size = mode.size(*base_img.size)
+    if size != base_img.size:
+        with profiler.stage("fit"):
+            base_img = base_img.resize(size)
+    fps = mode.fps(VIDEO_FPS)
+    baker = EffectBaker(base_img) if LUT_GRADING else None
+    backend = get_backend()
+    renderer = Renderer(effect_timeline(base_img, effects, baker, fps, backend))
+
+    parts = SegmentedRender(
+        save_path + ".parts", render_fingerprint(base_img, effects, mode, backend), fps, mode.writer_kwargs(),
+    )
+    if job:
+        job.track(parts.work_dir, resumable=True)
+        renderer.limit_memory(job.budget, workers)
+
+    segments = len(renderer.segment_sizes())
+    if workers > 1:
+        parts.render_parallel(segments, renderer.segment_frames, workers, progress, job)
+    else:
+        parts.render(
+            segments,
+            lambda i: renderer.segment_frames(i, profiler),
+            progress,
+            profiler,
+            job,
+        )
+    parts.join(save_path, profiler)
+    parts.cleanup()
+
+
+def service_render(spec, progress=None, job=None):
+    """
+    Render a render_service job: {"image", "output", "luts", "draft"}.
+    """
+    profiler = RenderProfiler.from_env()
+
+    with profiler.stage("load"):
+        image = Image.open(spec["image"]).convert("RGB")
+        luts = [load_cube(path) for path in spec.get("luts") or []]
+    with profiler.stage("fit"):
+        base_img = image.resize((EXPORT_SIZE, EXPORT_SIZE))
+
+    mode = DRAFT if spec.get("draft") else FINAL
+    render_video(base_img, effect_schedule(luts), spec["output"], progress, profiler, 1, mode, job)
+    profiler.write(spec["output"])
 
 
 # =========================
@@ -73,18 +157,41 @@ class FiftyShadesOneMinute:
     def __init__(self, root):
         self.root = root
         self.root.title("50 Shades – 1 Minute Pro Video Generator")
-        self.root.geometry("520x720")
+        self.root.geometry("520x1010")
         self.root.resizable(False, False)
 
         self.image = None
+        self.image_path = None
         self.preview_image = None
+        self.preview_engine = None
+        self.preview_cache = None
+        self.job = None
+        self.luts = []
+        self.lut_paths = []
 
         self.preview_label = tk.Label(root)
         self.preview_label.pack(pady=15)
 
+        self.scrubber = tk.Scale(
+            root, from_=0, to=VIDEO_SECONDS, resolution=0.25, orient=tk.HORIZONTAL,
+            length=420, label="Scrub timeline (s)", command=self.scrub_to,
+        )
+        self.scrubber.pack()
+
         tk.Button(root, text="Load Image", command=self.load_image).pack(pady=10)
+        tk.Button(root, text="Load .cube LUTs", command=self.load_luts).pack(pady=10)
         tk.Button(root, text="Preview Effects", command=self.preview).pack(pady=10)
+        self.all_cores = tk.BooleanVar(value=RENDER_WORKERS > 1)
+        tk.Checkbutton(
+            root, text=f"Render on all cores ({RENDER_WORKERS})", variable=self.all_cores
+        ).pack(pady=10)
+        self.draft = tk.BooleanVar(value=False)
+        tk.Checkbutton(root, text="Draft quality (fast review)", variable=self.draft).pack(pady=10)
+        self.use_service = tk.BooleanVar(value=False)
+        tk.Checkbutton(root, text="Send to render service", variable=self.use_service).pack(pady=10)
+
         tk.Button(root, text="Export FULL 1-Minute MP4", command=self.export_threaded).pack(pady=10)
+        tk.Button(root, text="Cancel", command=self.cancel_export).pack(pady=10)
 
         self.progress = ttk.Progressbar(root, length=420)
         self.progress.pack(pady=15)
@@ -99,6 +206,7 @@ class FiftyShadesOneMinute:
             return
 
         self.image = Image.open(path).convert("RGB")
+        self.image_path = path
         self.preview_image = self.image.copy()
         self.preview_image.thumbnail((PREVIEW_SIZE, PREVIEW_SIZE))
 
@@ -106,36 +214,95 @@ class FiftyShadesOneMinute:
         self.preview_label.configure(image=tk_img)
         self.preview_label.image = tk_img
 
+        # start filling the preview timeline while the user looks around
+        self.stop_preview()
+        self.build_preview_cache(self.effect_schedule())
+
         self.status.config(text="Image loaded ✅", fg="green")
 
+    # -------------------------
+    def load_luts(self):
+        paths = filedialog.askopenfilenames(filetypes=[("3D LUT", "*.cube")])
+        if not paths:
+            return
+
+        try:
+            self.luts = [load_cube(path) for path in paths]
+            self.lut_paths = list(paths)
+        except (OSError, ValueError) as e:
+            print("LUT error:", e)
+            self.status.config(text="Could not load LUT ❌", fg="red")
+            return
+
+        if self.image:
+            self.stop_preview()
+            self.build_preview_cache(self.effect_schedule())
+
+        self.status.config(text=f"{len(self.luts)} LUT look(s) loaded ✅", fg="green")
+
+    def effect_schedule(self):
+        return effect_schedule(self.luts)
+
+    # -------------------------
+    def build_preview_cache(self, effects):
+        if self.preview_cache:
+            self.preview_cache.cancel()
+
+        timeline = effect_timeline(self.preview_image, effects)
+        self.preview_cache = PreviewCache(timeline, VIDEO_FPS, key=tuple(effects)).start()
+
+    def stop_preview(self):
+        if self.preview_engine:
+            self.preview_engine.stop()
+
     # -------------------------
     def preview(self):
         if not self.image:
             self.status.config(text="Load an image first ❌", fg="red")
             return
 
+        self.stop_preview()
+
+        effects = self.effect_schedule()
+        if self.preview_cache is None or self.preview_cache.key != tuple(effects):
+            self.build_preview_cache(effects)
+
         self.status.config(text="Previewing extreme effects...", fg="orange")
-        self.root.update()
 
-        effects = generate_effects()
+        cache = self.preview_cache
+        self.preview_engine = PreviewEngine(
+            self.root, self.preview_label, cache.frame_at, len(cache.timeline),
+            VIDEO_FPS, on_done=self.preview_done,
+        )
+        self.preview_engine.start()
 
-        for b, c, s, w, inv in effects:
-            frame = apply_effect(self.preview_image, b, c, s, w, inv)
-            tk_frame = ImageTk.PhotoImage(Image.fromarray(frame))
-            self.preview_label.configure(image=tk_frame)
-            self.preview_label.image = tk_frame
-            self.root.update()
-            self.root.after(80)
+    def scrub_to(self, seconds):
+        if not self.preview_cache:
+            return
+
+        self.stop_preview()
+        index = int(float(seconds) * VIDEO_FPS)
+        show_frame(self.preview_label, self.preview_cache.frame_at(index))
 
-        self.status.config(text="Preview complete ✅", fg="green")
+    def preview_done(self, dropped):
+        self.status.config(text=f"Preview complete ✅ ({dropped} frames dropped)", fg="green")
 
     # -------------------------
     def export_threaded(self):
-        thread = threading.Thread(target=self.export_video)
+        self.job = RenderJob()
+        thread = threading.Thread(target=self.job.run, args=(self.export_video, self.export_cancelled))
         thread.start()
 
+    def cancel_export(self):
+        if self.job:
+            self.job.cancel()
+
+    def export_cancelled(self):
+        self.progress["value"] = 0
+        self.status.config(text="Export cancelled ⛔", fg="red")
+
     # -------------------------
-    def export_video(self):
+    def export_video(self, job):
         if not self.image:
             self.status.config(text="Load an image first ❌", fg="red")
             return
@@ -148,41 +315,66 @@ class FiftyShadesOneMinute:
         self.progress["value"] = 0
         self.root.update()
 
-        base_img = self.image.resize((EXPORT_SIZE, EXPORT_SIZE))
-        effects = generate_effects()
-
-        writer = imageio.get_writer(save_path, fps=VIDEO_FPS)
+        if self.use_service.get():
+            self.export_on_service(save_path, job)
+            return
 
-        total_written = 0
+        job.start_measuring()
+        profiler = RenderProfiler.from_env()
 
-        for i in range(len(effects) - 1):
-            b1, c1, s1, w1, inv1 = effects[i]
-            b2, c2, s2, w2, inv2 = effects[i + 1]
+        with profiler.stage("fit"):
+            base_img = self.image.resize((EXPORT_SIZE, EXPORT_SIZE))
+        effects = self.effect_schedule()
 
-            frame_a = apply_effect(base_img, b1, c1, s1, w1, inv1)
-            frame_b = apply_effect(base_img, b2, c2, s2, w2, inv2)
+        def progress(done, count):
+            with profiler.stage("ui"):
+                self.progress["value"] = (done / count) * 100
+                self.root.update()
 
-            blended_frames = blend_frames(frame_a, frame_b, FRAMES_PER_EFFECT)
+        workers = RENDER_WORKERS if self.all_cores.get() else 1
+        mode = DRAFT if self.draft.get() else FINAL
+        render_video(base_img, effects, save_path, progress, profiler, workers, mode, job)
 
-            for frame in blended_frames:
-                writer.append_data(frame)
-                total_written += 1
-                self.progress["value"] = (total_written / TOTAL_FRAMES) * 100
-                self.root.update()
+        profiler.write(save_path)
 
-        while total_written < TOTAL_FRAMES:
-            writer.append_data(frame_b)
-            total_written += 1
+        self.progress["value"] = 100
+        peak = format_bytes(job.stop_measuring())
+        self.status.config(text=f"✅ FULL 1-Minute 1080p Video Exported! (peak memory {peak})", fg="green")
+
+    def export_on_service(self, save_path, job):
+        """
+        Queue the export on the local render service and follow its progress.
+        """
+        from render_service import RenderServiceClient
+
+        spec = {
+            "kind": "60_seconds",
+            "image": os.path.abspath(self.image_path),
+            "output": os.path.abspath(save_path),
+            "luts": [os.path.abspath(path) for path in self.lut_paths],
+            "draft": self.draft.get(),
+        }
+
+        def progress(done, count):
+            self.progress["value"] = (done / count) * 100
+            self.root.update()
 
-        writer.close()
+        try:
+            state = RenderServiceClient().run(spec, progress, job)
+        except (OSError, RuntimeError) as e:
+            print("ERROR:", e)
+            self.status.config(text="Render service failed ❌", fg="red")
+            return
 
         self.progress["value"] = 100
-        self.status.config(text="✅ FULL 1-Minute 1080p Video Exported!", fg="green")
+        peak = format_bytes(state.get("peak_rss_bytes"))
+        self.status.config(text=f"✅ FULL 1-Minute 1080p Video Exported! (peak memory {peak})", fg="green")
 
 
 # =========================
 # RUN APP
 # =========================
-root = tk.Tk()
-app = FiftyShadesOneMinute(root)
-root.mainloop()
+if __name__ == "__main__":
+    root = tk.Tk()
+    app = FiftyShadesOneMinute(root)
+    root.mainloop()
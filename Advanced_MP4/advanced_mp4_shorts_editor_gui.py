@@ -3,13 +3,28 @@ from tkinter import filedialog, ttk
 import threading
 import os
 import math
+from functools import partial
 
-import cv2
 import numpy as np
 from PIL import Image
-import imageio
 
-from moviepy import VideoFileClip, AudioFileClip, concatenate_videoclips
+# shared helpers live at the repo root
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ffmpeg_tools import prepare_soundtrack, remux
+from frame_transport import FramePipeline
+from lazy_imports import lazy_import
+from media_probe import probe_media
+from memory_budget import format_bytes
+from render_engine import CaptionTrack, caption_bars, get_backend, plan_crop
+from render_jobs import RenderJob
+from render_modes import DRAFT, FINAL
+from render_profile import RenderProfiler
+
+cv2 = lazy_import("cv2")
+imageio = lazy_import("imageio")
+moviepy = lazy_import("moviepy")
 
 
 # =========================
@@ -18,53 +33,68 @@ from moviepy import VideoFileClip, AudioFileClip, concatenate_videoclips
 VERTICAL_W = 1088
 VERTICAL_H = 1920
 
+AUDIO_FADE = 1.0  # seconds of MP3 fade in and out
 
-# =========================
-# IMAGE FIT FOR SHORTS
-# =========================
-def crop_to_vertical(frame):
-    h, w, _ = frame.shape
-    target_ratio = VERTICAL_W / VERTICAL_H
-    current_ratio = w / h
-
-    if current_ratio > target_ratio:
-        new_w = int(h * target_ratio)
-        x1 = (w - new_w) // 2
-        frame = frame[:, x1:x1 + new_w]
-    else:
-        new_h = int(w / target_ratio)
-        y1 = (h - new_h) // 2
-        frame = frame[y1:y1 + new_h, :]
-
-    return cv2.resize(frame, (VERTICAL_W, VERTICAL_H))
+RENDER_WORKERS = os.cpu_count() or 1  # frame producers used by "Render on all cores"
+CHUNK_SECONDS = 2  # source frames handed to a worker at a time
 
 
 # =========================
-# TEXT BAR OVERLAY
+# PARALLEL FRAME WORKERS
 # =========================
-def add_caption_bars(frame, top_text, bottom_text):
-    h, w, _ = frame.shape
-    bar_h = int(h * 0.12)
-
-    overlay = frame.copy()
-
-    # Top bar
-    cv2.rectangle(overlay, (0, 0), (w, bar_h), (0, 0, 0), -1)
-    cv2.putText(
-        overlay, top_text,
-        (int(w * 0.03), int(bar_h * 0.65)),
-        cv2.FONT_HERSHEY_SIMPLEX, 1.1, (255, 255, 255), 2, cv2.LINE_AA
-    )
-
-    # Bottom bar
-    cv2.rectangle(overlay, (0, h - bar_h), (w, h), (0, 0, 0), -1)
-    cv2.putText(
-        overlay, bottom_text,
-        (int(w * 0.03), int(h - bar_h * 0.35)),
-        cv2.FONT_HERSHEY_SIMPLEX, 1.1, (255, 255, 255), 2, cv2.LINE_AA
-    )
-
-    return cv2.addWeighted(overlay, 0.75, frame, 0.25, 0)
+def plan_chunks(frame_count, fps):
+    """
+    Split the trimmed timeline into (first frame, frame count) chunks.
+    """
+    size = max(1, int(round(CHUNK_SECONDS * fps)))
+    return [(first, min(size, frame_count - first)) for first in range(0, frame_count, size)]
+
+
+def fit_frame(frame, vertical, size, box=None):
+    """
+    Crop to 9:16 at `size` (the crop plan's `box` when given, else the
+    centre), or just scale to `size` (for drafts) when the vertical crop is
+    off.
+    """
+    if vertical:
+        if box is not None:
+            return get_backend().crop_frame(frame, box, size)
+        return get_backend().fit_frame(frame, size)
+    if (frame.shape[1], frame.shape[0]) != size:
+        return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+    return frame
+
+
+def draw_subtitles(subtitles, frame, decoded, seconds, scale):
+    """
+    Draw the cues at `seconds` onto `frame`, copying it first while it is
+    still the decoder's own `decoded` frame (uncropped, unscaled, no bars).
+    """
+    if frame is decoded:
+        frame = frame.copy()
+    return subtitles.draw(frame, seconds, scale)
+
+
+def fill_chunk(video_path, start_time, fps, chunks, vertical, size, scale,
+               top_text, bottom_text, crop_plan, subtitles, c, ring):
+    """
+    Pipeline worker: decode one chunk of the source with its own reader,
+    crop and caption it, and write the frames into shared memory.
+    """
+    first, count = chunks[c]
+    clip = moviepy.VideoFileClip(video_path, audio=False)
+    try:
+        for k in range(count):
+            t = start_time + (first + k) / fps
+            decoded = clip.get_frame(t).astype(np.uint8)
+            frame = fit_frame(decoded, vertical, size, crop_plan and crop_plan.box(first + k))
+            if top_text or bottom_text:
+                frame = caption_bars(frame, top_text, bottom_text, scale)
+            if subtitles:
+                frame = draw_subtitles(subtitles, frame, decoded, t, scale)
+            ring.write(frame)
+    finally:
+        clip.close()
 
 
 # =========================
@@ -74,15 +104,18 @@ class MP4ShortsEditor:
     def __init__(self, root):
         self.root = root
         root.title("Advanced MP4 Shorts Editor")
-        root.geometry("720x520")
+        root.geometry("720x590")
         root.resizable(False, False)
 
         self.video_path = None
         self.audio_path = None
+        self.subtitles = None
+        self.job = None
 
         # --- FILE BUTTONS ---
         tk.Button(root, text="Select MP4 Video", command=self.select_video).pack(pady=5)
         tk.Button(root, text="Select MP3 (optional)", command=self.select_audio).pack(pady=5)
+        tk.Button(root, text="Select SRT/VTT captions (optional)", command=self.select_subtitles).pack(pady=5)
 
         # --- PRESET TRIM ---
         preset_frame = tk.Frame(root)
@@ -134,8 +167,24 @@ class MP4ShortsEditor:
         tk.Checkbutton(options, text="Loop video to MP3", variable=self.loop_video).grid(row=1, column=0)
         tk.Checkbutton(options, text="Vertical Shorts crop 9:16", variable=self.vertical_crop).grid(row=1, column=1)
 
+        self.follow_subject = tk.BooleanVar(value=False)
+        tk.Checkbutton(
+            options, text="Follow subject (scene-aware crop)", variable=self.follow_subject
+        ).grid(row=3, column=0)
+
+        self.all_cores = tk.BooleanVar(value=RENDER_WORKERS > 1)
+        tk.Checkbutton(
+            options, text=f"Render on all cores ({RENDER_WORKERS})", variable=self.all_cores
+        ).grid(row=2, column=0)
+
+        self.draft = tk.BooleanVar(value=False)
+        tk.Checkbutton(options, text="Draft quality (fast review)", variable=self.draft).grid(row=2, column=1)
+
         # --- ACTION ---
-        tk.Button(root, text="Process & Export", command=self.start_thread).pack(pady=12)
+        actions = tk.Frame(root)
+        actions.pack(pady=12)
+        tk.Button(actions, text="Process & Export", command=self.start_thread).grid(row=0, column=0, padx=6)
+        tk.Button(actions, text="Cancel", command=self.cancel_job).grid(row=0, column=1, padx=6)
 
         self.progress = ttk.Progressbar(root, length=600)
         self.progress.pack(pady=5)
@@ -163,10 +212,40 @@ class MP4ShortsEditor:
         if self.audio_path:
             self.ui("MP3 loaded ✅", None, "green")
 
+    def select_subtitles(self):
+        path = filedialog.askopenfilename(filetypes=[("Captions", "*.srt *.vtt")])
+        if not path:
+            return
+
+        try:
+            track = CaptionTrack.load(path)
+        except (OSError, ValueError) as e:
+            print("ERROR:", e)
+            self.ui("Could not load captions ❌", None, "red")
+            return
+
+        if not track:
+            self.ui("No captions found in file ❌", None, "red")
+            return
+        # cues are rasterized for the export's own width and scale the first
+        # time they are drawn, and kept on the track for later exports
+        self.subtitles = track
+        self.ui(f"{len(track)} captions loaded ✅", None, "green")
+
     def start_thread(self):
-        threading.Thread(target=self.process_video, daemon=True).start()
+        self.job = RenderJob()
+        threading.Thread(
+            target=self.job.run, args=(self.process_video, self.job_cancelled), daemon=True,
+        ).start()
+
+    def cancel_job(self):
+        if self.job:
+            self.job.cancel()
+
+    def job_cancelled(self):
+        self.ui("Cancelled ⛔", 0, "red")
 
-    def process_video(self):
+    def process_video(self, job):
         if not self.video_path:
             self.ui("Please select MP4 ❌", None, "red")
             return
@@ -174,64 +253,162 @@ class MP4ShortsEditor:
         save_path = filedialog.asksaveasfilename(defaultextension=".mp4", filetypes=[("MP4", "*.mp4")])
         if not save_path:
             return
+        job.start_measuring()
+
+        profiler = RenderProfiler.from_env()
 
         self.ui("Loading video...", 5, "orange")
-        clip = VideoFileClip(self.video_path)
+        try:
+            with profiler.stage("load"):
+                info = probe_media(self.video_path, keyframes=True, job=job)
+        except (OSError, RuntimeError) as e:
+            print("ERROR:", e)
+            self.ui("Could not read the video ❌", None, "red")
+            return
+        if not info.video:
+            self.ui("No video stream in that file ❌", None, "red")
+            return
 
         # --- TRIM LOGIC ---
         if self.trim_var.get() != "Custom":
-            end_time = min(float(self.trim_var.get()), clip.duration)
+            end_time = min(float(self.trim_var.get()), info.duration)
             start_time = 0.0
         else:
             start_time = float(self.start_entry.get() or 0)
-            end_time = float(self.end_entry.get() or clip.duration)
+            end_time = float(self.end_entry.get() or info.duration)
+        duration = end_time - start_time
 
-        trimmed = clip.subclipped(start_time, end_time)
+        mode = DRAFT if self.draft.get() else FINAL
+        vertical = self.vertical_crop.get()
+        top_text, bottom_text = self.top_text.get(), self.bottom_text.get()
 
         # --- FRAME PROCESSING ---
-        self.ui("Rendering frames & captions...", 20, "orange")
-        temp_video = save_path + ".tmp.mp4"
-        writer = imageio.get_writer(temp_video, fps=clip.fps)
-
-        for frame in trimmed.iter_frames(dtype="uint8"):
-            if self.vertical_crop.get():
-                frame = crop_to_vertical(frame)
-
-            frame = add_caption_bars(frame, self.top_text.get(), self.bottom_text.get())
-            writer.append_data(frame)
-
-        writer.close()
-        trimmed.close()
-        clip.close()
-
-        final_clip = VideoFileClip(temp_video)
+        if vertical or top_text or bottom_text or self.subtitles or mode.is_draft \
+                or not info.on_keyframe(start_time):
+            video_path = job.track(save_path + ".tmp.mp4")
+            video_start = 0.0
+            self.render_frames(job, profiler, video_path, start_time, end_time, mode, vertical, top_text,
+                               bottom_text)
+        else:
+            # the frames are not touched and the cut starts on a keyframe:
+            # stream-copy the source instead of re-encoding it
+            video_path, video_start = self.video_path, start_time
 
         # --- AUDIO ---
+        soundtrack = None
         if self.audio_path:
             self.ui("Processing audio...", 80, "orange")
-            audio = AudioFileClip(self.audio_path)
-
-            if audio.duration > final_clip.duration:
-                audio = audio.subclipped(0, final_clip.duration)
-            else:
-                audio = audio.audio_loop(duration=final_clip.duration)
-
-            if self.fade_audio.get():
-                audio = audio.audio_fadein(1.0).audio_fadeout(1.0)
-
-            final_clip = final_clip.with_audio(audio)
-
-        elif self.strip_audio.get():
-            final_clip = final_clip.with_audio(None)
+            soundtrack = job.track(save_path + ".soundtrack.m4a")
+            with profiler.stage("audio_mux"):
+                prepare_soundtrack(
+                    self.audio_path, duration, soundtrack, fade=AUDIO_FADE if self.fade_audio.get() else 0.0,
+                    job=job,
+                )
+        elif not self.strip_audio.get() and info.audio:
+            soundtrack = self.video_path  # keep the original audio, cut like the video
 
         # --- EXPORT ---
         self.ui("Exporting...", 90, "orange")
-        final_clip.write_videofile(save_path, codec="libx264", audio_codec="aac")
+        job.track(save_path)
+        with profiler.stage("audio_mux"):
+            remux(
+                video_path, save_path, soundtrack, video_start,
+                start_time if soundtrack == self.video_path else 0.0, duration, job=job,
+            )
+        job.release(save_path)
+        if video_path != self.video_path:
+            os.remove(video_path)
+        if soundtrack and soundtrack != self.video_path:
+            os.remove(soundtrack)
+        profiler.write(save_path)
+
+        self.ui(f"✅ Export complete! (peak memory {format_bytes(job.stop_measuring())})", 100, "green")
+
+    def render_frames(self, job, profiler, temp_video, start_time, end_time, mode, vertical, top_text,
+                      bottom_text):
+        """
+        Crop, caption and encode the trimmed clip into `temp_video` (no audio).
+        """
+        with profiler.stage("load"):
+            clip = moviepy.VideoFileClip(self.video_path, audio=False)
+        trimmed = clip.subclipped(start_time, end_time)
 
-        final_clip.close()
-        os.remove(temp_video)
+        fps = mode.fps(clip.fps)
+        size = mode.size(VERTICAL_W, VERTICAL_H) if vertical else mode.size(clip.w, clip.h)
+
+        # --- CROP PLAN ---
+        crop_plan = None
+        if vertical and self.follow_subject.get():
+            self.ui("Finding the subject in each scene...", 10, "orange")
+            try:
+                with profiler.stage("crop_plan"):
+                    crop_plan = plan_crop(
+                        self.video_path, (clip.w, clip.h), (VERTICAL_W, VERTICAL_H), fps,
+                        start_time, trimmed.duration, job,
+                    )
+            except BaseException:
+                trimmed.close()
+                clip.close()
+                raise
 
-        self.ui("✅ Export complete!", 100, "green")
+        self.ui("Rendering frames & captions...", 20, "orange")
+        writer = imageio.get_writer(temp_video, fps=fps, **mode.writer_kwargs())
+
+        try:
+            if self.all_cores.get() and RENDER_WORKERS > 1:
+                # decode, crop and captions run in worker processes that hand
+                # frames over through shared memory; only encoding runs here
+                frame_count = int(trimmed.duration * fps)  # as iter_frames counts
+                chunks = plan_chunks(frame_count, fps)
+
+                pipeline = FramePipeline(
+                    (size[1], size[0], 3),
+                    [count for _, count in chunks],
+                    partial(
+                        fill_chunk, self.video_path, start_time, fps, chunks, vertical, size, mode.scale,
+                        top_text, bottom_text, crop_plan, self.subtitles,
+                    ),
+                    RENDER_WORKERS,
+                    budget=job.budget,
+                )
+                with pipeline as frames:
+                    for frame in frames:
+                        job.check()
+                        with profiler.stage("encode"):
+                            writer.append_data(frame)
+            else:
+                frames = trimmed.iter_frames(fps=fps, dtype="uint8")
+                index = 0
+                while True:
+                    with profiler.stage("decode"):
+                        decoded = next(frames, None)
+                    if decoded is None:
+                        break
+                    job.check()
+
+                    with profiler.stage("crop"):
+                        frame = fit_frame(decoded, vertical, size, crop_plan and crop_plan.box(index))
+
+                    with profiler.stage("captions"):
+                        if top_text or bottom_text:
+                            frame = caption_bars(frame, top_text, bottom_text, mode.scale)
+                        if self.subtitles:
+                            frame = draw_subtitles(
+                                self.subtitles, frame, decoded, start_time + index / fps, mode.scale,
+                            )
+                    index += 1
+                    with profiler.stage("encode"):
+                        writer.append_data(frame)
+        except BaseException:
+            writer.close()
+            trimmed.close()
+            clip.close()
+            raise
+
+        with profiler.stage("encode_flush"):
+            writer.close()
+        trimmed.close()
+        clip.close()
 
 
 if __name__ == "__main__":
@@ -1,13 +1,21 @@
 import tkinter as tk
 from tkinter import filedialog, ttk
-from PIL import Image, ImageEnhance
-import imageio
-import numpy as np
-import cv2
 import threading
-from moviepy import VideoFileClip, AudioFileClip
 import os
 import random
+import hashlib
+
+from ffmpeg_tools import mux_audio, prepare_soundtrack
+from image_cache import FittedImageCache, open_fitted
+from lut import EffectBaker, load_cube
+from media_probe import probe_media
+from memory_budget import format_bytes
+from render_cache import RenderCache, effect_fingerprint, file_digest, render_key
+from render_engine import FloatingCaption, Grader, KenBurns, Renderer, Timeline, get_backend
+from render_jobs import RenderCancelled, RenderJob
+from render_modes import DRAFT, FINAL
+from render_farm import create_queue
+from render_profile import RenderProfiler
 
 # =========================
 # CONFIG
@@ -24,88 +32,221 @@ FRAMES_PER_EFFECT = TOTAL_FRAMES // BASE_EFFECTS
 
 CAPTION_TEXT = "Follow for More"
 
+LUT_GRADING = False  # bake generated looks into 3D LUTs (faster, approximate)
+
+DEFAULT_SEED = "1"
+DEFAULT_AUDIO_OFFSET = "0"  # seconds the soundtrack advances per item
+ENCODER_PROFILE = {"codec": "libx264", "quality": 5, "audio_codec": "aac"}
+RENDER_WORKERS = os.cpu_count() or 1  # frame producers used by "Render on all cores"
+
 
 # =========================
 # RANDOM EFFECT GENERATOR
 # =========================
-def generate_random_effects():
+def generate_random_effects(seed=None):
+    """
+    Random look schedule. The same seed always gives the same schedule;
+    seed=None draws a fresh one.
+    """
+    rng = random.Random(seed)
     effects = []
     for i in range(BASE_EFFECTS):
         t = i / (BASE_EFFECTS - 1)
 
-        brightness = random.uniform(0.2, 2.5) * t + 0.2
-        contrast   = random.uniform(0.3, 2.8) * t + 0.3
-        saturation = random.uniform(0.0, 3.5) * t
-        warmth     = random.randint(-120, 120)
-        invert     = random.choice([False, False, True])
+        brightness = rng.uniform(0.2, 2.5) * t + 0.2
+        contrast   = rng.uniform(0.3, 2.8) * t + 0.3
+        saturation = rng.uniform(0.0, 3.5) * t
+        warmth     = rng.randint(-120, 120)
+        invert     = rng.choice([False, False, True])
 
         effects.append((brightness, contrast, saturation, warmth, invert))
     return effects
 
 
 # =========================
-# APPLY EFFECT
+# TIMELINE
 # =========================
-def apply_effect(img, b, c, s, warmth, invert):
-    img = ImageEnhance.Brightness(img).enhance(b)
-    img = ImageEnhance.Contrast(img).enhance(c)
-    img = ImageEnhance.Color(img).enhance(s)
-
-    frame = np.array(img).astype(np.int16)
-
-    frame[:, :, 0] = np.clip(frame[:, :, 0] + warmth, 0, 255)
-    frame[:, :, 2] = np.clip(frame[:, :, 2] - warmth, 0, 255)
-
-    if invert:
-        frame = 255 - frame
-
-    return frame.astype(np.uint8)
+def item_motion(seed, mode):
+    """
+    One slow Ken Burns move across the whole item, picked by its seed.
+    """
+    return KenBurns(mode.size(EXPORT_WIDTH, EXPORT_HEIGHT), per_keyframe=False, first=seed)
+
+
+def item_renderer(base, effects, mode, baker=None, backend=None, motion=None):
+    """
+    Captioned crossfades between the item's looks. `base` is a fitted
+    image cache reference, so pipeline workers map the cached pages
+    instead of receiving the image. With a KenBurns `motion`, `base` must
+    be fitted to motion.source_size().
+    """
+    backend = backend or get_backend()
+    frames_per_effect = mode.fps(VIDEO_FPS) * VIDEO_SECONDS // BASE_EFFECTS
+    timeline = Timeline(Grader(base, backend, baker), effects, frames_per_effect, backend=backend, motion=motion)
+    return Renderer(timeline, [FloatingCaption(CAPTION_TEXT, mode.scale)], index_step=mode.fps_divisor)
+
+
+def item_audio_offset(idx, step, source_seconds):
+    """
+    Where item idx (1-based) starts in the soundtrack: `step` seconds
+    further than the previous item, wrapping around the source audio.
+    """
+    if step <= 0 or source_seconds <= 0:
+        return 0.0
+    return ((idx - 1) * step) % source_seconds
+
+
+def item_seed(batch_seed, filename):
+    """
+    Per-image seed derived from the batch seed and the file name, so an
+    image keeps its look when other images are added or edited.
+    """
+    digest = hashlib.sha256(f"{batch_seed}:{filename}".encode("utf-8")).hexdigest()
+    return int(digest[:16], 16)
+
+
+def effect_schedule(seed=None, luts=()):
+    """
+    Random keyframe looks: drawn from the loaded LUTs when there are
+    any, otherwise from the formula generator.
+    """
+    if luts:
+        rng = random.Random(seed)
+        return [rng.choice(luts) for _ in range(BASE_EFFECTS)]
+    return generate_random_effects(seed)
+
+
+def item_key(img_path, audio_digest, audio_offset, seed, effects, mode, motion=None):
+    return render_key(
+        image=file_digest(img_path),
+        audio=audio_digest,
+        audio_offset=audio_offset,
+        audio_mux="copy",
+        seed=seed,
+        effects=[effect_fingerprint(e) for e in effects],
+        caption=CAPTION_TEXT,
+        encoder=ENCODER_PROFILE,
+        settings=[EXPORT_WIDTH, EXPORT_HEIGHT, VIDEO_FPS, VIDEO_SECONDS, FRAMES_PER_EFFECT, LUT_GRADING],
+        mode=mode.fingerprint(),
+        backend=get_backend().name,
+        motion=motion.fingerprint() if motion else None,
+    )
 
 
 # =========================
-# ANIMATED CAPTION
+# RENDER ONE ITEM
 # =========================
-def add_animated_caption(frame, frame_index):
-    h, w, _ = frame.shape
-    y = int(h * 0.9 + 25 * np.sin(frame_index / 12))
-
-    overlay = frame.copy()
-
-    cv2.putText(
-        overlay,
-        CAPTION_TEXT,
-        (int(w * 0.15), y),
-        cv2.FONT_HERSHEY_SIMPLEX,
-        1.1,
-        (255, 255, 255),
-        3,
-        cv2.LINE_AA
+def render_item(img_path, final_video, temp_video, effects, mode, soundtrack, audio_offset, job,
+                workers=1, fitted=None, profiler=None, motion=None):
+    """
+    Render one batch item to `final_video` via `temp_video`, muxing in the
+    prepared `soundtrack` at `audio_offset` when there is one, with the
+    item's Ken Burns `motion` if any. The final file only appears once it
+    is complete.
+    """
+    fitted = fitted or FittedImageCache()
+    profiler = profiler or RenderProfiler()
+
+    size = mode.size(EXPORT_WIDTH, EXPORT_HEIGHT)
+    fps = mode.fps(VIDEO_FPS)
+    backend = get_backend()
+
+    base = fitted.fetch(img_path, motion.source_size() if motion else size, backend.fit, profiler)
+    baker = EffectBaker(open_fitted(base)) if LUT_GRADING else None
+
+    # with workers > 1 effects, blends and captions are drawn by worker
+    # processes into shared memory; only encoding runs here
+    renderer = item_renderer(base, effects, mode, baker, backend, motion)
+    renderer.write(
+        temp_video,
+        fps,
+        mode.writer_kwargs({"codec": ENCODER_PROFILE["codec"], "quality": ENCODER_PROFILE["quality"]}),
+        job,
+        profiler,
+        workers=workers,
     )
+    fitted.release(base)
 
-    return cv2.addWeighted(overlay, 0.6, frame, 0.4, 0)
+    if soundtrack:
+        with profiler.stage("audio_mux"):
+            mux_audio(temp_video, soundtrack, final_video, audio_offset, job)
+        os.remove(temp_video)
+    else:
+        os.rename(temp_video, final_video)
 
 
 # =========================
-# IMAGE → VERTICAL FIT
+# RENDER FARM
 # =========================
-def fit_to_vertical(img):
-    img_ratio = img.width / img.height
-    target_ratio = EXPORT_WIDTH / EXPORT_HEIGHT
-
-    if img_ratio > target_ratio:
-        new_height = img.height
-        new_width = int(new_height * target_ratio)
-    else:
-        new_width = img.width
-        new_height = int(new_width / target_ratio)
+def build_farm_queue(queue_dir, image_folder, output_dir, batch_seed, audio_path=None, offset_step=0.0,
+                     lut_paths=(), draft=False, job=None, ken_burns=False):
+    """
+    Write a render_farm queue with one item per image in `image_folder`.
+    The soundtrack is prepared once into the queue dir, which every node
+    can read.
+    """
+    images = sorted(
+        f for f in os.listdir(image_folder) if f.lower().endswith((".jpg", ".jpeg", ".png"))
+    )
+    os.makedirs(queue_dir, exist_ok=True)
+
+    soundtrack = None
+    source_seconds = 0.0
+    if audio_path:
+        source_seconds = probe_media(audio_path).duration
+        soundtrack = os.path.abspath(os.path.join(queue_dir, "soundtrack.m4a"))
+        prepare_soundtrack(
+            audio_path,
+            VIDEO_SECONDS + (source_seconds if offset_step > 0 else 0),
+            soundtrack,
+            codec=ENCODER_PROFILE["audio_codec"],
+            job=job,
+        )
+
+    suffix = "_draft" if draft else ""
+    items = []
+    for idx, filename in enumerate(images, start=1):
+        final_video = os.path.join(output_dir, f"{idx:02d}_{os.path.splitext(filename)[0]}{suffix}.mp4")
+        items.append({
+            "image": os.path.abspath(os.path.join(image_folder, filename)),
+            "output": os.path.abspath(final_video),
+            "seed": item_seed(batch_seed, filename),
+            "audio_offset": item_audio_offset(idx, offset_step, source_seconds) if soundtrack else None,
+        })
+
+    settings = {
+        "soundtrack": soundtrack,
+        "audio_digest": file_digest(audio_path) if audio_path else None,
+        "luts": [os.path.abspath(path) for path in lut_paths],
+        "draft": draft,
+        "ken_burns": ken_burns,
+    }
+    return create_queue(queue_dir, "batch_vertical_60s_text_random", settings, items)
+
+
+def render_farm_item(settings, item, temp_path, job, workers=1):
+    """
+    render_farm handler: render one queued batch item, from the node's
+    render cache when it has the item already.
+    """
+    mode = DRAFT if settings["draft"] else FINAL
+    effects = effect_schedule(item["seed"], [load_cube(path) for path in settings["luts"]])
+    motion = item_motion(item["seed"], mode) if settings.get("ken_burns") else None
+    key = item_key(
+        item["image"], settings["audio_digest"], item["audio_offset"], item["seed"], effects, mode, motion,
+    )
 
-    left = (img.width - new_width) // 2
-    top = (img.height - new_height) // 2
-    right = left + new_width
-    bottom = top + new_height
+    cache = RenderCache()
+    if cache.fetch(key, item["output"]):
+        return
 
-    img = img.crop((left, top, right, bottom))
-    return img.resize((EXPORT_WIDTH, EXPORT_HEIGHT))
+    profiler = RenderProfiler.from_env()
+    render_item(
+        item["image"], item["output"], temp_path, effects, mode, settings["soundtrack"],
+        item["audio_offset"], job, workers, profiler=profiler, motion=motion,
+    )
+    profiler.write(item["output"])
+    cache.store(key, item["output"])
 
 
 # =========================
@@ -115,14 +256,44 @@ class BatchVerticalExporter:
     def __init__(self, root):
         self.root = root
         self.root.title("Batch Shorts – Random + Animated Text + Music")
-        self.root.geometry("540x820")
+        self.root.geometry("540x990")
 
         self.image_folder = None
         self.audio_path = None
+        self.luts = []
+        self.lut_paths = []
+        self.job = None
 
         tk.Button(root, text="Select Image Folder (20)", command=self.select_folder).pack(pady=8)
         tk.Button(root, text="Add MP3 Music", command=self.load_audio).pack(pady=8)
+        tk.Button(root, text="Add .cube LUTs (optional)", command=self.load_luts).pack(pady=8)
+
+        seed_frame = tk.Frame(root)
+        seed_frame.pack(pady=8)
+        tk.Label(seed_frame, text="Seed:").pack(side=tk.LEFT, padx=5)
+        self.seed_entry = tk.Entry(seed_frame, width=12)
+        self.seed_entry.insert(0, DEFAULT_SEED)
+        self.seed_entry.pack(side=tk.LEFT, padx=5)
+
+        tk.Label(seed_frame, text="Audio offset/item (s):").pack(side=tk.LEFT, padx=5)
+        self.offset_entry = tk.Entry(seed_frame, width=6)
+        self.offset_entry.insert(0, DEFAULT_AUDIO_OFFSET)
+        self.offset_entry.pack(side=tk.LEFT, padx=5)
+
+        self.all_cores = tk.BooleanVar(value=RENDER_WORKERS > 1)
+        tk.Checkbutton(
+            root, text=f"Render on all cores ({RENDER_WORKERS})", variable=self.all_cores
+        ).pack(pady=8)
+
+        self.ken_burns = tk.BooleanVar(value=False)
+        tk.Checkbutton(root, text="Ken Burns pan & zoom", variable=self.ken_burns).pack(pady=8)
+
+        self.draft = tk.BooleanVar(value=False)
+        tk.Checkbutton(root, text="Draft quality (fast review)", variable=self.draft).pack(pady=8)
+
         tk.Button(root, text="Start Batch Export", command=self.export_threaded).pack(pady=10)
+        tk.Button(root, text="Queue Batch for Render Farm", command=self.farm_threaded).pack(pady=4)
+        tk.Button(root, text="Cancel", command=self.cancel_export).pack(pady=4)
 
         self.progress = ttk.Progressbar(root, length=420)
         self.progress.pack(pady=20)
@@ -148,10 +319,44 @@ class BatchVerticalExporter:
         self.audio_path = filedialog.askopenfilename(filetypes=[("Audio", "*.mp3")])
         self.ui("MP3 loaded ✅", 0, "green")
 
+    def load_luts(self):
+        paths = filedialog.askopenfilenames(filetypes=[("3D LUT", "*.cube")])
+        if not paths:
+            return
+
+        try:
+            self.luts = [load_cube(path) for path in paths]
+            self.lut_paths = list(paths)
+        except (OSError, ValueError) as e:
+            print("LUT error:", e)
+            self.ui("Could not load LUT ❌", None, "red")
+            return
+
+        self.ui(f"{len(self.luts)} LUT look(s) loaded ✅", None, "green")
+
+    def effect_schedule(self, seed=None):
+        return effect_schedule(seed, self.luts)
+
     def export_threaded(self):
-        threading.Thread(target=self.export_batch, daemon=True).start()
+        self.job = RenderJob()
+        threading.Thread(
+            target=self.job.run, args=(self.export_batch, self.export_cancelled), daemon=True,
+        ).start()
+
+    def farm_threaded(self):
+        self.job = RenderJob()
+        threading.Thread(
+            target=self.job.run, args=(self.queue_for_farm, self.export_cancelled), daemon=True,
+        ).start()
 
-    def export_batch(self):
+    def cancel_export(self):
+        if self.job:
+            self.job.cancel()
+
+    def export_cancelled(self):
+        self.ui("Batch cancelled ⛔", 0, "red")
+
+    def export_batch(self, job):
         if not self.image_folder:
             self.ui("Select image folder ❌", 0, "red")
             return
@@ -159,68 +364,125 @@ class BatchVerticalExporter:
         output_dir = filedialog.askdirectory()
         if not output_dir:
             return
+        job.start_measuring()
 
         images = sorted([
             f for f in os.listdir(self.image_folder)
             if f.lower().endswith((".jpg", ".jpeg", ".png"))
         ])[:20]
 
-        for idx, filename in enumerate(images, start=1):
-            try:
-                self.ui(f"Rendering {idx}/20", (idx / len(images)) * 100, "orange")
-
-                img_path = os.path.join(self.image_folder, filename)
-                base_pil = Image.open(img_path).convert("RGB")
-                base_img = fit_to_vertical(base_pil)
-
-                effects = generate_random_effects()
+        batch_seed = self.seed_entry.get().strip() or DEFAULT_SEED
 
-                temp_video = os.path.join(output_dir, f"temp_{idx}.mp4")
-                final_video = os.path.join(output_dir, f"{idx:02d}_{os.path.splitext(filename)[0]}.mp4")
-
-                writer = imageio.get_writer(temp_video, fps=VIDEO_FPS)
-                frame_counter = 0
-
-                for i in range(len(effects) - 1):
-                    b1, c1, s1, w1, inv1 = effects[i]
-                    b2, c2, s2, w2, inv2 = effects[i + 1]
+        # decode, loop and encode the music once; every item stream-copies it
+        soundtrack = None
+        offset_step = 0.0
+        source_seconds = 0.0
+        if self.audio_path:
+            try:
+                offset_step = float(self.offset_entry.get().strip() or DEFAULT_AUDIO_OFFSET)
+                source_seconds = probe_media(self.audio_path).duration
+                soundtrack = job.track(os.path.join(output_dir, ".soundtrack.m4a"))
+                self.ui("Preparing soundtrack...", 0, "orange")
+                prepare_soundtrack(
+                    self.audio_path,
+                    VIDEO_SECONDS + (source_seconds if offset_step > 0 else 0),
+                    soundtrack,
+                    codec=ENCODER_PROFILE["audio_codec"],
+                    job=job,
+                )
+            except (ValueError, RuntimeError, OSError) as e:
+                print("ERROR:", e)
+                self.ui("Could not prepare the MP3 ❌", None, "red")
+                return
 
-                    frame_a = apply_effect(base_img, b1, c1, s1, w1, inv1)
-                    frame_b = apply_effect(base_img, b2, c2, s2, w2, inv2)
+        cache = RenderCache()
+        fitted = FittedImageCache()
+        audio_digest = file_digest(self.audio_path) if self.audio_path else None
+        cached = 0
+        workers = RENDER_WORKERS if self.all_cores.get() else 1
 
-                    for step in range(FRAMES_PER_EFFECT):
-                        alpha = step / FRAMES_PER_EFFECT
-                        frame = cv2.addWeighted(frame_a, 1 - alpha, frame_b, alpha, 0)
-                        frame = add_animated_caption(frame, frame_counter)
-                        writer.append_data(frame)
-                        frame_counter += 1
+        mode = DRAFT if self.draft.get() else FINAL
+        suffix = "_draft" if mode.is_draft else ""
 
-                writer.close()
+        for idx, filename in enumerate(images, start=1):
+            try:
+                img_path = os.path.join(self.image_folder, filename)
+                final_video = os.path.join(output_dir, f"{idx:02d}_{os.path.splitext(filename)[0]}{suffix}.mp4")
+
+                seed = item_seed(batch_seed, filename)
+                audio_offset = item_audio_offset(idx, offset_step, source_seconds) if soundtrack else None
+                effects = self.effect_schedule(seed)
+                motion = item_motion(seed, mode) if self.ken_burns.get() else None
+                key = item_key(img_path, audio_digest, audio_offset, seed, effects, mode, motion)
+
+                job.check()
+                if cache.fetch(key, final_video):
+                    cached += 1
+                    self.ui(f"Unchanged {idx}/{len(images)} (cached)", (idx / len(images)) * 100, "orange")
+                    continue
+
+                self.ui(f"Rendering {idx}/{len(images)}", (idx / len(images)) * 100, "orange")
+
+                profiler = RenderProfiler.from_env()
+                temp_video = job.track(os.path.join(output_dir, f"temp_{idx}.mp4"))
+                render_item(
+                    img_path, final_video, temp_video, effects, mode, soundtrack, audio_offset, job,
+                    workers, fitted, profiler, motion,
+                )
+
+                profiler.write(final_video)
+                cache.store(key, final_video)
+
+            except RenderCancelled:
+                raise
+            except Exception as e:
+                print("ERROR:", e)
 
-                if self.audio_path:
-                    video_clip = VideoFileClip(temp_video)
-                    audio_clip = AudioFileClip(self.audio_path)
+        peak = format_bytes(job.stop_measuring())
+        self.ui(f"✅ Batch Export Completed! ({cached} unchanged from cache, peak memory {peak})", 100, "green")
 
-                    if audio_clip.duration > VIDEO_SECONDS:
-                        audio_clip = audio_clip.subclipped(0, VIDEO_SECONDS)
-                    else:
-                        audio_clip = audio_clip.audio_loop(duration=VIDEO_SECONDS)
+    def queue_for_farm(self, job):
+        """
+        Write the batch as a render_farm queue instead of rendering it here;
+        start `python render_farm.py node QUEUE_DIR` on each render node.
+        """
+        if not self.image_folder:
+            self.ui("Select image folder ❌", 0, "red")
+            return
 
-                    final_clip = video_clip.with_audio(audio_clip)
-                    final_clip.write_videofile(final_video, fps=VIDEO_FPS, codec="libx264", audio_codec="aac")
-                    os.remove(temp_video)
-                else:
-                    os.rename(temp_video, final_video)
+        output_dir = filedialog.askdirectory(title="Output folder (shared by all nodes)")
+        if not output_dir:
+            return
+        queue_dir = filedialog.askdirectory(title="Farm queue folder (shared by all nodes)")
+        if not queue_dir:
+            return
 
-            except Exception as e:
-                print("ERROR:", e)
+        self.ui("Writing farm queue...", 0, "orange")
+        try:
+            count = build_farm_queue(
+                queue_dir,
+                self.image_folder,
+                output_dir,
+                self.seed_entry.get().strip() or DEFAULT_SEED,
+                self.audio_path,
+                float(self.offset_entry.get().strip() or DEFAULT_AUDIO_OFFSET) if self.audio_path else 0.0,
+                self.lut_paths,
+                self.draft.get(),
+                job,
+                self.ken_burns.get(),
+            )
+        except (ValueError, RuntimeError, OSError) as e:
+            print("ERROR:", e)
+            self.ui("Could not write the farm queue ❌", None, "red")
+            return
 
-        self.ui("✅ Batch Export Completed!", 100, "green")
+        self.ui(f"✅ Queued {count} item(s) for the render farm", 100, "green")
 
 
 # =========================
 # RUN APP
 # =========================
-root = tk.Tk()
-app = BatchVerticalExporter(root)
-root.mainloop()
+if __name__ == "__main__":
+    root = tk.Tk()
+    app = BatchVerticalExporter(root)
+    root.mainloop()
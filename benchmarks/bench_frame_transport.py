@@ -0,0 +1,125 @@
+"""
+Throughput of handing rendered frames from a worker process to the
+encoding process: a pickling multiprocessing.Queue versus the shared-memory
+FrameRing in frame_transport.py.
+
+Each producer fills frames in place (as the render workers do) and the
+consumer touches every frame, so both sides pay for the memory traffic a
+real encoder would.
+
+Usage:
+    python benchmarks/bench_frame_transport.py
+    python benchmarks/bench_frame_transport.py --frames 480 --producers 2
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+sys.path.insert(0, REPO_ROOT)
+
+from frame_transport import FramePipeline  # noqa: E402
+
+FRAME_SHAPE = (1920, 1088, 3)  # height, width, channels
+CHUNK_FRAMES = 28              # one effect transition
+
+
+# =========================
+# PRODUCERS
+# =========================
+def fill_ring_chunk(chunk, ring):
+    for k in range(CHUNK_FRAMES):
+        with ring.write_slot() as slot:
+            slot.fill((chunk + k) & 0xFF)
+
+
+def queue_producer(queue, chunks):
+    frame = np.empty(FRAME_SHAPE, dtype=np.uint8)
+    for chunk in chunks:
+        for k in range(CHUNK_FRAMES):
+            frame.fill((chunk + k) & 0xFF)
+            queue.put(frame)
+
+
+# =========================
+# CONSUMERS
+# =========================
+def run_queue(chunk_count, producers):
+    context = multiprocessing.get_context("spawn")
+    queues = [context.Queue(maxsize=4) for _ in range(producers)]
+    procs = [
+        context.Process(target=queue_producer, args=(q, list(range(w, chunk_count, producers))))
+        for w, q in enumerate(queues)
+    ]
+    for p in procs:
+        p.start()
+
+    start = time.perf_counter()
+    checksum = 0
+    for chunk in range(chunk_count):
+        queue = queues[chunk % producers]
+        for _ in range(CHUNK_FRAMES):
+            checksum += int(queue.get()[0, 0, 0])
+    elapsed = time.perf_counter() - start
+
+    for p in procs:
+        p.join()
+    return elapsed, checksum
+
+
+def run_ring(chunk_count, producers):
+    pipeline = FramePipeline(FRAME_SHAPE, [CHUNK_FRAMES] * chunk_count, fill_ring_chunk, producers)
+    with pipeline as frames:
+        start = time.perf_counter()
+        checksum = 0
+        for frame in frames:
+            checksum += int(frame[0, 0, 0])
+        elapsed = time.perf_counter() - start
+    return elapsed, checksum
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--frames", type=int, default=280, help="frames per run (rounded to whole chunks)")
+    parser.add_argument("--producers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument("--output", help="JSON results path (default: benchmarks/results/)")
+    args = parser.parse_args(argv)
+
+    chunk_count = max(1, args.frames // CHUNK_FRAMES)
+    frames = chunk_count * CHUNK_FRAMES
+    mb = np.prod(FRAME_SHAPE) * frames / 1e6
+
+    results = {}
+    for name, run in [("pickling_queue", run_queue), ("shared_memory_ring", run_ring)]:
+        elapsed, checksum = run(chunk_count, args.producers)
+        results[name] = {
+            "frames": frames,
+            "seconds": elapsed,
+            "fps": frames / elapsed,
+            "mb_per_s": mb / elapsed,
+            "checksum": checksum,
+        }
+        print(f"{name:20s} {frames / elapsed:8.1f} frames/s   {mb / elapsed:9.1f} MB/s")
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"frame_transport-{stamp}.json")
+
+    with open(output, "w") as f:
+        json.dump({"producers": args.producers, "shape": FRAME_SHAPE, "results": results}, f, indent=2)
+    print(f"\nResults saved to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+"""
+Micro-benchmarks for the per-frame hot functions of the shorts generators.
+
+Runs headless (no Tk window is created) on a CPU-only box. Inputs are
+synthetic and seeded, at the real export sizes (1088x1920 and 1080x1080),
+so two runs on the same machine are directly comparable.
+
+Grading, blending and fitting are timed once per render_engine backend
+("grade[opencv,1088x1920]"), and each backend's output is checked against
+the "pil" reference; the largest per-channel difference is reported as
+`max_diff`.
+
+Usage:
+    python benchmarks/bench_hot_functions.py
+    python benchmarks/bench_hot_functions.py --repeat 20 --filter blend
+    python benchmarks/bench_hot_functions.py --filter opencv
+    python benchmarks/bench_hot_functions.py --compare benchmarks/results/old.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import cv2
+from PIL import Image
+import PIL
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# the scripts import their shared helpers from the repo root
+sys.path.insert(0, REPO_ROOT)
+
+from lut import EffectBaker, apply_lut  # noqa: E402
+from render_engine import (  # noqa: E402
+    BACKENDS, TRANSITIONS, CaptionTrack, Cue, KenBurns, caption_bars, floating_caption,
+)
+
+SEED = 1234
+
+VERTICAL_SIZE = (1088, 1920)   # width, height
+SQUARE_SIZE = (1080, 1080)
+LANDSCAPE_SOURCE = (1920, 1080)
+PHOTO_SOURCE = (4032, 3024)
+
+
+# =========================
+# SYNTHETIC INPUTS
+# =========================
+def synthetic_frame(width, height, seed=SEED):
+    """
+    Deterministic RGB frame: smooth gradients plus seeded noise, so the
+    encoders and PIL enhancers see photo-like, non-constant content.
+    """
+    rng = np.random.default_rng(seed)
+    y = np.linspace(0, 1, height, dtype=np.float32)[:, None]
+    x = np.linspace(0, 1, width, dtype=np.float32)[None, :]
+
+    frame = np.empty((height, width, 3), dtype=np.float32)
+    frame[:, :, 0] = 255 * x
+    frame[:, :, 1] = 255 * y
+    frame[:, :, 2] = 255 * (0.5 + 0.5 * np.sin(8 * x + 5 * y))
+    frame += rng.normal(0, 12, size=frame.shape).astype(np.float32)
+
+    return np.clip(frame, 0, 255).astype(np.uint8)
+
+
+def synthetic_image(width, height, seed=SEED):
+    return Image.fromarray(synthetic_frame(width, height, seed))
+
+
+# =========================
+# CASES
+# =========================
+def crossfade(backend, a, b, steps):
+    """
+    One exporter transition: `steps` blends written into a reused frame.
+    """
+    dst = np.empty_like(a)
+    for step in range(steps):
+        backend.blend(a, b, step / steps, dst)
+    return dst
+
+
+def transition(fn, a, b, steps):
+    """
+    One slideshow transition: `steps` frames written into a reused frame.
+    """
+    dst = np.empty_like(a)
+    for step in range(steps):
+        fn(a, b, step / steps, dst)
+    return dst
+
+
+def build_cases():
+    """
+    Return a list of (name, callable) pairs. Inputs are built once up front
+    so only the function under test is timed.
+    """
+    vertical_img = synthetic_image(*VERTICAL_SIZE)
+    square_img = synthetic_image(*SQUARE_SIZE)
+    photo_img = synthetic_image(*PHOTO_SOURCE)
+
+    vertical_a = synthetic_frame(*VERTICAL_SIZE, seed=SEED)
+    vertical_b = synthetic_frame(*VERTICAL_SIZE, seed=SEED + 1)
+    square_a = synthetic_frame(*SQUARE_SIZE, seed=SEED)
+    square_b = synthetic_frame(*SQUARE_SIZE, seed=SEED + 1)
+    landscape = synthetic_frame(*LANDSCAPE_SOURCE)
+
+    # mid-schedule looks: generate_effects()[25] and [24] of 60_seconds.py
+    # (with warmth, then inverted) and generate_filters()[25] of the pro GUI
+    effect = (1.322, 1.524, 1.786, 2, False)
+    inverted = (1.278, 1.476, 1.714, -3, True)
+    look = (1.008, 1.008, 1.114)
+    baked = EffectBaker(vertical_img).bake(*effect)
+
+    motion = KenBurns(VERTICAL_SIZE)
+    pyramid = motion.pyramid(synthetic_frame(*motion.source_size()))
+    subtitles = CaptionTrack([Cue(i, i + 0.9, f"Subtitle cue number {i}") for i in range(500)])
+    subtitles.prepare(VERTICAL_SIZE[0])
+    subtitle_frame = vertical_a.copy()
+
+    cases = []
+    for name, backend in BACKENDS.items():
+        cases += [
+            (f"grade[{name},1088x1920]", lambda b=backend: b.grade(vertical_img, effect)),
+            (f"grade[{name},1080x1080]", lambda b=backend: b.grade(square_img, effect)),
+            (f"grade_invert[{name},1088x1920]", lambda b=backend: b.grade(vertical_img, inverted)),
+            (f"grade_filter[{name},1080x1080]", lambda b=backend: b.grade(square_img, look)),
+            (f"crossfade[{name},1088x1920,x28]", lambda b=backend: crossfade(b, vertical_a, vertical_b, 28)),
+            (f"crossfade[{name},1080x1080,x6]", lambda b=backend: crossfade(b, square_a, square_b, 6)),
+            (f"fit[{name},4032x3024->1088x1920]", lambda b=backend: b.fit(photo_img, VERTICAL_SIZE)),
+            (f"fit_frame[{name},1920x1080->1088x1920]",
+             lambda b=backend: b.fit_frame(landscape, VERTICAL_SIZE)),
+        ]
+
+    for name, fn in TRANSITIONS.items():
+        cases.append(
+            (f"transition_{name}[1088x1920,x12]", lambda t=fn: transition(t, vertical_a, vertical_b, 12))
+        )
+
+    return cases + [
+        ("apply_lut[1088x1920]", lambda: apply_lut(vertical_img, baked)),
+        ("bake_effect_lut[33^3]", lambda: EffectBaker(vertical_img).bake(*effect)),
+        ("floating_caption[1088x1920]", lambda: floating_caption(vertical_a, "Follow for More", 37)),
+        ("caption_bars[1088x1920]", lambda: caption_bars(vertical_a, "TOP CAPTION", "FOLLOW FOR MORE")),
+        ("subtitle_track[1088x1920,500 cues]", lambda: subtitles.draw(subtitle_frame, 137.5)),
+        ("ken_burns_warp[1360x2400->1088x1920]", lambda: motion.warp(pyramid, 2, 0.37)),
+    ]
+
+
+def reference_name(name):
+    """
+    The "pil" counterpart of a per-backend case name, or None.
+    """
+    if "[" not in name:
+        return None
+    head, args = name.split("[", 1)
+    backend, _, rest = args.partition(",")
+    if backend not in BACKENDS or backend == "pil":
+        return None
+    return f"{head}[pil,{rest}"
+
+
+# =========================
+# TIMING
+# =========================
+def time_case(fn, repeat, warmup):
+    """
+    Timing stats, and the output of one extra untimed run.
+    """
+    output = fn()
+    for _ in range(warmup):
+        fn()
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000.0)
+
+    stats = {
+        "repeat": repeat,
+        "min_ms": min(samples),
+        "median_ms": statistics.median(samples),
+        "mean_ms": statistics.fmean(samples),
+        "stdev_ms": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+    }
+    return stats, output
+
+
+def environment():
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pillow": PIL.__version__,
+        "opencv": cv2.__version__,
+        "opencv_threads": cv2.getNumThreads(),
+        "seed": SEED,
+    }
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+
+    print(f"\n{'case':44s} {'baseline':>10s} {'now':>10s} {'speedup':>8s}")
+    for name, stats in results.items():
+        if name not in baseline:
+            continue
+        old = baseline[name]["median_ms"]
+        new = stats["median_ms"]
+        print(f"{name:44s} {old:9.2f}ms {new:9.2f}ms {old / new:7.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=10, help="timed runs per case")
+    parser.add_argument("--warmup", type=int, default=2, help="untimed runs per case")
+    parser.add_argument("--filter", default="", help="only run cases containing this text")
+    parser.add_argument("--output", help="JSON results path (default: benchmarks/results/)")
+    parser.add_argument("--compare", help="previous JSON results to compare against")
+    args = parser.parse_args(argv)
+
+    results = {}
+    outputs = {}
+    for name, fn in build_cases():
+        reference = reference_name(name)
+        if args.filter and args.filter not in name and not (reference and args.filter in reference):
+            continue
+        stats, outputs[name] = time_case(fn, args.repeat, args.warmup)
+
+        line = f"{name:44s} median {stats['median_ms']:9.2f} ms   min {stats['min_ms']:9.2f} ms"
+        if reference in outputs:
+            diff = np.abs(np.asarray(outputs[name], dtype=np.int16) - np.asarray(outputs[reference], dtype=np.int16))
+            stats["max_diff"] = int(diff.max())
+            line += f"   max diff vs pil {stats['max_diff']:3d}"
+        results[name] = stats
+        print(line)
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"hot_functions-{stamp}.json")
+
+    with open(output, "w") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
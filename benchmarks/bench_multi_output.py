@@ -0,0 +1,123 @@
+"""
+Cost of exporting one timeline in three formats (9:16, 1:1, 4:5): three
+separate renders, each grading, blending and encoding at its own size,
+versus one render at the master size fanned out to three encoders
+(render_engine.outputs).
+
+The timeline is the exporters' crossfade schedule, shortened with
+--seconds; the source is a seeded synthetic 4032x3024 photo. Each variant
+is timed twice: rendering only (frames are produced and dropped) and end
+to end with the exporters' default imageio/x264 settings. On a machine with
+fewer cores than encoders, the side-by-side encodes compete for the CPU and
+the end-to-end gain shrinks to the render savings.
+
+Usage:
+    python benchmarks/bench_multi_output.py
+    python benchmarks/bench_multi_output.py --seconds 10 --draft
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_hot_functions import synthetic_image  # noqa: E402
+from render_engine import Grader, Output, Renderer, Timeline, fit_master, get_backend, master_plan  # noqa: E402
+from render_modes import DRAFT, FINAL  # noqa: E402
+
+FORMATS = {"9x16": (1088, 1920), "1x1": (1088, 1088), "4x5": (1088, 1360)}
+FPS = 24
+FRAMES_PER_LOOK = 28
+LOOKS = [(0.6 + 0.05 * i, 0.8 + 0.04 * i, 0.5 + 0.1 * i, -60 + 10 * i, i % 12 == 0) for i in range(50)]
+
+
+def timeline_for(img, seconds, backend):
+    looks = LOOKS[:max(2, seconds * FPS // FRAMES_PER_LOOK + 1)]
+    return Timeline(Grader(img, backend), looks, FRAMES_PER_LOOK, total=seconds * FPS, backend=backend)
+
+
+def run_separate(source, sizes, seconds, mode, folder, encode=True):
+    backend = get_backend()
+    start = time.perf_counter()
+    for name, size in sizes.items():
+        base = backend.fit(source, size)
+        renderer = Renderer(timeline_for(base, seconds, backend))
+        if encode:
+            renderer.write(os.path.join(folder, f"separate_{name}.mp4"), FPS, mode.writer_kwargs())
+        else:
+            for _ in renderer.frames():
+                pass
+    return time.perf_counter() - start
+
+
+def run_fan_out(source, sizes, seconds, mode, folder, encode=True):
+    backend = get_backend()
+    start = time.perf_counter()
+    outputs = [
+        Output(os.path.join(folder, f"fan_out_{name}.mp4"), size, writer_kwargs=mode.writer_kwargs())
+        for name, size in sizes.items()
+    ]
+    master = Renderer(timeline_for(fit_master(source, list(sizes.values())), seconds, backend))
+    if encode:
+        master.write_outputs(outputs, FPS)
+    else:
+        streams = [Renderer(output.timeline(master.timeline)).frames() for output in outputs]
+        for _ in zip(*streams):
+            pass
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--seconds", type=int, default=5, help="timeline length")
+    parser.add_argument("--draft", action="store_true", help="half size, fast x264 preset")
+    parser.add_argument("--output", help="JSON results path (default: benchmarks/results/)")
+    args = parser.parse_args(argv)
+
+    mode = DRAFT if args.draft else FINAL
+    sizes = {name: mode.size(*size) for name, size in FORMATS.items()}
+    source = synthetic_image(4032, 3024)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        for encode, label in ((False, "render_only"), (True, "end_to_end")):
+            separate = run_separate(source, sizes, args.seconds, mode, folder, encode)
+            fan_out = run_fan_out(source, sizes, args.seconds, mode, folder, encode)
+            results[label] = {"separate_s": separate, "fan_out_s": fan_out}
+
+    _, master_size = master_plan(source.size, list(sizes.values()))
+    print(f"backend {get_backend().name}, {args.seconds}s at {FPS} fps, {mode.name}, "
+          f"master {master_size[0]}x{master_size[1]}")
+    print(f"{'':12s} {'3 renders':>10s} {'fan-out':>10s} {'speedup':>8s}")
+    for label, row in results.items():
+        print(f"{label:12s} {row['separate_s']:9.2f}s {row['fan_out_s']:9.2f}s "
+              f"{row['separate_s'] / row['fan_out_s']:7.2f}x")
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"multi_output-{stamp}.json")
+
+    with open(output, "w") as f:
+        json.dump({
+            "backend": get_backend().name,
+            "seconds": args.seconds,
+            "mode": mode.name,
+            "master_size": master_size,
+            "results": results,
+        }, f, indent=2)
+    print(f"\nResults saved to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+Start-up time of the GUI scripts: from launching the interpreter to the
+window being drawn, with the heavy libraries loaded lazily (as shipped) and
+eagerly (imported up front, as the scripts used to).
+
+Each run is a fresh interpreter that executes the script as __main__ with
+`mainloop()` replaced by one `update()` and an exit, so the time covers
+imports, building the widgets and mapping the window. Without a display the
+window cannot be created; the run then stops after the imports and the
+result is marked "import only".
+
+Page cache is left warm on purpose (the first run of each script is a
+discarded warm-up), so the numbers compare code paths rather than disks.
+
+Usage:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --repeat 10 --filter music
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# script -> heavy libraries it loaded at import time (directly or through
+# segments.py/preview_engine.py) before they went lazy
+SCRIPTS = {
+    "60_seconds.py": ["cv2", "imageio"],
+    "music_vid_60.py": ["cv2", "imageio", "moviepy"],
+    "batch_vertical_60s_text_random.py": ["cv2", "imageio"],
+    "fifty_shades_pro_gui.py": ["cv2", "imageio", "tqdm"],
+    "images_to_shorts_gui.py": ["cv2", "imageio", "moviepy"],
+    "video_audio_replace_gui.py": ["moviepy"],
+    "fifty_shades_gui.py": ["cv2", "requests", "bs4"],
+    "Advanced_MP4/advanced_mp4_shorts_editor_gui.py": ["cv2", "imageio", "moviepy"],
+}
+
+# runs in the child interpreter: argv = script, "lazy" | "eager", modules...
+CHILD = r"""
+import os, runpy, sys, tkinter
+
+script, how, heavy = sys.argv[1], sys.argv[2], sys.argv[3:]
+sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+
+if how == "eager":
+    for name in heavy:
+        __import__(name)
+
+def shown(self, n=0):
+    self.update()
+    print("window", flush=True)
+    os._exit(0)
+
+tkinter.Misc.mainloop = shown
+try:
+    runpy.run_path(script, run_name="__main__")
+except tkinter.TclError:
+    print("import only", flush=True)
+    os._exit(0)
+"""
+
+
+def launch(script, how):
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", CHILD, os.path.join(REPO_ROOT, script), how, *SCRIPTS[script]],
+        cwd=REPO_ROOT, capture_output=True, text=True,
+    )
+    elapsed = time.perf_counter() - start
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "no output")
+    return elapsed, lines[-1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--filter", default="", help="only scripts whose path contains this")
+    parser.add_argument("--output", help="JSON results path (default: benchmarks/results/)")
+    args = parser.parse_args(argv)
+
+    results = {}
+    print(f"{'script':48s} {'lazy ms':>9s} {'eager ms':>9s} {'ratio':>6s}  measured")
+    for script in SCRIPTS:
+        if args.filter not in script:
+            continue
+        try:
+            row = {}
+            for how in ("lazy", "eager"):
+                launch(script, how)  # warm-up
+                runs = [launch(script, how) for _ in range(args.repeat)]
+                row[how] = statistics.median(seconds for seconds, _ in runs) * 1000
+                row["measured"] = runs[-1][1]
+        except RuntimeError as e:
+            print(f"{script:48s} skipped: {e}")
+            continue
+
+        results[script] = row
+        print(f"{script:48s} {row['lazy']:9.0f} {row['eager']:9.0f} "
+              f"{row['lazy'] / row['eager']:6.2f}  {row['measured']}")
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"startup-{stamp}.json")
+
+    with open(output, "w") as f:
+        json.dump({"repeat": args.repeat, "results": results}, f, indent=2)
+    print(f"\nResults saved to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
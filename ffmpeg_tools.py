@@ -0,0 +1,158 @@
+"""
+Thin helpers around the ffmpeg binary that imageio already ships with
+(imageio-ffmpeg), for container-level work that needs no re-encode.
+"""
+import os
+import subprocess
+import tempfile
+from contextlib import nullcontext
+
+import numpy as np
+
+
+def ffmpeg_exe():
+    """
+    Path to ffmpeg: $IMAGEIO_FFMPEG_EXE, then the imageio-ffmpeg binary,
+    then whatever is on PATH.
+    """
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except (ImportError, RuntimeError):
+        return "ffmpeg"
+
+
+def run_ffmpeg(args, job=None):
+    """
+    Run ffmpeg quietly, overwriting outputs. Raises RuntimeError with
+    ffmpeg's own message on failure. Cancelling `job` (a RenderJob)
+    kills ffmpeg at once.
+    """
+    cmd = [ffmpeg_exe(), "-hide_banner", "-loglevel", "error", "-nostdin", "-y", *args]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    with job.cancel_hook(proc.kill) if job else nullcontext():
+        _, stderr = proc.communicate()
+
+    if job:
+        job.check()
+    if proc.returncode != 0:
+        message = stderr.decode("utf-8", errors="replace").strip()
+        raise RuntimeError(f"ffmpeg failed ({proc.returncode}): {message}")
+
+
+def read_gray_frames(path, size, fps, start=0.0, duration=None, job=None):
+    """
+    Yield the video of `path` as uint8 greyscale frames of `size` (w, h)
+    at `fps`, starting `start` seconds in. ffmpeg decodes and scales, so
+    only the small frames cross the pipe. Cancelling `job` kills ffmpeg.
+    """
+    width, height = size
+    args = ["-ss", f"{start:.3f}", "-i", path]
+    if duration is not None:
+        args += ["-t", f"{duration:.3f}"]
+    args += [
+        "-an", "-vf", f"fps={fps},scale={width}:{height}:flags=area",
+        "-f", "rawvideo", "-pix_fmt", "gray", "-",
+    ]
+    cmd = [ffmpeg_exe(), "-hide_banner", "-loglevel", "error", "-nostdin", *args]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    frame_bytes = width * height
+    try:
+        with job.cancel_hook(proc.kill) if job else nullcontext():
+            while True:
+                data = proc.stdout.read(frame_bytes)
+                if len(data) < frame_bytes:
+                    break
+                yield np.frombuffer(data, np.uint8).reshape(height, width)
+        proc.wait()
+    finally:
+        if proc.poll() is None:  # the caller stopped early
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+
+    if job:
+        job.check()
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg could not decode {path} ({proc.returncode})")
+
+
+def prepare_soundtrack(audio_path, duration, output_path, codec="aac", bitrate="192k", fade=0.0, job=None):
+    """
+    Loop or trim `audio_path` to `duration` seconds, optionally fading in
+    and out over `fade` seconds, and encode it once, so every video of a
+    batch can mux it with stream copy.
+    """
+    args = ["-stream_loop", "-1", "-i", audio_path, "-t", f"{duration:.3f}", "-vn"]
+    if fade > 0:
+        args += ["-af", f"afade=t=in:d={fade:.3f},afade=t=out:st={max(0.0, duration - fade):.3f}:d={fade:.3f}"]
+    run_ffmpeg([*args, "-c:a", codec, "-b:a", bitrate, output_path], job)
+
+
+def remux(video_path, output_path, audio_path=None, video_start=0.0, audio_start=0.0, duration=None,
+          loop_video=False, audio_codec="copy", job=None):
+    """
+    Write the first video stream of `video_path` from `video_start` (looped
+    with `loop_video`) and the first audio stream of `audio_path` from
+    `audio_start`, if given, to `output_path` without re-encoding the video.
+    The output is `duration` seconds long, or ends with the shorter stream.
+    A copy starts exactly at `video_start` only on a keyframe (see
+    media_probe). Several processes may write to the same output.
+    """
+    args = ["-stream_loop", "-1"] if loop_video else []
+    args += ["-ss", f"{video_start:.3f}", "-i", video_path]
+    if audio_path:
+        args += ["-ss", f"{audio_start:.3f}", "-i", audio_path, "-map", "0:v:0", "-map", "1:a:0"]
+    else:
+        args += ["-map", "0:v:0"]
+    args += ["-t", f"{duration:.3f}"] if duration is not None else ["-shortest"]
+    args += ["-c:v", "copy", "-c:a", audio_codec]
+
+    fd, tmp_output = tempfile.mkstemp(
+        prefix=".muxing-", suffix=".mp4", dir=os.path.dirname(os.path.abspath(output_path)),
+    )
+    os.close(fd)
+    os.remove(tmp_output)  # let ffmpeg create it with the usual permissions
+    try:
+        run_ffmpeg([*args, "-movflags", "+faststart", tmp_output], job)
+        os.replace(tmp_output, output_path)
+    finally:
+        if os.path.exists(tmp_output):
+            os.remove(tmp_output)
+
+
+def mux_audio(video_path, audio_path, output_path, offset=0.0, job=None):
+    """
+    Put the audio of `audio_path`, starting `offset` seconds in, under the
+    video of `video_path` without re-encoding either. The output ends with
+    the shorter stream. Several processes may mux to the same output.
+    """
+    remux(video_path, output_path, audio_path, audio_start=offset, job=job)
+
+
+def concat_copy(parts, output_path):
+    """
+    Join MP4 parts encoded with identical settings into `output_path` with
+    the concat demuxer and stream copy (no re-encode). The result is
+    written beside the output and moved into place atomically.
+    """
+    folder = os.path.dirname(os.path.abspath(output_path))
+    fd, list_path = tempfile.mkstemp(prefix=".concat-", suffix=".txt", dir=folder)
+    tmp_output = output_path + ".joining.mp4"
+
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for part in parts:
+                escaped = os.path.abspath(part).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+
+        run_ffmpeg([
+            "-f", "concat", "-safe", "0", "-i", list_path,
+            "-c", "copy", "-movflags", "+faststart", tmp_output,
+        ])
+        os.replace(tmp_output, output_path)
+    finally:
+        os.remove(list_path)
+        if os.path.exists(tmp_output):
+            os.remove(tmp_output)
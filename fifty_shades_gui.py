@@ -2,14 +2,16 @@ import os
 import threading
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-
-import requests
-from bs4 import BeautifulSoup
 from urllib.parse import urljoin
 
-import cv2
 from PIL import Image
 
+from lazy_imports import lazy_import
+
+bs4 = lazy_import("bs4")
+cv2 = lazy_import("cv2")
+requests = lazy_import("requests")
+
 
 class FiftyShadesGUI(tk.Tk):
     def __init__(self):
@@ -163,7 +165,7 @@ class FiftyShadesGUI(tk.Tk):
         self.log("🔍 Fetching webpage...")
         resp = requests.get(url)
         resp.raise_for_status()
-        soup = BeautifulSoup(resp.text, "html.parser")
+        soup = bs4.BeautifulSoup(resp.text, "html.parser")
 
         image_tags = soup.find_all("img")
         image_urls = [
@@ -1,10 +1,14 @@
 import os
-import requests
-import cv2
-from bs4 import BeautifulSoup
 from urllib.parse import urljoin
+
 from PIL import Image
 
+from lazy_imports import lazy_import
+
+bs4 = lazy_import("bs4")
+cv2 = lazy_import("cv2")
+requests = lazy_import("requests")
+
 # ============================
 # SETTINGS
 # ============================
@@ -14,72 +18,82 @@ OUTPUT_VIDEO = "fifty_shades_video.mp4"
 SECONDS_PER_IMAGE = 2
 FPS = 30  # Video smoothness
 
-# ============================
-# CREATE IMAGE FOLDER
-# ============================
-os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 # ============================
 # SCRAPE IMAGE URLS
 # ============================
-print("🔍 Fetching webpage...")
-response = requests.get(URL)
-soup = BeautifulSoup(response.text, "html.parser")
+def scrape_image_urls(url=URL):
+    print("🔍 Fetching webpage...")
+    response = requests.get(url)
+    soup = bs4.BeautifulSoup(response.text, "html.parser")
 
-image_tags = soup.find_all("img")
-image_urls = [
-    urljoin(URL, img.get("src"))
-    for img in image_tags
-    if img.get("src")
-]
+    image_tags = soup.find_all("img")
+    image_urls = [
+        urljoin(url, img.get("src"))
+        for img in image_tags
+        if img.get("src")
+    ]
+
+    print(f"✅ Found {len(image_urls)} images")
+    return image_urls
 
-print(f"✅ Found {len(image_urls)} images")
 
 # ============================
 # DOWNLOAD IMAGES
 # ============================
-downloaded_images = []
+def download_images(image_urls, output_dir=OUTPUT_DIR):
+    os.makedirs(output_dir, exist_ok=True)
+    downloaded_images = []
+
+    for i, img_url in enumerate(image_urls):
+        try:
+            img_data = requests.get(img_url).content
+            filename = os.path.join(output_dir, f"img_{i:03d}.jpg")
+
+            with open(filename, "wb") as f:
+                f.write(img_data)
 
-for i, img_url in enumerate(image_urls):
-    try:
-        img_data = requests.get(img_url).content
-        filename = os.path.join(OUTPUT_DIR, f"img_{i:03d}.jpg")
+            downloaded_images.append(filename)
+            print(f"⬇️ Downloaded: {filename}")
 
-        with open(filename, "wb") as f:
-            f.write(img_data)
+        except Exception as e:
+            print(f"❌ Failed to download {img_url}: {e}")
 
-        downloaded_images.append(filename)
-        print(f"⬇️ Downloaded: {filename}")
+    return downloaded_images
 
-    except Exception as e:
-        print(f"❌ Failed to download {img_url}: {e}")
 
 # ============================
 # CREATE VIDEO FROM IMAGES
 # ============================
-if not downloaded_images:
-    print("❌ No images downloaded. Exiting.")
-    exit()
+def images_to_video(downloaded_images, output_video=OUTPUT_VIDEO):
+    # Load first image to get size
+    first_img = Image.open(downloaded_images[0])
+    width, height = first_img.size
+
+    fourcc = cv2.VideoWriter_fourcc(*"mp4v")
+    video = cv2.VideoWriter(output_video, fourcc, FPS, (width, height))
+
+    frames_per_image = FPS * SECONDS_PER_IMAGE
 
-# Load first image to get size
-first_img = Image.open(downloaded_images[0])
-width, height = first_img.size
+    for img_path in downloaded_images:
+        img = cv2.imread(img_path)
 
-fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-video = cv2.VideoWriter(OUTPUT_VIDEO, fourcc, FPS, (width, height))
+        # Resize just in case sizes differ
+        img = cv2.resize(img, (width, height))
 
-frames_per_image = FPS * SECONDS_PER_IMAGE
+        for _ in range(frames_per_image):
+            video.write(img)
 
-for img_path in downloaded_images:
-    img = cv2.imread(img_path)
+    video.release()
 
-    # Resize just in case sizes differ
-    img = cv2.resize(img, (width, height))
 
-    for _ in range(frames_per_image):
-        video.write(img)
+if __name__ == "__main__":
+    downloaded_images = download_images(scrape_image_urls())
 
-video.release()
+    if not downloaded_images:
+        print("❌ No images downloaded. Exiting.")
+        raise SystemExit
 
-print(f"\n🎬 VIDEO CREATED SUCCESSFULLY: {OUTPUT_VIDEO}")
+    images_to_video(downloaded_images)
 
+    print(f"\n🎬 VIDEO CREATED SUCCESSFULLY: {OUTPUT_VIDEO}")
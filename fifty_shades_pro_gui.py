@@ -1,12 +1,15 @@
 import tkinter as tk
 from tkinter import filedialog, ttk
-from PIL import Image, ImageTk, ImageEnhance
-import imageio
-import numpy as np
-import cv2
-from tqdm import tqdm
+from PIL import Image, ImageTk
 import threading
 
+from preview_engine import PreviewCache, PreviewEngine, show_frame
+from lut import EffectBaker, load_cube
+from memory_budget import format_bytes
+from render_engine import Grader, Renderer, Timeline, get_backend
+from render_jobs import RenderJob
+from render_modes import DRAFT, FINAL
+
 # ==============================
 # CONFIG (SAFE + HIGH QUALITY)
 # ==============================
@@ -15,6 +18,8 @@ VIDEO_FPS = 24
 EXPORT_SIZE = 1080   # 1080x1080 video
 PREVIEW_SIZE = 420
 TRANSITION_STEPS = 6  # Smooth blending frames
+PREVIEW_SPEED = 2.0   # 344 timeline frames -> ~7 s preview
+LUT_GRADING = False   # bake generated looks into 3D LUTs (faster, approximate)
 
 
 # ==============================
@@ -36,22 +41,14 @@ def generate_filters():
 
 
 # ==============================
-# IMAGE PROCESSING
+# TIMELINE
 # ==============================
-def apply_filter(img, b, c, s):
-    img = ImageEnhance.Brightness(img).enhance(b)
-    img = ImageEnhance.Contrast(img).enhance(c)
-    img = ImageEnhance.Color(img).enhance(s)
-    return img
-
-
-def blend_frames(a, b, steps):
-    result = []
-    for i in range(steps):
-        alpha = i / steps
-        blended = cv2.addWeighted(a, 1 - alpha, b, alpha, 0)
-        result.append(blended)
-    return result
+def look_timeline(img, looks, baker=None, backend=None):
+    """
+    Keyframe, then TRANSITION_STEPS blends and the next keyframe per look.
+    """
+    backend = backend or get_backend()
+    return Timeline(Grader(img, backend, baker), looks, TRANSITION_STEPS, lead=1, hold=1, backend=backend)
 
 
 # ==============================
@@ -61,16 +58,30 @@ class FiftyShadesPro:
     def __init__(self, root):
         self.root = root
         self.root.title("50 Shades Video Generator – Pro Edition")
-        self.root.geometry("520x700")
+        self.root.geometry("520x905")
         self.root.resizable(False, False)
 
         self.image = None
+        self.preview_engine = None
+        self.preview_cache = None
+        self.job = None
+        self.luts = []
         self.preview_label = tk.Label(root)
         self.preview_label.pack(pady=15)
 
+        self.scrubber = tk.Scale(
+            root, from_=0, to=1, resolution=0.25, orient=tk.HORIZONTAL,
+            length=400, label="Scrub timeline (s)", command=self.scrub_to,
+        )
+        self.scrubber.pack()
+
         tk.Button(root, text="Load Image", command=self.load_image).pack(pady=8)
+        tk.Button(root, text="Load .cube LUTs", command=self.load_luts).pack(pady=8)
         tk.Button(root, text="Preview Animation", command=self.preview).pack(pady=8)
+        self.draft = tk.BooleanVar(value=False)
+        tk.Checkbutton(root, text="Draft quality (fast review)", variable=self.draft).pack(pady=8)
         tk.Button(root, text="Export 1080p MP4", command=self.export_threaded).pack(pady=8)
+        tk.Button(root, text="Cancel", command=self.cancel_export).pack(pady=8)
 
         self.progress = ttk.Progressbar(root, length=400)
         self.progress.pack(pady=15)
@@ -92,34 +103,102 @@ class FiftyShadesPro:
         self.preview_label.configure(image=tk_img)
         self.preview_label.image = tk_img
 
+        # start filling the preview timeline while the user looks around
+        self.stop_preview()
+        self.build_preview_cache(self.filter_schedule())
+
         self.status.config(text="Image loaded ✅", fg="green")
 
+    # --------------------------
+    def load_luts(self):
+        paths = filedialog.askopenfilenames(filetypes=[("3D LUT", "*.cube")])
+        if not paths:
+            return
+
+        try:
+            self.luts = [load_cube(path) for path in paths]
+        except (OSError, ValueError) as e:
+            print("LUT error:", e)
+            self.status.config(text="Could not load LUT ❌", fg="red")
+            return
+
+        if self.image:
+            self.stop_preview()
+            self.build_preview_cache(self.filter_schedule())
+
+        self.status.config(text=f"{len(self.luts)} LUT look(s) loaded ✅", fg="green")
+
+    def filter_schedule(self):
+        """
+        The keyframe looks: loaded LUTs cycled over the 50 slots, or the
+        generated filters when no LUTs are loaded.
+        """
+        if self.luts:
+            return [self.luts[i % len(self.luts)] for i in range(FILTER_COUNT)]
+        return generate_filters()
+
+    # --------------------------
+    def build_preview_cache(self, filters):
+        if self.preview_cache:
+            self.preview_cache.cancel()
+
+        # same layout as export_video: keyframe, then blends + keyframe per filter
+        timeline = look_timeline(self.preview_img, filters)
+        self.preview_cache = PreviewCache(timeline, VIDEO_FPS, key=tuple(filters)).start()
+        self.scrubber.config(to=(len(timeline) - 1) / VIDEO_FPS)
+
+    def stop_preview(self):
+        if self.preview_engine:
+            self.preview_engine.stop()
+
     # --------------------------
     def preview(self):
         if not self.image:
             self.status.config(text="Load an image first ❌", fg="red")
             return
 
-        filters = generate_filters()
+        self.stop_preview()
+
+        filters = self.filter_schedule()
+        if self.preview_cache is None or self.preview_cache.key != tuple(filters):
+            self.build_preview_cache(filters)
+
         self.status.config(text="Previewing...", fg="orange")
 
-        for b, c, s in filters:
-            frame = apply_filter(self.preview_img, b, c, s)
-            tk_frame = ImageTk.PhotoImage(frame)
-            self.preview_label.configure(image=tk_frame)
-            self.preview_label.image = tk_frame
-            self.root.update()
-            self.root.after(80)
+        cache = self.preview_cache
+        self.preview_engine = PreviewEngine(
+            self.root, self.preview_label, cache.frame_at, len(cache.timeline),
+            VIDEO_FPS, speed=PREVIEW_SPEED, on_done=self.preview_done,
+        )
+        self.preview_engine.start()
 
-        self.status.config(text="Preview complete ✅", fg="green")
+    def scrub_to(self, seconds):
+        if not self.preview_cache:
+            return
+
+        self.stop_preview()
+        index = int(float(seconds) * VIDEO_FPS)
+        show_frame(self.preview_label, self.preview_cache.frame_at(index))
+
+    def preview_done(self, dropped):
+        self.status.config(text=f"Preview complete ✅ ({dropped} frames dropped)", fg="green")
 
     # --------------------------
     def export_threaded(self):
-        thread = threading.Thread(target=self.export_video)
+        self.job = RenderJob()
+        thread = threading.Thread(target=self.job.run, args=(self.export_video, self.export_cancelled))
         thread.start()
 
+    def cancel_export(self):
+        if self.job:
+            self.job.cancel()
+
+    def export_cancelled(self):
+        self.progress["value"] = 0
+        self.status.config(text="Export cancelled ⛔", fg="red")
+
     # --------------------------
-    def export_video(self):
+    def export_video(self, job):
         if not self.image:
             self.status.config(text="Load an image first ❌", fg="red")
             return
@@ -128,44 +207,34 @@ class FiftyShadesPro:
         if not path:
             return
 
+        job.start_measuring()
         self.progress["value"] = 0
         self.status.config(text="Rendering 1080p video...", fg="orange")
 
-        base = self.image.resize((EXPORT_SIZE, EXPORT_SIZE))
-        filters = generate_filters()
-
-        writer = imageio.get_writer(path, fps=VIDEO_FPS)
-        frames_written = 0
-
-        prev_frame = None
+        # drafts keep the frame rate: this timeline is counted in frames
+        mode = DRAFT if self.draft.get() else FINAL
+        base = self.image.resize(mode.size(EXPORT_SIZE, EXPORT_SIZE))
+        filters = self.filter_schedule()
 
-        for i, (b, c, s) in enumerate(filters):
-            processed = apply_filter(base, b, c, s)
-            frame = np.array(processed)
+        baker = EffectBaker(base) if LUT_GRADING else None
 
-            if prev_frame is not None:
-                blends = blend_frames(prev_frame, frame, TRANSITION_STEPS)
-                for f in blends:
-                    writer.append_data(f)
-                    frames_written += 1
+        def progress(done, count):
+            self.progress["value"] = (done / count) * 100
 
-            writer.append_data(frame)
-            frames_written += 1
-            prev_frame = frame
-
-            self.progress["value"] = (i / FILTER_COUNT) * 100
-            self.root.update()
-
-        writer.close()
+        job.track(path)
+        renderer = Renderer(look_timeline(base, filters, baker))
+        renderer.write(path, VIDEO_FPS, mode.writer_kwargs(), job, progress=progress)
+        job.release(path)
 
         self.progress["value"] = 100
-        self.status.config(text="1080p MP4 Exported ✅", fg="green")
+        peak = format_bytes(job.stop_measuring())
+        self.status.config(text=f"1080p MP4 Exported ✅ (peak memory {peak})", fg="green")
 
 
 # ==============================
 # RUN
 # ==============================
-root = tk.Tk()
-app = FiftyShadesPro(root)
-root.mainloop()
-
+if __name__ == "__main__":
+    root = tk.Tk()
+    app = FiftyShadesPro(root)
+    root.mainloop()
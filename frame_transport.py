@@ -0,0 +1,186 @@
+"""
+Zero-copy frame transport between render processes.
+
+A 1088x1920 RGB frame is 6 MB; sending it through a multiprocessing.Queue
+pickles it, copies it through a pipe and unpickles it again. Here frames
+live in `multiprocessing.shared_memory` ring buffers instead: producer
+processes write effect/blend/caption results straight into a preallocated
+slot (e.g. `cv2.addWeighted(..., dst=slot)`), and the encoding process
+reads the very same pages.
+
+Each producer owns one ring (single producer, single consumer), guarded by
+two counting semaphores: free slots and filled slots. Work is split into
+chunks (one effect transition, one run of source frames) that are dealt
+round-robin to the producers; the consumer walks the chunks in order and
+reads each from its producer's ring, so frames come out in timeline order
+without any reordering buffer.
+"""
+import multiprocessing
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+
+RING_SLOTS = 4  # frames buffered per producer at most (4 x 6 MB at 1088x1920)
+POLL_SECONDS = 0.5
+
+
+class FrameRing:
+    """
+    Fixed-size ring of uint8 frames in shared memory. Created by the
+    consumer and handed to one producer process as a Process argument.
+    """
+
+    def __init__(self, shape, slots=RING_SLOTS, context=None):
+        context = context or multiprocessing.get_context("spawn")
+        self.shape = tuple(shape)
+        self.slots = slots
+
+        size = int(np.prod(self.shape)) * slots
+        self._shm = shared_memory.SharedMemory(create=True, size=size)
+        self._owner = True
+        self._free = context.Semaphore(slots)
+        self._filled = context.Semaphore(0)
+        self._attach()
+
+    def _attach(self):
+        self._frames = np.ndarray((self.slots, *self.shape), dtype=np.uint8, buffer=self._shm.buf)
+        self._write_pos = 0
+        self._read_pos = 0
+
+    def __getstate__(self):
+        return {
+            "shape": self.shape,
+            "slots": self.slots,
+            "name": self._shm.name,
+            "free": self._free,
+            "filled": self._filled,
+        }
+
+    def __setstate__(self, state):
+        self.shape = state["shape"]
+        self.slots = state["slots"]
+        self._shm = shared_memory.SharedMemory(name=state["name"])
+        self._owner = False
+        self._free = state["free"]
+        self._filled = state["filled"]
+        self._attach()
+
+    # -------------------------
+    @contextmanager
+    def write_slot(self):
+        """
+        Producer side: yields the next free slot to render into. The frame
+        is published when the block exits normally.
+        """
+        self._free.acquire()
+        yield self._frames[self._write_pos % self.slots]
+        self._write_pos += 1
+        self._filled.release()
+
+    def write(self, frame):
+        with self.write_slot() as slot:
+            np.copyto(slot, frame)
+
+    @contextmanager
+    def read_slot(self, alive=None):
+        """
+        Consumer side: yields the oldest published frame, which stays valid
+        until the block exits. `alive()` is polled while waiting so a
+        crashed producer raises instead of hanging.
+        """
+        while not self._filled.acquire(timeout=POLL_SECONDS):
+            if alive is not None and not alive():
+                raise RuntimeError("frame producer exited before finishing its frames")
+
+        try:
+            yield self._frames[self._read_pos % self.slots]
+        finally:
+            self._read_pos += 1
+            self._free.release()
+
+    # -------------------------
+    def close(self):
+        self._frames = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+def _produce(ring, chunks, fill_chunk):
+    try:
+        for chunk in chunks:
+            fill_chunk(chunk, ring)
+    finally:
+        ring.close()
+
+
+class FramePipeline:
+    """
+        with FramePipeline(shape, chunk_sizes, fill_chunk, workers) as frames:
+            for frame in frames:
+                writer.append_data(frame)
+
+    `fill_chunk(chunk_index, ring)` runs in a worker process and must write
+    exactly `chunk_sizes[chunk_index]` frames with `ring.write_slot()` or
+    `ring.write()`. It has to be picklable: a module-level function or a
+    functools.partial of one. Workers are spawned, not forked, so this is
+    safe to use from a GUI's background thread.
+
+    Each yielded frame is a view into shared memory that is recycled on the
+    next iteration; copy it if it must outlive the loop body.
+
+    With a MemoryBudget the producers and ring depth are cut down to fit
+    it, next to the `encoders` encoders fed in this process.
+    """
+
+    def __init__(self, shape, chunk_sizes, fill_chunk, workers, slots=RING_SLOTS, budget=None, encoders=1):
+        self.shape = tuple(shape)
+        self.chunk_sizes = list(chunk_sizes)
+        self.fill_chunk = fill_chunk
+        self.workers = max(1, min(workers, len(self.chunk_sizes)))
+        self.slots = slots
+        if budget is not None:
+            self.workers, self.slots = budget.pipeline(self.workers, int(np.prod(self.shape)), slots, encoders)
+        self._rings = []
+        self._procs = []
+
+    def __len__(self):
+        return sum(self.chunk_sizes)
+
+    def start(self):
+        context = multiprocessing.get_context("spawn")
+        for w in range(self.workers):
+            ring = FrameRing(self.shape, self.slots, context)
+            chunks = list(range(w, len(self.chunk_sizes), self.workers))
+            proc = context.Process(
+                target=_produce, args=(ring, chunks, self.fill_chunk), daemon=True,
+            )
+            proc.start()
+            self._rings.append(ring)
+            self._procs.append(proc)
+        return self
+
+    def __iter__(self):
+        for chunk, size in enumerate(self.chunk_sizes):
+            w = chunk % self.workers
+            ring, proc = self._rings[w], self._procs[w]
+            for _ in range(size):
+                with ring.read_slot(proc.is_alive) as frame:
+                    yield frame
+
+    def close(self):
+        for proc in self._procs:
+            if proc.is_alive():
+                proc.terminate()
+            proc.join()
+        for ring in self._rings:
+            ring.close()
+        self._procs = []
+        self._rings = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
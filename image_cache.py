@@ -0,0 +1,155 @@
+"""
+On-disk cache of decoded, fitted base images as memory-mappable arrays.
+
+Decoding a 12 MP JPEG and fitting it to 1088x1920 was repeated on every
+run of every exporter, and again by every worker process. Fitted frames are stored here as raw `.npy` files
+keyed by the source file's SHA-256, the target size and the fit function,
+so a repeated render, or several worker processes at once, map the same
+pages instead of decoding the JPEG again.
+
+The cache lives in $SHORTS_FIT_CACHE, or ~/.cache/vertical-shorts-maker/
+fitted by default, and is trimmed to FIT_CACHE_MAX_BYTES by evicting the
+least recently used entries. Entries a FittedImageCache has handed out are
+pinned until it releases them, so a run that fetches all of its images
+before opening them never has one evicted under it.
+"""
+import os
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+from render_cache import file_digest, render_key
+from render_profile import RenderProfiler
+
+FIT_CACHE_ENV = "SHORTS_FIT_CACHE"
+FIT_CACHE_MAX_BYTES = 1 << 30  # about 170 fitted 1088x1920 frames
+
+
+def default_cache_dir():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.environ.get(FIT_CACHE_ENV) or os.path.join(base, "vertical-shorts-maker", "fitted")
+
+
+def open_fitted(ref):
+    """
+    A PIL image from a `FittedImageCache.fetch` reference: a cached `.npy`
+    path (mapped read-only) or an image that could not be cached.
+    """
+    if isinstance(ref, Image.Image):
+        return ref
+    return Image.fromarray(np.load(ref, mmap_mode="r"))
+
+
+def fitted_array(ref):
+    """
+    The uint8 RGB array of a `FittedImageCache.fetch` reference. A cached
+    `.npy` is mapped read-only: its pages are read on use and can be
+    dropped again by the OS, rather than every image living on the heap.
+    """
+    if isinstance(ref, Image.Image):
+        return np.asarray(ref)
+    return np.load(ref, mmap_mode="r")
+
+
+class FittedImageCache:
+    def __init__(self, root=None, max_bytes=FIT_CACHE_MAX_BYTES):
+        self.root = root or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.pinned = set()
+
+    def path_for(self, source_path, size, fit):
+        key = render_key(
+            image=file_digest(source_path),
+            size=list(size),
+            fit=fit.__qualname__,
+        )
+        return os.path.join(self.root, key[:2], key + ".npy")
+
+    def fetch(self, source_path, size, fit, profiler=None):
+        """
+        Reference to the fitted RGB frame of `source_path`: decoded and
+        passed through `fit(img, size)` on a miss, mapped from disk on a hit.
+        The reference is small and picklable when caching succeeded, so it
+        can be handed to worker processes; open it with `open_fitted`. It
+        stays pinned (never evicted by this cache) until `release`.
+        """
+        profiler = profiler or RenderProfiler()
+        cached = self.path_for(source_path, size, fit)
+        self.pinned.add(cached)
+
+        if os.path.exists(cached):
+            try:
+                os.utime(cached)  # mark as recently used
+                return cached
+            except OSError:
+                pass
+
+        with profiler.stage("load"):
+            img = Image.open(source_path).convert("RGB")
+        with profiler.stage("fit"):
+            img = fit(img, size)
+
+        try:
+            self._store(cached, np.asarray(img))
+        except OSError as e:
+            print("Fitted image cache store failed:", e)
+            return img
+
+        self.evict()
+        return cached
+
+    def load(self, source_path, size, fit, profiler=None):
+        ref = self.fetch(source_path, size, fit, profiler)
+        self.release(ref)
+        return open_fitted(ref)
+
+    def release(self, ref):
+        """
+        Unpin a `fetch` reference once it has been opened (or is no longer
+        needed), so it may be evicted again.
+        """
+        self.pinned.discard(ref)
+
+    # -------------------------
+    def _store(self, cached, array):
+        folder = os.path.dirname(cached)
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".fit-", suffix=".npy", dir=folder)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, np.ascontiguousarray(array, dtype=np.uint8))
+            os.replace(tmp, cached)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def evict(self):
+        """
+        Delete least recently used entries until the cache fits max_bytes,
+        skipping pinned ones. Workers that still map an evicted file keep
+        their pages; only the name goes away.
+        """
+        entries = []
+        for folder, _, files in os.walk(self.root):
+            for name in files:
+                if not name.endswith(".npy") or name.startswith(".fit-"):
+                    continue
+                path = os.path.join(folder, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path in self.pinned:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
@@ -1,13 +1,19 @@
 import tkinter as tk
 from tkinter import filedialog, ttk
-from PIL import Image
-import imageio
-import numpy as np
-import cv2
 import threading
-from moviepy import VideoFileClip, AudioFileClip
 import os
 
+from ffmpeg_tools import prepare_soundtrack, remux
+from image_cache import FittedImageCache, fitted_array
+from media_probe import probe_media
+from memory_budget import format_bytes
+from render_cache import file_digest, render_key
+from render_engine import TRANSITIONS, FloatingCaption, KenBurns, Renderer, Timeline, get_backend
+from render_jobs import RenderCancelled, RenderJob
+from render_modes import DRAFT, FINAL
+from render_profile import RenderProfiler
+from segments import SegmentedRender
+
 # =========================
 # CONFIG
 # =========================
@@ -18,68 +24,73 @@ TOTAL_FRAMES = VIDEO_SECONDS * VIDEO_FPS
 EXPORT_WIDTH = 1088         # divisible by 16 for codecs
 EXPORT_HEIGHT = 1920        # vertical 9:16
 
+TRANSITION_SECONDS = 0.5    # length of the transition into each image
+TRANSITION_CHOICES = ["Mixed", "Hard cut", *TRANSITIONS]
+
+# floating caption: further left, smaller float, bigger and more opaque text
+CAPTION_STYLE = {"x": 0.1, "amplitude": 20, "font_scale": 1.2, "opacity": 0.7}
+
 
-def fit_to_vertical(img: Image.Image) -> Image.Image:
+def slideshow_segments(num_images: int, total_frames: int = TOTAL_FRAMES) -> list:
     """
-    Center-crop the image to 9:16 ratio and resize to EXPORT_WIDTH x EXPORT_HEIGHT.
+    One (image index, first frame, frame count) segment per image. Images
+    beyond total_frames are dropped; the last segment is padded so the video
+    is exactly total_frames long.
     """
-    img_ratio = img.width / img.height
-    target_ratio = EXPORT_WIDTH / EXPORT_HEIGHT
+    frames_per_image = max(1, total_frames // num_images)
+    used = min(num_images, total_frames)
 
-    if img_ratio > target_ratio:
-        # too wide -> crop left/right
-        new_height = img.height
-        new_width = int(new_height * target_ratio)
-    else:
-        # too tall -> crop top/bottom
-        new_width = img.width
-        new_height = int(new_width / target_ratio)
+    segments = [(i, i * frames_per_image, frames_per_image) for i in range(used)]
+    last, start, _ = segments[-1]
+    segments[-1] = (last, start, total_frames - start)
+    return segments
 
-    left = (img.width - new_width) // 2
-    top = (img.height - new_height) // 2
-    right = left + new_width
-    bottom = top + new_height
 
-    img = img.crop((left, top, right, bottom))
-    return img.resize((EXPORT_WIDTH, EXPORT_HEIGHT))
+def slideshow_transitions(choice):
+    """
+    Transitions for a TRANSITION_CHOICES entry: the whole library in turn
+    for "Mixed", none for "Hard cut".
+    """
+    if choice == "Mixed":
+        return list(TRANSITIONS.values())
+    if choice == "Hard cut":
+        return []
+    return [TRANSITIONS[choice]]
 
 
-def add_text_overlay(frame: np.ndarray, text: str, frame_index: int) -> np.ndarray:
+def slideshow_renderer(images, text, frames_per_image, total_frames, mode=FINAL, motion=None, transitions=()):
     """
-    Add static (but slightly animated) text overlay near bottom of frame.
+    Each image on screen for frames_per_image frames (the last one up to
+    total_frames) under a floating caption whose animation runs across the
+    whole video. With `transitions` each image after the first comes in
+    over the first TRANSITION_SECONDS of its own slot, with the previous
+    image held underneath; otherwise it cuts. With a
+    KenBurns `motion` each image gets its own pan/zoom; the images must
+    then be fitted to motion.source_size(). `images` are FittedImageCache
+    references, opened on demand, so only the timeline's few memoized
+    keyframes are held in memory.
     """
-    if not text:
-        return frame
-
-    h, w, _ = frame.shape
-    # small vertical float animation for some life
-    y = int(h * 0.9 + 20 * np.sin(frame_index / 12.0))
-
-    overlay = frame.copy()
-    cv2.putText(
-        overlay,
-        text,
-        (int(w * 0.1), y),
-        cv2.FONT_HERSHEY_SIMPLEX,
-        1.2,
-        (255, 255, 255),
-        3,
-        cv2.LINE_AA
+    steps = 0
+    if transitions:
+        steps = min(frames_per_image // 2, round(TRANSITION_SECONDS * mode.fps(VIDEO_FPS)))
+    timeline = Timeline(
+        fitted_array, images, steps, lead=frames_per_image, hold=frames_per_image - steps, total=total_frames,
+        motion=motion, transitions=transitions,
     )
-
-    # blend overlay and base for soft look
-    return cv2.addWeighted(overlay, 0.7, frame, 0.3, 0)
+    caption = FloatingCaption(text, mode.scale, **CAPTION_STYLE)
+    return Renderer(timeline, [caption], index_step=mode.fps_divisor)
 
 
 class ImagesToShortsGUI:
     def __init__(self, root):
         self.root = root
         self.root.title("Images → YouTube Shorts Maker")
-        self.root.geometry("560x320")
+        self.root.geometry("560x450")
         self.root.resizable(False, False)
 
         self.images_folder = None
         self.audio_path = None
+        self.job = None
 
         # UI elements
         tk.Button(root, text="Select Images Folder", command=self.select_images_folder).pack(pady=5)
@@ -93,7 +104,23 @@ class ImagesToShortsGUI:
         self.text_entry.insert(0, "Follow for more ✨")
         self.text_entry.pack(side=tk.LEFT, padx=5)
 
+        self.ken_burns = tk.BooleanVar(value=False)
+        tk.Checkbutton(root, text="Ken Burns pan & zoom", variable=self.ken_burns).pack()
+
+        transition_frame = tk.Frame(root)
+        transition_frame.pack(pady=2)
+        tk.Label(transition_frame, text="Transition:").pack(side=tk.LEFT, padx=5)
+        self.transition = ttk.Combobox(
+            transition_frame, values=TRANSITION_CHOICES, state="readonly", width=14,
+        )
+        self.transition.set("Hard cut")
+        self.transition.pack(side=tk.LEFT, padx=5)
+
+        self.draft = tk.BooleanVar(value=False)
+        tk.Checkbutton(root, text="Draft quality (fast review)", variable=self.draft).pack()
+
         tk.Button(root, text="Create Shorts Video", command=self.start_thread).pack(pady=10)
+        tk.Button(root, text="Cancel", command=self.cancel_build).pack()
 
         self.progress = ttk.Progressbar(root, length=440)
         self.progress.pack(pady=10)
@@ -127,10 +154,18 @@ class ImagesToShortsGUI:
             self.ui("MP3 selected ✅", None, "green")
 
     def start_thread(self):
-        t = threading.Thread(target=self.build_video, daemon=True)
+        self.job = RenderJob()
+        t = threading.Thread(target=self.job.run, args=(self.build_video, self.build_cancelled), daemon=True)
         t.start()
 
-    def build_video(self):
+    def cancel_build(self):
+        if self.job:
+            self.job.cancel()
+
+    def build_cancelled(self):
+        self.ui("Cancelled ⛔", 0, "red")
+
+    def build_video(self, job: RenderJob):
         if not self.images_folder:
             self.ui("Select images folder first ❌", None, "red")
             return
@@ -151,98 +186,94 @@ class ImagesToShortsGUI:
         )
         if not save_path:
             return
+        job.start_measuring()
 
-        temp_path = save_path + ".temp_no_audio.mp4"
+        temp_path = job.track(save_path + ".temp_no_audio.mp4")
+        profiler = RenderProfiler.from_env()
+
+        mode = DRAFT if self.draft.get() else FINAL
+        size = mode.size(EXPORT_WIDTH, EXPORT_HEIGHT)
+        fps = mode.fps(VIDEO_FPS)
+        motion = KenBurns(size) if self.ken_burns.get() else None
+        fit_size = motion.source_size() if motion else size
 
         # Preprocess images to vertical format
         self.ui("Loading and resizing images...", 0, "orange")
-        pil_images = []
+        fitted = FittedImageCache()
+        fitted_images = []
+        image_paths = []
         for img_name in images:
             img_path = os.path.join(self.images_folder, img_name)
+            job.check()
             try:
-                img = Image.open(img_path).convert("RGB")
-                img = fit_to_vertical(img)
-                pil_images.append(img)
+                fitted_images.append(fitted.fetch(img_path, fit_size, get_backend().fit, profiler))
+                image_paths.append(img_path)
             except Exception as e:
                 print("Error loading image:", img_path, e)
                 continue
 
-        if not pil_images:
+        if not fitted_images:
             self.ui("No valid images to use ❌", None, "red")
             return
 
-        num_images = len(pil_images)
-        frames_per_image = max(1, TOTAL_FRAMES // num_images)
-
-        writer = imageio.get_writer(temp_path, fps=VIDEO_FPS)
         overlay_text = self.text_entry.get().strip()
+        transitions = slideshow_transitions(self.transition.get())
+        segments = slideshow_segments(len(fitted_images), VIDEO_SECONDS * fps)
+
+        # one checkpointed segment per image: a re-run resumes after a crash
+        fingerprint = render_key(
+            images=[file_digest(p) for p in image_paths],
+            text=overlay_text,
+            settings=[EXPORT_WIDTH, EXPORT_HEIGHT, VIDEO_FPS, TOTAL_FRAMES],
+            mode=mode.fingerprint(),
+            backend=get_backend().name,
+            motion=motion.fingerprint() if motion else None,
+            transitions=[t.name for t in transitions],
+        )
+        parts = SegmentedRender(temp_path + ".parts", fingerprint, fps, mode.writer_kwargs())
+        job.track(parts.work_dir, resumable=True)
 
-        frame_index = 0
-        total_frames_written = 0
-
-        self.ui("Building video from images...", 0, "orange")
-
-        try:
-            for i, img in enumerate(pil_images):
-                base_frame = np.array(img)
-
-                for _ in range(frames_per_image):
-                    if total_frames_written >= TOTAL_FRAMES:
-                        break
-
-                    frame = base_frame.copy()
-                    frame = add_text_overlay(frame, overlay_text, frame_index)
-                    writer.append_data(frame)
-
-                    frame_index += 1
-                    total_frames_written += 1
-
-                progress = (total_frames_written / TOTAL_FRAMES) * 70  # first 70% for video
-                self.ui(value=progress)
+        renderer = slideshow_renderer(
+            fitted_images, overlay_text, segments[0][2], VIDEO_SECONDS * fps, mode, motion, transitions,
+        )
 
-                if total_frames_written >= TOTAL_FRAMES:
-                    break
+        def frames_for_segment(i):
+            _, start, count = segments[i]
+            return (renderer.frame(index, profiler=profiler) for index in range(start, start + count))
 
-            # If still short, pad with last image
-            while total_frames_written < TOTAL_FRAMES:
-                base_frame = np.array(pil_images[-1])
-                frame = add_text_overlay(base_frame, overlay_text, frame_index)
-                writer.append_data(frame)
-                frame_index += 1
-                total_frames_written += 1
-                progress = (total_frames_written / TOTAL_FRAMES) * 70
-                self.ui(value=progress)
+        def progress(done, count):
+            self.ui(value=(done / count) * 70)  # first 70% for video
 
-        finally:
-            writer.close()
+        self.ui("Building video from images...", 0, "orange")
+        parts.render(len(segments), frames_for_segment, progress, profiler, job)
+        parts.join(temp_path, profiler)
+        parts.cleanup()
 
         # Attach audio if provided
         if self.audio_path:
             try:
                 self.ui("Attaching audio...", 85, "orange")
-                video_clip = VideoFileClip(temp_path)
-                audio_clip = AudioFileClip(self.audio_path)
-
-                # Make audio exactly 60 seconds: trim or loop
-                if audio_clip.duration > VIDEO_SECONDS:
-                    audio_clip = audio_clip.subclipped(0, VIDEO_SECONDS)
-                else:
-                    audio_clip = audio_clip.audio_loop(duration=VIDEO_SECONDS)
-
-                final_clip = video_clip.with_audio(audio_clip)
-                final_clip.write_videofile(
-                    save_path,
-                    fps=VIDEO_FPS,
-                    codec="libx264",
-                    audio_codec="aac"
-                )
-
-                video_clip.close()
-                final_clip.close()
-                audio_clip.close()
+                with profiler.stage("audio_mux"):
+                    # Make audio exactly 60 seconds: copy it when it is long
+                    # enough, else trim or loop it into a soundtrack first
+                    soundtrack = self.audio_path
+                    if not probe_media(self.audio_path).audio_fits(VIDEO_SECONDS):
+                        soundtrack = job.track(temp_path + ".soundtrack.m4a")
+                        prepare_soundtrack(self.audio_path, VIDEO_SECONDS, soundtrack, job=job)
+
+                    # the video is stream-copied, not encoded again
+                    job.track(save_path)
+                    remux(temp_path, save_path, soundtrack, duration=VIDEO_SECONDS, job=job)
+                    job.release(save_path)
+
+                if soundtrack != self.audio_path:
+                    os.remove(soundtrack)
                 os.remove(temp_path)
+            except RenderCancelled:
+                raise
             except Exception as e:
                 print("Audio attach error:", e)
+                job.release(save_path)
                 # If audio fails, keep video-only file
                 if os.path.exists(temp_path):
                     os.rename(temp_path, save_path)
@@ -250,7 +281,8 @@ class ImagesToShortsGUI:
             # No audio selected: just rename temp to final
             os.rename(temp_path, save_path)
 
-        self.ui("✅ Shorts video created!", 100, "green")
+        profiler.write(save_path)
+        self.ui(f"✅ Shorts video created! (peak memory {format_bytes(job.stop_measuring())})", 100, "green")
 
 
 if __name__ == "__main__":
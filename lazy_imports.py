@@ -0,0 +1,33 @@
+"""
+Deferred imports for the heavy libraries.
+
+moviepy, imageio, cv2, requests and bs4 together cost most of a GUI's
+start-up, yet none of them is needed until the first export, preview or
+download. `lazy_import(name)` returns the module object right away and
+only executes it on first attribute access, so
+
+    cv2 = lazy_import("cv2")
+
+at the top of a script keeps every `cv2.resize(...)` call site unchanged
+while the window opens before OpenCV has loaded. Worker processes that
+import the script pay the same deferred cost, only for what they use.
+"""
+import importlib.util
+import sys
+
+
+def lazy_import(name):
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -0,0 +1,167 @@
+"""
+3D LUT colour grading for the effect pipeline.
+
+Two ways in:
+
+* `load_cube(path)` reads a standard Adobe/Resolve `.cube` 3D LUT, so a
+  colourist can supply looks without code changes.
+* `bake_lut(transform)` evaluates any per-pixel effect chain once on a
+  lattice of colours and returns it as a LUT. `EffectBaker` does this for
+  the (brightness, contrast, saturation, warmth, invert) looks graded by
+  the render_engine backends.
+
+Either way the result is a PIL `ImageFilter.Color3DLUT`, applied by
+`apply_lut` with a single trilinear-interpolated lookup per pixel in C, so an
+arbitrarily complex grade costs the same as a simple one.
+"""
+import numpy as np
+from PIL import Image, ImageEnhance, ImageFilter, ImageStat
+
+LUT_SIZE = 33          # lattice points per axis (the common .cube size)
+PIVOT_PROXY_SIZE = 256  # longest side of the proxy used for contrast pivots
+
+
+# =========================
+# .cube LOADING
+# =========================
+def load_cube(path):
+    """
+    Parse a `.cube` file into a Color3DLUT. Only 3D LUTs over the default
+    0..1 domain are supported; anything else raises ValueError.
+    """
+    size = None
+    title = None
+    table = []
+
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line_no, raw in enumerate(f, start=1):
+            line = raw.strip()
+            if not line or line.startswith("#"):
+                continue
+
+            keyword = line.split(None, 1)[0].upper()
+            if keyword == "TITLE":
+                title = line[5:].strip().strip('"')
+            elif keyword == "LUT_3D_SIZE":
+                size = int(line.split()[1])
+            elif keyword == "LUT_1D_SIZE":
+                raise ValueError(f"{path}: 1D LUTs are not supported")
+            elif keyword in ("DOMAIN_MIN", "DOMAIN_MAX"):
+                expected = [0.0] * 3 if keyword == "DOMAIN_MIN" else [1.0] * 3
+                if [float(v) for v in line.split()[1:4]] != expected:
+                    raise ValueError(f"{path}: only the 0..1 input domain is supported")
+            elif keyword == "LUT_3D_INPUT_RANGE":
+                if [float(v) for v in line.split()[1:3]] != [0.0, 1.0]:
+                    raise ValueError(f"{path}: only the 0..1 input domain is supported")
+            else:
+                try:
+                    table.append(tuple(float(v) for v in line.split()[:3]))
+                except ValueError:
+                    raise ValueError(f"{path}:{line_no}: unexpected line {line!r}") from None
+
+    if size is None:
+        raise ValueError(f"{path}: missing LUT_3D_SIZE")
+    if not 2 <= size <= 65:
+        raise ValueError(f"{path}: LUT_3D_SIZE must be between 2 and 65, got {size}")
+    if len(table) != size ** 3:
+        raise ValueError(f"{path}: expected {size ** 3} entries, found {len(table)}")
+
+    # .cube and Color3DLUT share the same order: red changes fastest
+    lut = ImageFilter.Color3DLUT(size, table)
+    lut.name = title or path
+    return lut
+
+
+# =========================
+# BAKING
+# =========================
+def lattice_image(size=LUT_SIZE):
+    """
+    An RGB image whose pixels enumerate the LUT lattice in Color3DLUT order
+    (red fastest, then green, then blue).
+    """
+    levels = np.round(np.linspace(0, 255, size)).astype(np.uint8)
+    b, g, r = np.meshgrid(levels, levels, levels, indexing="ij")
+    lattice = np.stack([r, g, b], axis=-1).reshape(size * size, size, 3)
+    return Image.fromarray(np.ascontiguousarray(lattice))
+
+
+def bake_lut(transform, size=LUT_SIZE):
+    """
+    Bake a per-pixel `transform` (RGB PIL image -> RGB PIL image or uint8
+    array) into a Color3DLUT. Transforms whose output depends on other
+    pixels (blur, image-mean contrast) must be made per-pixel first.
+    """
+    out = np.asarray(transform(lattice_image(size)), dtype=np.float32)
+    table = (out.reshape(-1, 3) / 255.0).ravel().tolist()
+    return ImageFilter.Color3DLUT(size, table)
+
+
+def warm_and_invert(frame, warmth, invert):
+    """
+    The numpy tail of a look: shift red/blue by `warmth`, optionally
+    invert. Takes and returns uint8 arrays.
+    """
+    frame = frame.astype(np.int16)
+
+    frame[:, :, 0] = np.clip(frame[:, :, 0] + warmth, 0, 255)
+    frame[:, :, 2] = np.clip(frame[:, :, 2] - warmth, 0, 255)
+
+    if invert:
+        frame = 255 - frame
+
+    return frame.astype(np.uint8)
+
+
+class EffectBaker:
+    """
+    Bakes render_engine looks for one base image into LUTs.
+
+    ImageEnhance.Contrast pivots around the mean grey level of the image it
+    is given, so the look is only per-pixel once that mean is fixed. The
+    baker measures it on a small proxy of the base image (after brightness,
+    as the reference grade does) and bakes the rest exactly. LUTs are memoized per
+    effect tuple.
+    """
+
+    def __init__(self, base_img, size=LUT_SIZE):
+        self.size = size
+        self.proxy = base_img.copy()
+        self.proxy.thumbnail((PIVOT_PROXY_SIZE, PIVOT_PROXY_SIZE))
+        self._luts = {}
+
+    def contrast_pivot(self, brightness):
+        bright = ImageEnhance.Brightness(self.proxy).enhance(brightness)
+        return int(ImageStat.Stat(bright.convert("L")).mean[0] + 0.5)
+
+    def bake(self, b, c, s, warmth, invert):
+        key = (b, c, s, warmth, invert)
+        lut = self._luts.get(key)
+        if lut is not None:
+            return lut
+
+        pivot = self.contrast_pivot(b)
+
+        def transform(img):
+            img = ImageEnhance.Brightness(img).enhance(b)
+            img = Image.blend(Image.new("RGB", img.size, (pivot,) * 3), img, c)
+            img = ImageEnhance.Color(img).enhance(s)
+            return warm_and_invert(np.asarray(img), warmth, invert)
+
+        lut = self._luts[key] = bake_lut(transform, self.size)
+        return lut
+
+
+# =========================
+# APPLICATION
+# =========================
+def apply_lut(img, lut):
+    """
+    Grade a PIL RGB image with a Color3DLUT; returns a uint8 array like
+    Backend.grade does.
+    """
+    return np.asarray(img.filter(lut))
+
+
+def is_lut(effect):
+    return isinstance(effect, ImageFilter.Color3DLUT)
@@ -0,0 +1,245 @@
+"""
+Persistent cache of what ffmpeg knows about a media file: duration, the
+first video and audio stream, and (on request) the keyframe timestamps.
+
+Opening a clip with moviepy just to learn its duration or fps runs ffmpeg
+over the file every time, and trimming without knowing where keyframes
+are forces a re-encode. Probes are stored as small JSON files keyed by the
+file's path, size and mtime, so an already-seen file is probed for free,
+and the keyframe index tells a trim whether stream copy will be exact:
+
+    info = probe_media("talk.mp4", keyframes=True)
+    if info.on_keyframe(start):
+        remux("talk.mp4", out, video_start=start, duration=30)
+
+imageio-ffmpeg ships no ffprobe, so streams are read from ffmpeg's input
+summary and keyframes from a packet scan (`-c copy -f framecrc`, no
+decode). The cache lives in $SHORTS_MEDIA_PROBE, or
+~/.cache/vertical-shorts-maker/probes by default.
+"""
+import hashlib
+import json
+import os
+import re
+import subprocess
+import tempfile
+from bisect import bisect_right
+from contextlib import nullcontext
+from fractions import Fraction
+
+from ffmpeg_tools import ffmpeg_exe
+
+MEDIA_PROBE_ENV = "SHORTS_MEDIA_PROBE"
+
+# bump when the probe format or parsing changes
+PROBE_VERSION = 1
+
+MP4_AUDIO_CODECS = {"aac", "mp3"}  # audio an MP4 can take by stream copy
+
+_DURATION = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)(?:, start: (-?\d+(?:\.\d+)?))?")
+_VIDEO = re.compile(r"Stream #\d+:\d+\S*: Video: (\w+).*?, (\d+)x(\d+)")
+_FPS = re.compile(r"([\d.]+) (?:fps|tbr)")
+_AUDIO = re.compile(r"Stream #\d+:\d+\S*: Audio: (\w+).*?, (\d+) Hz, ([^,]+)")
+
+_memo = {}
+
+
+def default_cache_dir():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.environ.get(MEDIA_PROBE_ENV) or os.path.join(base, "vertical-shorts-maker", "probes")
+
+
+class MediaInfo:
+    """
+    Probe of one file. `video` is {"codec", "width", "height", "fps"} and
+    `audio` {"codec", "sample_rate", "channels"} for the first stream of
+    each kind, or None. `keyframes` are video keyframe times in seconds
+    from the start of the file, or None when they were not scanned.
+    """
+
+    def __init__(self, duration, start=0.0, video=None, audio=None, keyframes=None):
+        self.duration = duration
+        self.start = start
+        self.video = video
+        self.audio = audio
+        self.keyframes = keyframes
+
+    def __repr__(self):
+        return f"MediaInfo({self.duration:.3f}s, video={self.video}, audio={self.audio})"
+
+    @property
+    def fps(self):
+        return self.video["fps"] if self.video else None
+
+    @property
+    def size(self):
+        return (self.video["width"], self.video["height"]) if self.video else None
+
+    def keyframe_at(self, seconds):
+        """
+        Time of the last keyframe at or before `seconds` (0.0 before the
+        first, or when keyframes were not scanned).
+        """
+        keyframes = self.keyframes or ()
+        i = bisect_right(keyframes, seconds + 1e-6) - 1
+        return keyframes[i] if i >= 0 else 0.0
+
+    def on_keyframe(self, seconds):
+        """
+        True when a stream copy starting at `seconds` starts exactly there:
+        on a keyframe, to within half a frame.
+        """
+        tolerance = 0.5 / (self.fps or 30)
+        return abs(self.keyframe_at(seconds) - seconds) <= tolerance
+
+    def audio_fits(self, seconds):
+        """
+        True when the audio can go under a `seconds` long MP4 as it is: an
+        MP4 codec, and long enough not to need looping.
+        """
+        return bool(self.audio) and self.audio["codec"] in MP4_AUDIO_CODECS and self.duration >= seconds
+
+    def to_json(self):
+        return {
+            "duration": self.duration, "start": self.start, "video": self.video, "audio": self.audio,
+            "keyframes": self.keyframes,
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data["duration"], data["start"], data["video"], data["audio"], data["keyframes"])
+
+
+def parse_summary(text):
+    """
+    MediaInfo (without keyframes) from the input summary ffmpeg prints for `-i`.
+    """
+    match = _DURATION.search(text)
+    if not match:
+        raise RuntimeError("ffmpeg reported no duration")
+    hours, minutes, seconds, start = match.groups()
+    duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+    video = audio = None
+    for match in _VIDEO.finditer(text):
+        line = text[match.start():].split("\n", 1)[0]
+        if "(attached pic)" in line:  # cover art of an audio file
+            continue
+        fps = _FPS.search(line)
+        video = {
+            "codec": match.group(1),
+            "width": int(match.group(2)),
+            "height": int(match.group(3)),
+            "fps": float(fps.group(1)) if fps else None,
+        }
+        break
+    match = _AUDIO.search(text)
+    if match:
+        audio = {"codec": match.group(1), "sample_rate": int(match.group(2)), "channels": match.group(3).strip()}
+
+    return MediaInfo(duration, float(start or 0.0), video, audio)
+
+
+def probe(path):
+    """
+    Stream metadata of `path`, straight from ffmpeg (uncached).
+    """
+    cmd = [ffmpeg_exe(), "-hide_banner", "-nostdin", "-i", path]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        return parse_summary(proc.stderr.decode("utf-8", errors="replace"))
+    except RuntimeError:
+        raise RuntimeError(f"could not probe {path}") from None
+
+
+def scan_keyframes(path, start=0.0, job=None):
+    """
+    Keyframe times (seconds from the file's `start`) of the first video
+    stream of `path`, from its packet flags. Packets are copied, not
+    decoded, so this reads the file once at disk speed.
+    """
+    cmd = [
+        ffmpeg_exe(), "-hide_banner", "-loglevel", "error", "-nostdin",
+        "-i", path, "-map", "0:v:0", "-c", "copy", "-f", "framecrc", "-",
+    ]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    time_base = Fraction(1)
+    times = []
+    with job.cancel_hook(proc.kill) if job else nullcontext():
+        for raw in proc.stdout:
+            line = raw.decode("ascii", errors="replace")
+            if line.startswith("#tb 0:"):
+                time_base = Fraction(line.split(":", 1)[1].strip())
+            elif not line.startswith("#"):
+                fields = [field.strip() for field in line.split(",")]
+                flags = int(fields[6][2:], 16) if len(fields) > 6 and fields[6].startswith("F=") else 1
+                if flags & 1:  # AV_PKT_FLAG_KEY
+                    times.append(round(float(int(fields[2]) * time_base) - start, 6))
+        proc.wait()
+    proc.stdout.close()
+
+    if job:
+        job.check()
+    if proc.returncode != 0:
+        raise RuntimeError(f"could not scan the keyframes of {path} ({proc.returncode})")
+    return sorted(times)
+
+
+class MediaProbeCache:
+    def __init__(self, root=None):
+        self.root = root or default_cache_dir()
+
+    def path_for(self, path):
+        st = os.stat(path)
+        identity = json.dumps([PROBE_VERSION, os.path.abspath(path), st.st_size, st.st_mtime_ns])
+        key = hashlib.sha256(identity.encode("utf-8")).hexdigest()
+        return os.path.join(self.root, key[:2], key + ".json")
+
+    def info(self, path, keyframes=False, job=None):
+        """
+        MediaInfo of `path`, probed only if this version of the file was
+        never seen; with `keyframes` the keyframe index is scanned (once)
+        too. Edited or replaced files get a new entry.
+        """
+        cached = self.path_for(path)
+        info = _memo.get(cached)
+        if info is None and os.path.exists(cached):
+            try:
+                with open(cached, encoding="utf-8") as f:
+                    info = MediaInfo.from_json(json.load(f))
+            except (OSError, ValueError, KeyError) as e:
+                print("Media probe cache read failed:", e)
+
+        stale = info is None
+        if stale:
+            info = probe(path)
+        if keyframes and info.keyframes is None and info.video:
+            info.keyframes = scan_keyframes(path, info.start, job)
+            stale = True
+
+        _memo[cached] = info
+        if stale:
+            self._store(cached, info)
+        return info
+
+    def _store(self, cached, info):
+        """
+        Write a probe atomically. Failures only cost a future probe, so
+        they are reported and swallowed.
+        """
+        try:
+            os.makedirs(os.path.dirname(cached), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(prefix=".probe-", suffix=".json", dir=os.path.dirname(cached))
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(info.to_json(), f)
+            os.replace(tmp, cached)
+        except OSError as e:
+            print("Media probe cache store failed:", e)
+
+
+def probe_media(path, keyframes=False, job=None):
+    """
+    MediaInfo of `path` from the default probe cache.
+    """
+    return MediaProbeCache().info(path, keyframes, job)
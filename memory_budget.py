@@ -0,0 +1,228 @@
+"""
+Per-job memory budgets and peak memory reporting.
+
+Every RenderJob carries a MemoryBudget: $SHORTS_MEMORY_BUDGET ("1.5G",
+"800M", plain bytes), or half of the machine's RAM by default. The render
+paths size what used to be fixed against it instead of growing until the
+OOM killer steps in:
+
+* worker processes (FramePipeline producers, SegmentedRender workers), at
+  about WORKER_BYTES each plus the frames they have in flight;
+* the depth of the shared-memory frame rings, which shrink to double
+  buffering before a worker is dropped;
+* the memoized keyframes of each timeline copy, which may take up
+  CACHE_FRACTION of a worker's share (never fewer than the two a
+  crossfade needs);
+* the render service, which only starts a queued job while the budgets of
+  the running jobs leave room for it, so jobs wait instead of crashing.
+
+The other in-process caches are left at fixed sizes, counted in
+WORKER_BYTES: caption sprites and glyph atlases (render_engine.text) and
+transition reveal maps (render_engine.transitions) are bounded by entry
+count and are at most a few tens of MB together, whatever the budget.
+FIT_CACHE_MAX_BYTES bounds disk use, not memory: fitted images are mapped
+read-only and the OS can drop their pages at any time.
+
+A MemoryMonitor samples the resident memory of the job's process and its
+children; RenderJob records the peak in `peak_rss_bytes` when the job ends,
+so jobs can be packed onto machines by what they really use.
+"""
+import os
+import re
+import threading
+
+from render_profile import max_rss_bytes
+
+MEMORY_BUDGET_ENV = "SHORTS_MEMORY_BUDGET"
+DEFAULT_FRACTION = 0.5  # of physical RAM, when no budget is set
+WORKER_BYTES = 256 << 20  # one spawned render worker: interpreter, cv2/numpy/moviepy, keyframe memo
+ENCODER_BYTES = 320 << 20  # one ffmpeg x264 encoder at 1088x1920
+MIN_SLOTS = 2  # frame ring depth that still overlaps rendering and encoding
+CACHE_FRACTION = 0.25  # of a worker's share that memoized keyframes may hold
+SAMPLE_SECONDS = 0.25
+
+_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+
+
+def parse_bytes(text):
+    """
+    Bytes in "512M", "1.5G", "2gb" or "1073741824".
+    """
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)(?:I?B)?\s*", str(text), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"not a memory size: {text!r} (e.g. 800M or 1.5G)")
+    number, unit = match.groups()
+    return int(float(number) * _UNITS[unit.upper()])
+
+
+def format_bytes(n):
+    return "unknown" if n is None else f"{n / (1 << 20):.0f} MB"
+
+
+def physical_memory():
+    """
+    Total RAM in bytes, or None where the OS does not say.
+    """
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+# =========================
+# RESIDENT MEMORY
+# =========================
+_PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_bytes(pid="self"):
+    """
+    Resident memory of a process from /proc (Linux), or None.
+    """
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * _PAGE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _children(pid):
+    try:
+        tasks = os.listdir(f"/proc/{pid}/task")
+    except OSError:
+        return []
+    children = []
+    for task in tasks:
+        try:
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                children += f.read().split()
+        except OSError:
+            pass
+    return children
+
+
+def tree_rss_bytes():
+    """
+    Resident memory of this process and all of its descendants (render
+    workers, ffmpeg encoders), or None where /proc is unavailable. Shared
+    memory mapped by several of them is counted once per process.
+    """
+    total = rss_bytes()
+    if total is None:
+        return None
+    pending = _children(os.getpid())
+    while pending:
+        pid = pending.pop()
+        total += rss_bytes(pid) or 0
+        pending += _children(pid)
+    return total
+
+
+class MemoryMonitor:
+    """
+        with MemoryMonitor() as monitor:
+            render()
+        monitor.peak   # bytes
+
+    Samples tree_rss_bytes() in a background thread. Where that is
+    unavailable, `peak` falls back to the process's lifetime peak RSS.
+    """
+
+    def __init__(self, interval=SAMPLE_SECONDS):
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        rss = tree_rss_bytes()
+        if rss is not None:
+            self.peak = max(self.peak or 0, rss)
+        return rss
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        if self._sample() is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._sample()
+        else:
+            self.peak = max_rss_bytes()
+        return self.peak
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# =========================
+# BUDGET
+# =========================
+class MemoryBudget:
+    """
+    A job's memory limit in bytes (`limit` None: unlimited) and how the
+    render paths fit into it. Every plan keeps at least one worker and
+    MIN_SLOTS ring slots, so a too-small budget slows a job down rather
+    than stopping it.
+    """
+
+    def __init__(self, limit=None):
+        self.limit = limit
+
+    def __repr__(self):
+        return f"MemoryBudget({format_bytes(self.limit) if self.limit else 'unlimited'})"
+
+    @classmethod
+    def from_env(cls):
+        text = os.environ.get(MEMORY_BUDGET_ENV, "").strip()
+        if text:
+            return cls(parse_bytes(text))
+        ram = physical_memory()
+        return cls(int(ram * DEFAULT_FRACTION) if ram else None)
+
+    def share(self, parts):
+        """
+        An equal part of this budget, for one of `parts` things running
+        side by side.
+        """
+        return MemoryBudget(self.limit // max(1, parts) if self.limit else None)
+
+    def cache_bytes(self):
+        """
+        Bytes a cache of memoized frames may hold under this budget, or
+        None when unlimited.
+        """
+        return int(self.limit * CACHE_FRACTION) if self.limit else None
+
+    def workers(self, wanted, per_worker, reserve=0):
+        """
+        How many of `wanted` parallel workers of `per_worker` bytes fit
+        next to `reserve` bytes used by the job itself.
+        """
+        if self.limit is None:
+            return max(1, wanted)
+        return max(1, min(wanted, (self.limit - reserve) // per_worker))
+
+    def pipeline(self, workers, frame_bytes, slots, encoders=1):
+        """
+        (producers, ring slots) for a frame pipeline of up to `workers`
+        producers with `slots`-deep rings of `frame_bytes` frames, feeding
+        `encoders` encoders in this process.
+        """
+        if self.limit is None:
+            return workers, slots
+        reserve = encoders * ENCODER_BYTES
+        workers = self.workers(workers, WORKER_BYTES + MIN_SLOTS * frame_bytes, reserve)
+        room = (self.limit - reserve - workers * WORKER_BYTES) // (workers * frame_bytes)
+        return workers, max(MIN_SLOTS, min(slots, room))
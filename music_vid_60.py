@@ -1,12 +1,21 @@
 import tkinter as tk
 from tkinter import filedialog, ttk
-from PIL import Image, ImageTk, ImageEnhance
-import imageio
-import numpy as np
-import cv2
+from PIL import Image, ImageTk
 import threading
-from moviepy import VideoFileClip, AudioFileClip
 import os
+import hashlib
+
+from ffmpeg_tools import prepare_soundtrack, remux
+from preview_engine import PreviewCache, PreviewEngine, show_frame
+from lut import EffectBaker, load_cube
+from media_probe import probe_media
+from memory_budget import format_bytes
+from render_cache import effect_fingerprint, render_key
+from render_engine import FloatingCaption, Grader, Output, Renderer, Timeline, fit_master, get_backend
+from render_jobs import RenderJob
+from render_modes import DRAFT, FINAL
+from render_profile import RenderProfiler
+from segments import SegmentedRender
 
 # =========================
 # VERTICAL SHORTS CONFIG
@@ -15,7 +24,7 @@ VIDEO_SECONDS = 60
 VIDEO_FPS = 24
 TOTAL_FRAMES = VIDEO_SECONDS * VIDEO_FPS  # 1440 frames
 
-EXPORT_WIDTH = 1080
+EXPORT_WIDTH = 1088    # divisible by 16 for codecs
 EXPORT_HEIGHT = 1920   # 9:16 Vertical Shorts
 
 PREVIEW_SIZE = 360
@@ -23,6 +32,21 @@ PREVIEW_SIZE = 360
 BASE_EFFECTS = 50
 FRAMES_PER_EFFECT = TOTAL_FRAMES // BASE_EFFECTS
 
+LUT_GRADING = False  # bake generated looks into 3D LUTs (faster, approximate)
+
+# "All formats" export: the timeline is rendered once and encoded per format
+OUTPUT_FORMATS = {
+    "9x16": (EXPORT_WIDTH, EXPORT_HEIGHT),  # Shorts / Reels
+    "1x1": (1088, 1088),                    # square feed
+    "4x5": (1088, 1360),                    # portrait feed
+}
+CAPTION_LAYOUTS = {
+    "9x16": {"x": 0.15, "y": 0.9},
+    "1x1": {"x": 0.1, "y": 0.88, "font_scale": 1.0, "amplitude": 15},
+    "4x5": {"x": 0.12, "y": 0.9, "amplitude": 20},
+}
+RENDER_WORKERS = os.cpu_count() or 1  # processes used by "Render on all cores"
+
 
 # =========================
 # EXTREME EFFECT GENERATOR
@@ -42,55 +66,218 @@ def generate_effects():
     return effects
 
 
-# =========================
-# EFFECT APPLICATION
-# =========================
-def apply_effect(img, b, c, s, warmth, invert):
-    img = ImageEnhance.Brightness(img).enhance(b)
-    img = ImageEnhance.Contrast(img).enhance(c)
-    img = ImageEnhance.Color(img).enhance(s)
+def effect_schedule(luts=()):
+    """
+    The keyframe looks: loaded LUTs cycled over the 50 slots, or the
+    generated formulas when no LUTs are loaded.
+    """
+    if luts:
+        return [luts[i % len(luts)] for i in range(BASE_EFFECTS)]
+    return generate_effects()
 
-    frame = np.array(img).astype(np.int16)
 
-    frame[:, :, 0] = np.clip(frame[:, :, 0] + warmth, 0, 255)
-    frame[:, :, 2] = np.clip(frame[:, :, 2] - warmth, 0, 255)
-
-    if invert:
-        frame = 255 - frame
-
-    return frame.astype(np.uint8)
+# =========================
+# TIMELINE
+# =========================
+def effect_timeline(base_img, effects, baker=None, fps=VIDEO_FPS, backend=None):
+    """
+    One crossfade per look change, then the final look held up to the end
+    of the video. Segment i is the crossfade from look i to look i + 1.
+    """
+    backend = backend or get_backend()
+    total_frames = VIDEO_SECONDS * fps
+    return Timeline(
+        Grader(base_img, backend, baker),
+        effects,
+        total_frames // BASE_EFFECTS,
+        total=total_frames,
+        backend=backend,
+    )
+
+
+def caption_overlays(caption, layout, mode=FINAL):
+    if not caption:
+        return []
+    return [FloatingCaption(caption, mode.scale, **CAPTION_LAYOUTS[layout])]
+
+
+def render_fingerprint(base_img, effects, mode=FINAL, backend=None, caption=""):
+    return render_key(
+        image=hashlib.sha256(base_img.tobytes()).hexdigest(),
+        size=base_img.size,
+        effects=[effect_fingerprint(e) for e in effects],
+        caption=caption,
+        settings=[VIDEO_FPS, TOTAL_FRAMES, FRAMES_PER_EFFECT, LUT_GRADING],
+        mode=mode.fingerprint(),
+        backend=(backend or get_backend()).name,
+    )
+
+
+def render_video(base_img, effects, save_path, progress=None, profiler=None, workers=1, mode=FINAL,
+                 job=None, caption=""):
+    """
+    Headless render of the full timeline to `save_path`, one checkpointed
+    segment per transition. Re-running after a crash resumes from the
+    segments already on disk. With workers > 1 the transitions are rendered
+    on a process pool (stage timings then only cover the join). `base_img`
+    is at final size; mode=DRAFT scales it and the frame rate down.
+    Cancelling `job` stops the render and discards the segments.
+    """
+    profiler = profiler or RenderProfiler()
+
+    size = mode.size(*base_img.size)
+    if size != base_img.size:
+        with profiler.stage("fit"):
+            base_img = base_img.resize(size)
+    fps = mode.fps(VIDEO_FPS)
+    baker = EffectBaker(base_img) if LUT_GRADING else None
+    backend = get_backend()
+    renderer = Renderer(
+        effect_timeline(base_img, effects, baker, fps, backend),
+        caption_overlays(caption, "9x16", mode),
+        index_step=mode.fps_divisor,
+    )
+
+    parts = SegmentedRender(
+        save_path + ".parts",
+        render_fingerprint(base_img, effects, mode, backend, caption),
+        fps,
+        mode.writer_kwargs(),
+    )
+    if job:
+        job.track(parts.work_dir, resumable=True)
+        renderer.limit_memory(job.budget, workers)
+
+    segments = len(renderer.segment_sizes())
+    if workers > 1:
+        parts.render_parallel(segments, renderer.segment_frames, workers, progress, job)
+    else:
+        parts.render(
+            segments,
+            lambda i: renderer.segment_frames(i, profiler),
+            progress,
+            profiler,
+            job,
+        )
+    parts.join(save_path, profiler)
+    parts.cleanup()
+
+
+def add_music(temp_video, audio_path, save_path, job, profiler):
+    """
+    Mux `audio_path` (trimmed or looped to the video length) into the
+    rendered `temp_video`, or just move it into place when there is no music.
+    The video is stream-copied, and so is the music when it is already long
+    enough and in an MP4 codec.
+    """
+    if not audio_path:
+        os.rename(temp_video, save_path)
+        return
+
+    with profiler.stage("audio_mux"):
+        soundtrack = audio_path
+        if not probe_media(audio_path).audio_fits(VIDEO_SECONDS):
+            soundtrack = job.track(os.path.splitext(save_path)[0] + ".soundtrack.m4a")
+            prepare_soundtrack(audio_path, VIDEO_SECONDS, soundtrack, job=job)
+
+        job.track(save_path)
+        remux(temp_video, save_path, soundtrack, duration=VIDEO_SECONDS, job=job)
+        job.release(save_path)
+
+    if soundtrack != audio_path:
+        os.remove(soundtrack)
+        job.release(soundtrack)
+    os.remove(temp_video)
+
+
+def format_paths(save_path):
+    """
+    {format: output path} for an "All formats" export to `save_path`.
+    """
+    stem, ext = os.path.splitext(save_path)
+    return {name: f"{stem}_{name}{ext or '.mp4'}" for name in OUTPUT_FORMATS}
+
+
+def render_formats(image, effects, save_path, caption="", audio_path=None, progress=None, profiler=None,
+                   workers=1, mode=FINAL, job=None):
+    """
+    Render the timeline once and export it in every OUTPUT_FORMATS ratio
+    (see format_paths), each with its own caption layout. The music is
+    encoded once and stream-copied under every format.
+    """
+    job = job or RenderJob()
+    profiler = profiler or RenderProfiler()
+    backend = get_backend()
+    fps = mode.fps(VIDEO_FPS)
+    paths = format_paths(save_path)
+
+    outputs = [
+        Output(
+            job.track(paths[name] + ".temp_no_audio.mp4"),
+            mode.size(*size),
+            caption_overlays(caption, name, mode),
+            mode.writer_kwargs(),
+            backend,
+        )
+        for name, size in OUTPUT_FORMATS.items()
+    ]
+
+    with profiler.stage("fit"):
+        master = fit_master(image, [output.size for output in outputs])
+    baker = EffectBaker(master) if LUT_GRADING else None
+
+    renderer = Renderer(effect_timeline(master, effects, baker, fps, backend), index_step=mode.fps_divisor)
+    renderer.write_outputs(outputs, fps, job, profiler, progress, workers)
+
+    soundtrack = audio_path
+    if audio_path and not probe_media(audio_path).audio_fits(VIDEO_SECONDS):
+        soundtrack = job.track(os.path.splitext(save_path)[0] + ".soundtrack.m4a")
+        with profiler.stage("audio_mux"):
+            prepare_soundtrack(audio_path, VIDEO_SECONDS, soundtrack, job=job)
+
+    for name, output in zip(OUTPUT_FORMATS, outputs):
+        if soundtrack:
+            with profiler.stage("audio_mux"):
+                remux(output.path, paths[name], soundtrack, duration=VIDEO_SECONDS, job=job)
+            os.remove(output.path)
+        else:
+            os.rename(output.path, paths[name])
+        job.release(output.path)
 
+    if soundtrack != audio_path:
+        os.remove(soundtrack)
+        job.release(soundtrack)
 
-def blend_frames(a, b, steps):
-    result = []
-    for i in range(steps):
-        alpha = i / steps
-        blended = cv2.addWeighted(a, 1 - alpha, b, alpha, 0)
-        result.append(blended)
-    return result
 
+def service_render(spec, progress=None, job=None):
+    """
+    Render a render_service job: {"image", "output", "audio", "luts", "draft",
+    "caption", "formats"}. With "formats" set every OUTPUT_FORMATS ratio is
+    exported next to "output".
+    """
+    job = job or RenderJob()
+    profiler = RenderProfiler.from_env()
+    save_path = spec["output"]
 
-# =========================
-# IMAGE → VERTICAL FIT
-# =========================
-def fit_to_vertical(img):
-    img_ratio = img.width / img.height
-    target_ratio = EXPORT_WIDTH / EXPORT_HEIGHT
+    with profiler.stage("load"):
+        image = Image.open(spec["image"]).convert("RGB")
+        luts = [load_cube(path) for path in spec.get("luts") or []]
 
-    if img_ratio > target_ratio:
-        new_height = img.height
-        new_width = int(new_height * target_ratio)
-    else:
-        new_width = img.width
-        new_height = int(new_width / target_ratio)
+    mode = DRAFT if spec.get("draft") else FINAL
+    caption = spec.get("caption") or ""
+    if spec.get("formats"):
+        render_formats(image, effect_schedule(luts), save_path, caption, spec.get("audio"), progress, profiler,
+                       1, mode, job)
+        profiler.write(save_path)
+        return
 
-    left = (img.width - new_width) // 2
-    top = (img.height - new_height) // 2
-    right = left + new_width
-    bottom = top + new_height
+    temp_video = job.track(save_path + ".temp_no_audio.mp4")
+    with profiler.stage("fit"):
+        base_img = get_backend().fit(image, (EXPORT_WIDTH, EXPORT_HEIGHT))
 
-    img = img.crop((left, top, right, bottom))
-    return img.resize((EXPORT_WIDTH, EXPORT_HEIGHT))
+    render_video(base_img, effect_schedule(luts), temp_video, progress, profiler, 1, mode, job, caption)
+    add_music(temp_video, spec.get("audio"), save_path, job, profiler)
+    profiler.write(save_path)
 
 
 # =========================
@@ -100,20 +287,53 @@ class FiftyShadesVertical:
     def __init__(self, root):
         self.root = root
         self.root.title("50 Shades – 60s Vertical Shorts Generator")
-        self.root.geometry("520x780")
+        self.root.geometry("520x1110")
         self.root.resizable(False, False)
 
         self.image = None
+        self.image_path = None
         self.preview_image = None
+        self.preview_engine = None
+        self.preview_cache = None
+        self.job = None
+        self.luts = []
+        self.lut_paths = []
         self.audio_path = None
 
         self.preview_label = tk.Label(root)
         self.preview_label.pack(pady=15)
 
+        self.scrubber = tk.Scale(
+            root, from_=0, to=VIDEO_SECONDS, resolution=0.25, orient=tk.HORIZONTAL,
+            length=420, label="Scrub timeline (s)", command=self.scrub_to,
+        )
+        self.scrubber.pack()
+
         tk.Button(root, text="Load Image", command=self.load_image).pack(pady=6)
+        tk.Button(root, text="Load .cube LUTs", command=self.load_luts).pack(pady=6)
         tk.Button(root, text="Add MP3 Music", command=self.load_audio).pack(pady=6)
         tk.Button(root, text="Preview Effects", command=self.preview).pack(pady=6)
+        self.all_cores = tk.BooleanVar(value=RENDER_WORKERS > 1)
+        tk.Checkbutton(
+            root, text=f"Render on all cores ({RENDER_WORKERS})", variable=self.all_cores
+        ).pack(pady=6)
+        self.draft = tk.BooleanVar(value=False)
+        tk.Checkbutton(root, text="Draft quality (fast review)", variable=self.draft).pack(pady=6)
+        self.use_service = tk.BooleanVar(value=False)
+        tk.Checkbutton(root, text="Send to render service", variable=self.use_service).pack(pady=6)
+        self.all_formats = tk.BooleanVar(value=False)
+        tk.Checkbutton(
+            root, text="All formats: 9:16 + 1:1 + 4:5 (one render)", variable=self.all_formats
+        ).pack(pady=6)
+
+        caption_frame = tk.Frame(root)
+        caption_frame.pack(pady=6)
+        tk.Label(caption_frame, text="Caption:").pack(side=tk.LEFT, padx=5)
+        self.caption_entry = tk.Entry(caption_frame, width=30)
+        self.caption_entry.pack(side=tk.LEFT, padx=5)
+
         tk.Button(root, text="Export 60s Vertical MP4", command=self.export_threaded).pack(pady=6)
+        tk.Button(root, text="Cancel", command=self.cancel_export).pack(pady=6)
 
         self.progress = ttk.Progressbar(root, length=420)
         self.progress.pack(pady=15)
@@ -128,6 +348,7 @@ class FiftyShadesVertical:
             return
 
         self.image = Image.open(path).convert("RGB")
+        self.image_path = path
 
         self.preview_image = self.image.copy()
         self.preview_image.thumbnail((PREVIEW_SIZE, PREVIEW_SIZE))
@@ -136,6 +357,10 @@ class FiftyShadesVertical:
         self.preview_label.configure(image=tk_img)
         self.preview_label.image = tk_img
 
+        # start filling the preview timeline while the user looks around
+        self.stop_preview()
+        self.build_preview_cache(self.effect_schedule())
+
         self.status.config(text="Image loaded ✅", fg="green")
 
     # -------------------------
@@ -147,34 +372,89 @@ class FiftyShadesVertical:
         self.audio_path = path
         self.status.config(text="MP3 loaded ✅", fg="green")
 
+    # -------------------------
+    def load_luts(self):
+        paths = filedialog.askopenfilenames(filetypes=[("3D LUT", "*.cube")])
+        if not paths:
+            return
+
+        try:
+            self.luts = [load_cube(path) for path in paths]
+            self.lut_paths = list(paths)
+        except (OSError, ValueError) as e:
+            print("LUT error:", e)
+            self.status.config(text="Could not load LUT ❌", fg="red")
+            return
+
+        if self.image:
+            self.stop_preview()
+            self.build_preview_cache(self.effect_schedule())
+
+        self.status.config(text=f"{len(self.luts)} LUT look(s) loaded ✅", fg="green")
+
+    def effect_schedule(self):
+        return effect_schedule(self.luts)
+
+    # -------------------------
+    def build_preview_cache(self, effects):
+        if self.preview_cache:
+            self.preview_cache.cancel()
+
+        timeline = effect_timeline(self.preview_image, effects)
+        self.preview_cache = PreviewCache(timeline, VIDEO_FPS, key=tuple(effects)).start()
+
+    def stop_preview(self):
+        if self.preview_engine:
+            self.preview_engine.stop()
+
     # -------------------------
     def preview(self):
         if not self.image:
             self.status.config(text="Load an image first ❌", fg="red")
             return
 
+        self.stop_preview()
+
+        effects = self.effect_schedule()
+        if self.preview_cache is None or self.preview_cache.key != tuple(effects):
+            self.build_preview_cache(effects)
+
         self.status.config(text="Previewing effects...", fg="orange")
-        self.root.update()
 
-        effects = generate_effects()
+        cache = self.preview_cache
+        self.preview_engine = PreviewEngine(
+            self.root, self.preview_label, cache.frame_at, len(cache.timeline),
+            VIDEO_FPS, on_done=self.preview_done,
+        )
+        self.preview_engine.start()
 
-        for b, c, s, w, inv in effects:
-            frame = apply_effect(self.preview_image, b, c, s, w, inv)
-            tk_frame = ImageTk.PhotoImage(Image.fromarray(frame))
-            self.preview_label.configure(image=tk_frame)
-            self.preview_label.image = tk_frame
-            self.root.update()
-            self.root.after(70)
+    def scrub_to(self, seconds):
+        if not self.preview_cache:
+            return
+
+        self.stop_preview()
+        index = int(float(seconds) * VIDEO_FPS)
+        show_frame(self.preview_label, self.preview_cache.frame_at(index))
 
-        self.status.config(text="Preview complete ✅", fg="green")
+    def preview_done(self, dropped):
+        self.status.config(text=f"Preview complete ✅ ({dropped} frames dropped)", fg="green")
 
     # -------------------------
     def export_threaded(self):
-        thread = threading.Thread(target=self.export_video)
+        self.job = RenderJob()
+        thread = threading.Thread(target=self.job.run, args=(self.export_video, self.export_cancelled))
         thread.start()
 
+    def cancel_export(self):
+        if self.job:
+            self.job.cancel()
+
+    def export_cancelled(self):
+        self.progress["value"] = 0
+        self.status.config(text="Export cancelled ⛔", fg="red")
+
     # -------------------------
-    def export_video(self):
+    def export_video(self, job):
         if not self.image:
             self.status.config(text="Load an image first ❌", fg="red")
             return
@@ -183,39 +463,42 @@ class FiftyShadesVertical:
         if not save_path:
             return
 
-        temp_video = "temp_vertical_no_audio.mp4"
-
         self.status.config(text="Rendering 60s Vertical MP4...", fg="orange")
         self.progress["value"] = 0
         self.root.update()
 
-        base_img = fit_to_vertical(self.image)
-        effects = generate_effects()
-
-        writer = imageio.get_writer(temp_video, fps=VIDEO_FPS)
-
-        total_written = 0
-
-        for i in range(len(effects) - 1):
-            b1, c1, s1, w1, inv1 = effects[i]
-            b2, c2, s2, w2, inv2 = effects[i + 1]
-
-            frame_a = apply_effect(base_img, b1, c1, s1, w1, inv1)
-            frame_b = apply_effect(base_img, b2, c2, s2, w2, inv2)
+        if self.use_service.get():
+            self.export_on_service(save_path, job)
+            return
 
-            blended_frames = blend_frames(frame_a, frame_b, FRAMES_PER_EFFECT)
+        job.start_measuring()
+        profiler = RenderProfiler.from_env()
+        effects = self.effect_schedule()
+        caption = self.caption_entry.get().strip()
 
-            for frame in blended_frames:
-                writer.append_data(frame)
-                total_written += 1
-                self.progress["value"] = (total_written / TOTAL_FRAMES) * 100
+        def progress(done, count):
+            with profiler.stage("ui"):
+                self.progress["value"] = (done / count) * 100
                 self.root.update()
 
-        while total_written < TOTAL_FRAMES:
-            writer.append_data(frame_b)
-            total_written += 1
+        workers = RENDER_WORKERS if self.all_cores.get() else 1
+        mode = DRAFT if self.draft.get() else FINAL
+
+        if self.all_formats.get():
+            render_formats(
+                self.image, effects, save_path, caption, self.audio_path, progress, profiler, workers, mode, job,
+            )
+            profiler.write(save_path)
+            self.progress["value"] = 100
+            peak = format_bytes(job.stop_measuring())
+            self.status.config(text=f"✅ 9:16, 1:1 and 4:5 Videos Exported! (peak memory {peak})", fg="green")
+            return
+
+        temp_video = job.track(save_path + ".temp_no_audio.mp4")
+        with profiler.stage("fit"):
+            base_img = get_backend().fit(self.image, (EXPORT_WIDTH, EXPORT_HEIGHT))
 
-        writer.close()
+        render_video(base_img, effects, temp_video, progress, profiler, workers, mode, job, caption)
 
         # =========================
         # ADD MUSIC
@@ -224,28 +507,51 @@ class FiftyShadesVertical:
             self.status.config(text="Adding MP3 music...", fg="orange")
             self.root.update()
 
-            video_clip = VideoFileClip(temp_video)
-            audio_clip = AudioFileClip(self.audio_path)
+        add_music(temp_video, self.audio_path, save_path, job, profiler)
 
-            if audio_clip.duration > VIDEO_SECONDS:
-                audio_clip = audio_clip.subclip(0, VIDEO_SECONDS)
-            else:
-                audio_clip = audio_clip.audio_loop(duration=VIDEO_SECONDS)
+        profiler.write(save_path)
 
-            final_clip = video_clip.set_audio(audio_clip)
-            final_clip.write_videofile(save_path, fps=VIDEO_FPS, codec="libx264", audio_codec="aac")
+        self.progress["value"] = 100
+        peak = format_bytes(job.stop_measuring())
+        self.status.config(text=f"✅ 60s Vertical Video with Music Exported! (peak memory {peak})", fg="green")
+
+    def export_on_service(self, save_path, job):
+        """
+        Queue the export on the local render service and follow its progress.
+        """
+        from render_service import RenderServiceClient
+
+        spec = {
+            "kind": "music_vid_60",
+            "image": os.path.abspath(self.image_path),
+            "output": os.path.abspath(save_path),
+            "audio": os.path.abspath(self.audio_path) if self.audio_path else None,
+            "luts": [os.path.abspath(path) for path in self.lut_paths],
+            "draft": self.draft.get(),
+            "caption": self.caption_entry.get().strip(),
+            "formats": self.all_formats.get(),
+        }
+
+        def progress(done, count):
+            self.progress["value"] = (done / count) * 100
+            self.root.update()
 
-            os.remove(temp_video)
-        else:
-            os.rename(temp_video, save_path)
+        try:
+            state = RenderServiceClient().run(spec, progress, job)
+        except (OSError, RuntimeError) as e:
+            print("ERROR:", e)
+            self.status.config(text="Render service failed ❌", fg="red")
+            return
 
         self.progress["value"] = 100
-        self.status.config(text="✅ 60s Vertical Video with Music Exported!", fg="green")
+        peak = format_bytes(state.get("peak_rss_bytes"))
+        self.status.config(text=f"✅ 60s Vertical Video with Music Exported! (peak memory {peak})", fg="green")
 
 
 # =========================
 # RUN APP
 # =========================
-root = tk.Tk()
-app = FiftyShadesVertical(root)
-root.mainloop()
+if __name__ == "__main__":
+    root = tk.Tk()
+    app = FiftyShadesVertical(root)
+    root.mainloop()
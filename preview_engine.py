@@ -0,0 +1,181 @@
+"""
+Non-blocking real-time preview for the Tk generators.
+
+Frames are rendered at preview resolution on a background worker thread.
+A fixed-rate `root.after()` clock decides which timeline frame should be on
+screen and shows the newest finished frame. When the worker cannot keep up,
+it always jumps to the clock's current frame, so late frames are dropped
+instead of slowing playback down, and the Tk thread never blocks.
+
+`PreviewCache` precomputes the whole timeline at a reduced frame rate in the
+background as soon as an image is loaded, so playback and timeline scrubbing
+read ready-made frames. Timelines are render_engine.Timeline objects.
+"""
+import threading
+import time
+
+from PIL import Image, ImageTk
+
+PREVIEW_FPS = 24      # display clock rate
+PREVIEW_SPEED = 8.0   # timeline seconds per wall-clock second
+PREVIEW_CACHE_FPS = 4 # cached timeline frames per second
+
+
+def show_frame(label, frame):
+    """
+    Display a uint8 RGB array in a Tk label, pasting into the label's current
+    PhotoImage when the size matches (far cheaper than a new PhotoImage).
+    Must be called on the Tk thread.
+    """
+    img = Image.fromarray(frame)
+    photo = getattr(label, "image", None)
+    if photo is None or (photo.width(), photo.height()) != img.size:
+        photo = ImageTk.PhotoImage(img)
+        label.configure(image=photo)
+        label.image = photo
+    else:
+        photo.paste(img)
+
+
+class PreviewCache:
+    """
+    Background-filled store of ready-to-display preview frames covering the
+    whole timeline at `cache_fps`. `key` identifies the effect schedule the
+    frames were built from; owners rebuild the cache only when it changes.
+
+    `frame_at(index)` returns the nearest cached frame, or renders the exact
+    frame on the spot when that part of the timeline is not filled yet.
+    """
+
+    def __init__(self, timeline, timeline_fps, key=None, cache_fps=PREVIEW_CACHE_FPS):
+        self.timeline = timeline
+        self.key = key
+        self.step = timeline_fps / cache_fps
+        self.slots = [None] * (int((len(timeline) - 1) / self.step) + 1)
+        self.filled = 0
+        self._cancelled = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._fill, daemon=True).start()
+        return self
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def complete(self):
+        return self.filled == len(self.slots)
+
+    def _index_of(self, slot):
+        return min(int(round(slot * self.step)), len(self.timeline) - 1)
+
+    def _fill(self):
+        for slot in range(len(self.slots)):
+            if self._cancelled.is_set():
+                return
+            if self.slots[slot] is None:
+                self.slots[slot] = self.timeline.frame(self._index_of(slot))
+            self.filled += 1
+
+    def frame_at(self, index):
+        slot = min(int(round(index / self.step)), len(self.slots) - 1)
+        frame = self.slots[slot]
+        if frame is None:
+            frame = self.timeline.frame(index)
+        return frame
+
+
+class PreviewEngine:
+    """
+    Plays `frame_at(index)` for `total_frames` timeline frames (at
+    `timeline_fps`) into a Tk label, `speed` times faster than real time.
+
+    `frame_at` runs on the worker thread and must not touch Tk. `on_done`
+    is called on the Tk thread with the number of display ticks that had no
+    fresh frame ready (dropped frames).
+    """
+
+    def __init__(self, root, label, frame_at, total_frames, timeline_fps,
+                 speed=PREVIEW_SPEED, fps=PREVIEW_FPS, on_done=None):
+        self.root = root
+        self.label = label
+        self.frame_at = frame_at
+        self.total_frames = total_frames
+        self.timeline_fps = timeline_fps
+        self.speed = speed
+        self.interval_ms = max(1, int(1000 / fps))
+        self.on_done = on_done
+
+        self.dropped = 0
+        self._target = 0
+        self._latest = None            # (index, frame) from the worker
+        self._shown = -1
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._running = False
+        self._after_id = None
+        self._started = 0.0
+
+    # -------------------------
+    def start(self):
+        self._running = True
+        self._started = time.perf_counter()
+        threading.Thread(target=self._worker, daemon=True).start()
+        self._tick()
+
+    def stop(self):
+        self._running = False
+        self._wake.set()
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    @property
+    def running(self):
+        return self._running
+
+    # -------------------------
+    def _worker(self):
+        rendered = -1
+        while self._running:
+            target = self._target
+            if target == rendered:
+                self._wake.wait(0.05)
+                self._wake.clear()
+                continue
+
+            frame = self.frame_at(target)
+            rendered = target
+            with self._lock:
+                self._latest = (target, frame)
+
+    def _tick(self):
+        self._after_id = None
+        if not self._running:
+            return
+
+        elapsed = time.perf_counter() - self._started
+        target = min(int(elapsed * self.timeline_fps * self.speed), self.total_frames - 1)
+        if target != self._target:
+            self._target = target
+            self._wake.set()
+
+        with self._lock:
+            latest = self._latest
+            self._latest = None
+
+        if latest is not None:
+            index, frame = latest
+            show_frame(self.label, frame)
+            self._shown = index
+        elif 0 <= self._shown < target:
+            # the worker is behind the clock: this display slot is dropped
+            self.dropped += 1
+
+        if self._shown >= self.total_frames - 1:
+            self.stop()
+            if self.on_done:
+                self.on_done(self.dropped)
+            return
+
+        self._after_id = self.root.after(self.interval_ms, self._tick)
@@ -0,0 +1,118 @@
+"""
+Content-addressed cache of finished renders.
+
+A render is keyed by a SHA-256 over everything that determines its bytes:
+source file contents (not paths), seed, effect parameters, caption, encoder
+profile and render settings. When a batch item's key is already in the
+cache, the finished MP4 is hard-linked (or copied, across filesystems) into
+the output dir instead of being rendered again.
+
+The cache lives in $SHORTS_RENDER_CACHE, or ~/.cache/vertical-shorts-maker/
+renders by default.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from lut import is_lut
+
+RENDER_CACHE_ENV = "SHORTS_RENDER_CACHE"
+
+# bump when the renderer changes in a way that alters output frames
+RENDER_VERSION = 3
+
+_digests = {}
+
+
+def default_cache_dir():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.environ.get(RENDER_CACHE_ENV) or os.path.join(base, "vertical-shorts-maker", "renders")
+
+
+def file_digest(path):
+    """
+    SHA-256 of a file's bytes, memoized per (path, size, mtime) so a batch
+    hashes its shared soundtrack only once.
+    """
+    st = os.stat(path)
+    memo = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    digest = _digests.get(memo)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = _digests[memo] = h.hexdigest()
+    return digest
+
+
+def effect_fingerprint(effect):
+    """
+    JSON-friendly identity of one schedule entry. LUTs are identified by
+    their table contents, so renaming a .cube file does not miss the cache.
+    """
+    if is_lut(effect):
+        table = np.asarray(effect.table, dtype=np.float32).tobytes()
+        return ["lut", effect.size, hashlib.sha256(table).hexdigest()]
+    return [float(v) if isinstance(v, float) else v for v in effect]
+
+
+def render_key(**parts):
+    """
+    Hash the keyword parts (JSON-serialisable) together with RENDER_VERSION.
+    """
+    payload = json.dumps({"version": RENDER_VERSION, **parts}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _link_or_copy(src, dest):
+    """
+    Atomically place `src` at `dest`, sharing the inode when possible.
+    """
+    folder = os.path.dirname(os.path.abspath(dest))
+    fd, tmp = tempfile.mkstemp(prefix=".cache-", suffix=".mp4", dir=folder)
+    os.close(fd)
+    os.remove(tmp)
+    try:
+        try:
+            os.link(src, tmp)
+        except OSError:
+            shutil.copy2(src, tmp)
+        os.replace(tmp, dest)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+class RenderCache:
+    def __init__(self, root=None):
+        self.root = root or default_cache_dir()
+
+    def path_for(self, key):
+        return os.path.join(self.root, key[:2], key + ".mp4")
+
+    def fetch(self, key, dest):
+        """
+        Serve a cached render to `dest`. Returns False on a cache miss.
+        """
+        cached = self.path_for(key)
+        if not os.path.exists(cached):
+            return False
+        _link_or_copy(cached, dest)
+        return True
+
+    def store(self, key, src):
+        """
+        Add a finished render to the cache. Failures only cost a future
+        re-render, so they are reported and swallowed.
+        """
+        cached = self.path_for(key)
+        try:
+            os.makedirs(os.path.dirname(cached), exist_ok=True)
+            _link_or_copy(src, cached)
+        except OSError as e:
+            print("Render cache store failed:", e)
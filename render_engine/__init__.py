@@ -0,0 +1,32 @@
+"""
+Shared render engine for the exporters: compute backends, the keyframe
+timeline, transitions, Ken Burns motion, caption overlays, subtitle
+tracks, video crop planning and the Renderer that writes them to video.
+
+    backend = get_backend()          # $SHORTS_RENDER_BACKEND or "pil"
+    timeline = Timeline(Grader(base_img, backend), looks, steps, backend=backend)
+    Renderer(timeline, [FloatingCaption("Follow")]).write(path, fps)
+"""
+from .backends import BACKEND_ENV, BACKENDS, DEFAULT_BACKEND, Backend, cover_box, get_backend, look_params
+from .crop_plan import CropPlan, plan_crop
+from .motion import MAX_ZOOM, ImagePyramid, KenBurns
+from .outputs import Output, fit_master, master_plan
+from .overlays import CaptionBars, FloatingCaption, caption_bars, floating_caption
+from .renderer import Renderer
+from .subtitles import CaptionTrack, Cue, IntervalIndex, parse_cues
+from .text import FONT_ENV, GlyphAtlas, Sprite, caption_sprite, font_px, glyph_atlas
+from .timeline import Grader, Timeline
+from .transitions import TRANSITIONS, Transition, get_transition, reveal_map
+
+__all__ = [
+    "BACKEND_ENV", "BACKENDS", "DEFAULT_BACKEND", "Backend", "cover_box", "get_backend", "look_params",
+    "CropPlan", "plan_crop",
+    "MAX_ZOOM", "ImagePyramid", "KenBurns",
+    "Output", "fit_master", "master_plan",
+    "CaptionBars", "FloatingCaption", "caption_bars", "floating_caption",
+    "Renderer",
+    "CaptionTrack", "Cue", "IntervalIndex", "parse_cues",
+    "FONT_ENV", "GlyphAtlas", "Sprite", "caption_sprite", "font_px", "glyph_atlas",
+    "Grader", "Timeline",
+    "TRANSITIONS", "Transition", "get_transition", "reveal_map",
+]
@@ -0,0 +1,197 @@
+"""
+Compute backends for the per-frame work every exporter does: grading a
+keyframe look, crossfading two frames and fitting or cropping a source to
+the output size. They share one interface, so implementations can be swapped with
+$SHORTS_RENDER_BACKEND and compared with benchmarks/bench_hot_functions.py.
+
+* "pil" is the reference and the default: ImageEnhance grading,
+  Image.blend and PIL resampling. Its output defines what a look is.
+* "opencv" grades with OpenCV's saturating arithmetic. It rounds where PIL
+  truncates, so grades are usually within a few levels of the reference;
+  the strongest contrast looks amplify the rounding to about 15 levels on a
+  few percent of pixels. It blends with cv2.addWeighted and resizes with
+  cv2.resize, whose filters are not PIL's antialiased ones (fits differ by
+  up to about 13 levels at edges). About 5x faster to grade and 7x faster
+  to blend than the reference, for renders where that difference is fine.
+
+A look is a (brightness, contrast, saturation, warmth, invert) tuple, a
+(brightness, contrast, saturation) filter from the pro generator, or a
+loaded .cube LUT. Every backend applies LUTs with PIL's Color3DLUT.
+"""
+import os
+
+import numpy as np
+from PIL import Image, ImageEnhance
+
+from lazy_imports import lazy_import
+from lut import apply_lut, is_lut, warm_and_invert
+
+cv2 = lazy_import("cv2")
+
+BACKEND_ENV = "SHORTS_RENDER_BACKEND"
+DEFAULT_BACKEND = "pil"
+
+
+def look_params(look):
+    """
+    (brightness, contrast, saturation, warmth, invert) for a look tuple;
+    three-value filters get no warmth and no inversion.
+    """
+    if len(look) == 3:
+        return (*look, 0, False)
+    return tuple(look)
+
+
+def cover_box(width, height, size):
+    """
+    (left, top, width, height) of the largest centred crop of a
+    width x height source with the aspect ratio of `size`.
+    """
+    target_ratio = size[0] / size[1]
+
+    if width / height > target_ratio:
+        new_height = height
+        new_width = int(new_height * target_ratio)
+    else:
+        new_width = width
+        new_height = int(new_width / target_ratio)
+
+    return (width - new_width) // 2, (height - new_height) // 2, new_width, new_height
+
+
+class Backend:
+    name = None
+
+    def __repr__(self):
+        return f"<{self.name} render backend>"
+
+    def __reduce__(self):
+        # backends are stateless; worker processes look theirs up by name
+        return get_backend, (self.name,)
+
+    def grade(self, img, look, baker=None):
+        """
+        Grade a PIL RGB image with one look; returns a uint8 array. With a
+        baker, tuple looks are baked into a 3D LUT first.
+        """
+        if is_lut(look):
+            return apply_lut(img, look)
+        params = look_params(look)
+        if baker is not None:
+            return apply_lut(img, baker.bake(*params))
+        return self.enhance(img, *params)
+
+    def enhance(self, img, b, c, s, warmth, invert):
+        raise NotImplementedError
+
+    def blend(self, a, b, alpha, dst=None):
+        """
+        (1 - alpha) * a + alpha * b for uint8 arrays, written to `dst` when
+        given.
+        """
+        raise NotImplementedError
+
+    def fit(self, img, size):
+        """
+        Centre-crop a PIL image to the aspect ratio of `size` and resize it
+        to `size`; returns a PIL image.
+        """
+        raise NotImplementedError
+
+    def fit_frame(self, frame, size):
+        """
+        fit() for a uint8 array (decoded video frames).
+        """
+        h, w, _ = frame.shape
+        return self.crop_frame(frame, cover_box(w, h, size), size)
+
+    def crop_frame(self, frame, box, size):
+        """
+        Cut the (left, top, width, height) `box` out of a uint8 array and
+        resize it to `size`.
+        """
+        raise NotImplementedError
+
+
+# =========================
+# PIL (REFERENCE)
+# =========================
+class PILBackend(Backend):
+    name = "pil"
+
+    def enhance(self, img, b, c, s, warmth, invert):
+        img = ImageEnhance.Brightness(img).enhance(b)
+        img = ImageEnhance.Contrast(img).enhance(c)
+        img = ImageEnhance.Color(img).enhance(s)
+        return warm_and_invert(np.asarray(img), warmth, invert)
+
+    def blend(self, a, b, alpha, dst=None):
+        out = np.asarray(Image.blend(Image.fromarray(a), Image.fromarray(b), alpha))
+        if dst is None:
+            return out
+        np.copyto(dst, out)
+        return dst
+
+    def fit(self, img, size):
+        left, top, width, height = cover_box(img.width, img.height, size)
+        img = img.crop((left, top, left + width, top + height))
+        return img.resize(size)
+
+    def crop_frame(self, frame, box, size):
+        left, top, width, height = box
+        img = Image.fromarray(frame).crop((left, top, left + width, top + height))
+        return np.asarray(img.resize(size))
+
+
+# =========================
+# OPENCV
+# =========================
+class OpenCVBackend(Backend):
+    name = "opencv"
+
+    def enhance(self, img, b, c, s, warmth, invert):
+        frame = cv2.convertScaleAbs(np.asarray(img), alpha=b)
+        mean = int(cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY).mean() + 0.5)
+        frame = cv2.addWeighted(frame, c, frame, 0, mean * (1 - c))
+        grey = cv2.cvtColor(cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY), cv2.COLOR_GRAY2RGB)
+        frame = cv2.addWeighted(frame, s, grey, 1 - s, 0)
+        if warmth:
+            frame = cv2.add(frame, (warmth, 0, -warmth, 0))
+        if invert:
+            frame = cv2.bitwise_not(frame)
+        return frame
+
+    def blend(self, a, b, alpha, dst=None):
+        return cv2.addWeighted(a, 1 - alpha, b, alpha, 0, dst=dst)
+
+    def fit(self, img, size):
+        return Image.fromarray(self.fit_frame(np.asarray(img), size, cv2.INTER_AREA))
+
+    def fit_frame(self, frame, size, interpolation=None):
+        h, w, _ = frame.shape
+        return self.crop_frame(frame, cover_box(w, h, size), size, interpolation)
+
+    def crop_frame(self, frame, box, size, interpolation=None):
+        left, top, width, height = box
+        frame = frame[top:top + height, left:left + width]
+        if interpolation is None:
+            return cv2.resize(frame, size)
+        return cv2.resize(frame, size, interpolation=interpolation)
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (PILBackend(), OpenCVBackend())
+}
+
+
+def get_backend(name=None):
+    """
+    The backend called `name`, or the one chosen by $SHORTS_RENDER_BACKEND
+    (DEFAULT_BACKEND when unset).
+    """
+    name = name or os.environ.get(BACKEND_ENV) or DEFAULT_BACKEND
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"unknown render backend {name!r} (expected one of {sorted(BACKENDS)})") from None
@@ -0,0 +1,155 @@
+"""
+Scene-aware crop planning for cutting a narrower window (9:16 from a
+landscape clip) out of video. One cheap pass decodes a small greyscale
+proxy of the clip, splits it into scenes at hard cuts and, within each
+scene, follows the busiest part of the picture: edges plus frame-to-frame
+motion, summed across the crop. The window glides within a scene and only
+jumps at cuts. The result is a CropPlan of per-frame boxes in source
+pixels, which the full-resolution render applies as a slice:
+
+    plan = plan_crop(path, (clip.w, clip.h), size, fps, start, duration)
+    frame = backend.crop_frame(frame, plan.box(i), size)
+"""
+import numpy as np
+
+from ffmpeg_tools import read_gray_frames
+from lazy_imports import lazy_import
+
+from .backends import cover_box
+
+cv2 = lazy_import("cv2")
+
+PROXY_LONG_SIDE = 192  # proxy frames are at most this many pixels wide or tall
+HISTOGRAM_BINS = 32
+SCENE_CUT = 0.4  # histogram distance (0..1) between two frames that starts a new scene
+MOTION_FLOOR = 12  # grey levels of change ignored as noise
+MOTION_WEIGHT = 2.0  # weight of motion against edges in the saliency measure
+FOLLOW_SECONDS = 1.0  # saliency is averaged, and the window path smoothed, over this long
+CENTRE_MARGIN = 0.1  # an off-centre window must be this much busier than the centred one
+MAX_PAN_SPEED = 0.5  # crop widths (or heights) per second
+
+
+class CropPlan:
+    """
+    Per-frame crop windows: box(i) is the (left, top, width, height) of
+    frame i in source pixels. The window slides along one axis (`pan` 0
+    for x, 1 for y); frames past the end of the plan keep its last box.
+    """
+
+    def __init__(self, box, offsets=(), pan=0):
+        self.centre = tuple(box)
+        self.offsets = np.asarray(offsets, dtype=np.int32)
+        self.pan = pan
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def box(self, index):
+        if not len(self.offsets):
+            return self.centre
+        box = list(self.centre)
+        box[self.pan] = int(self.offsets[min(index, len(self.offsets) - 1)])
+        return tuple(box)
+
+
+def proxy_size(source_size):
+    """
+    Even (w, h) of the analysis proxy for a source of `source_size`.
+    """
+    width, height = source_size
+    scale = min(1.0, PROXY_LONG_SIDE / max(width, height))
+    return max(2, 2 * round(width * scale / 2)), max(2, 2 * round(height * scale / 2))
+
+
+def _histogram(frame):
+    hist = np.bincount((frame >> 3).ravel(), minlength=HISTOGRAM_BINS).astype(np.float32)
+    return hist / hist.sum()
+
+
+def _normalised(profile):
+    total = profile.sum()
+    return profile / total if total > 0 else profile
+
+
+def analyse(frames, pan):
+    """
+    (scene starts, saliency profiles) for a stream of proxy frames: a new
+    scene starts where the grey histogram jumps; each profile row is the
+    frame's edge and motion energy summed across the pan axis.
+    """
+    reduce_axis = 0 if pan == 0 else 1
+    starts = []
+    profiles = []
+    previous = previous_hist = None
+
+    for i, frame in enumerate(frames):
+        hist = _histogram(frame)
+        cut = previous is None or 0.5 * np.abs(hist - previous_hist).sum() > SCENE_CUT
+        if cut:
+            starts.append(i)
+
+        edges = np.abs(cv2.Sobel(frame, cv2.CV_16S, 1, 0)) + np.abs(cv2.Sobel(frame, cv2.CV_16S, 0, 1))
+        profile = _normalised(edges.sum(axis=reduce_axis, dtype=np.float32))
+
+        if not cut:
+            motion = cv2.absdiff(frame, previous)
+            motion[motion < MOTION_FLOOR] = 0
+            profile += MOTION_WEIGHT * _normalised(motion.sum(axis=reduce_axis, dtype=np.float32))
+
+        profiles.append(profile)
+        previous, previous_hist = frame, hist
+
+    return starts, np.array(profiles, dtype=np.float32)
+
+
+def _follow(profiles, window, follow, max_step):
+    """
+    Window starts (proxy pixels) for one scene: the busiest `window`-wide
+    span of the time-averaged saliency, unless the centred span is nearly
+    as busy, then smoothed and speed-limited.
+    """
+    frames, extent = profiles.shape
+    if follow > 1:
+        profiles = cv2.blur(profiles, (1, follow), borderType=cv2.BORDER_REPLICATE)
+
+    sums = np.cumsum(np.pad(profiles, ((0, 0), (1, 0))), axis=1)
+    spans = sums[:, window:] - sums[:, :-window]
+    centre = (extent - window) // 2
+    best = spans.argmax(axis=1)
+    keep = spans[np.arange(frames), best] < spans[:, centre] * (1 + CENTRE_MARGIN)
+    path = np.where(keep, centre, best).astype(np.float32)
+
+    if follow > 1:
+        path = cv2.blur(path[:, None], (1, follow), borderType=cv2.BORDER_REPLICATE)[:, 0]
+    for i in range(1, frames):
+        path[i] = path[i - 1] + np.clip(path[i] - path[i - 1], -max_step, max_step)
+    return path
+
+
+def plan_crop(path, source_size, size, fps, start=0.0, duration=None, job=None):
+    """
+    Plan the crop of `source_size` frames to the aspect ratio of `size` for
+    the clip at `path`, one box per frame at `fps` from `start` seconds.
+    Sources that already have the target aspect ratio get a fixed box.
+    """
+    box = cover_box(*source_size, size)
+    pan = 0 if box[2] < source_size[0] else 1
+    if box[2 + pan] >= source_size[pan]:
+        return CropPlan(box)
+
+    proxy = proxy_size(source_size)
+    starts, profiles = analyse(read_gray_frames(path, proxy, fps, start, duration, job), pan)
+    if not len(profiles):
+        return CropPlan(box)
+
+    scale = proxy[pan] / source_size[pan]
+    window = max(1, min(proxy[pan], round(box[2 + pan] * scale)))
+    follow = max(1, round(FOLLOW_SECONDS * fps))
+    max_step = MAX_PAN_SPEED * window / fps
+
+    path = np.concatenate([
+        _follow(profiles[first:end], window, follow, max_step)
+        for first, end in zip(starts, starts[1:] + [len(profiles)])
+    ])
+    offsets = np.clip(np.rint(path / scale), 0, source_size[pan] - box[2 + pan])
+    return CropPlan(box, offsets, pan)
@@ -0,0 +1,122 @@
+"""
+Ken Burns pan and zoom for still-image timelines. Each image is fitted
+once, MAX_ZOOM times larger than the output, and every graded keyframe is
+kept as a small image pyramid (that image and its successive halvings).
+A moving frame is then one cv2.warpAffine from the pyramid level closest
+to the frame's scale, never a resample of the original photo, and never a
+full-size resize per frame.
+
+    motion = KenBurns(size)
+    base = fitted.fetch(path, motion.source_size(), backend.fit)
+    Timeline(Grader(base), looks, steps, motion=motion)
+"""
+import math
+
+import numpy as np
+
+from lazy_imports import lazy_import
+
+cv2 = lazy_import("cv2")
+
+MAX_ZOOM = 1.25  # the fitted image covers the output at this zoom, pixel for pixel
+
+# (zoom, x, y) at the start and end of a move: zoom runs from 0 (the whole
+# fitted image) to 1 (MAX_ZOOM); x and y place the view from 0 (left or top
+# edge) to 1 (right or bottom edge) of the room the zoom leaves
+MOVES = [
+    ((0.0, 0.5, 0.5), (1.0, 0.5, 0.4)),    # push in, drifting up
+    ((1.0, 0.5, 0.55), (0.0, 0.5, 0.5)),   # pull out
+    ((1.0, 0.0, 0.5), (1.0, 1.0, 0.5)),    # pan left to right
+    ((0.3, 0.5, 0.0), (0.7, 0.5, 1.0)),    # tilt down while pushing in
+    ((1.0, 1.0, 0.45), (1.0, 0.0, 0.55)),  # pan right to left
+    ((0.0, 0.5, 0.5), (1.0, 0.3, 0.35)),   # push in to the upper left
+]
+
+
+class ImagePyramid:
+    """
+    An RGBA frame and its successive halvings (cv2.pyrDown), built on
+    demand. OpenCV warps four-channel images about twice as fast as RGB.
+    """
+
+    def __init__(self, frame):
+        self.levels = [frame]
+
+    @property
+    def nbytes(self):
+        return sum(level.nbytes for level in self.levels)
+
+    def level(self, i):
+        while len(self.levels) <= i:
+            self.levels.append(cv2.pyrDown(self.levels[-1]))
+        return self.levels[i]
+
+
+class KenBurns:
+    """
+    Pan/zoom for a Timeline rendering `size` frames. With `per_keyframe`
+    every keyframe gets its own move (MOVES in turn, starting at `first`)
+    over the frames it is on screen; otherwise the whole timeline is one
+    move, so crossfades between looks of one image keep a steady camera.
+    """
+
+    def __init__(self, size, per_keyframe=True, first=0, max_zoom=MAX_ZOOM):
+        self.size = tuple(size)
+        self.per_keyframe = per_keyframe
+        self.first = first % len(MOVES)
+        self.max_zoom = max_zoom
+
+    def __repr__(self):
+        return f"KenBurns({self.size}, per_keyframe={self.per_keyframe}, first={self.first})"
+
+    def fingerprint(self):
+        return [list(self.size), self.per_keyframe, self.first, self.max_zoom]
+
+    def source_size(self):
+        """
+        Size to fit source images to: the output size times max_zoom,
+        rounded up to even dimensions.
+        """
+        return tuple(2 * math.ceil(side * self.max_zoom / 2) for side in self.size)
+
+    def pyramid(self, frame):
+        return ImagePyramid(cv2.cvtColor(frame, cv2.COLOR_RGB2RGBA))
+
+    def view(self, move, progress):
+        """
+        (zoom, x, y) of `move` at `progress` (0..1), with the zoom in
+        1..max_zoom.
+        """
+        start, end = MOVES[(self.first + move) % len(MOVES)]
+        z, x, y = (a + (b - a) * progress for a, b in zip(start, end))
+        return 1 + z * (self.max_zoom - 1), x, y
+
+    def warp(self, pyramid, move, progress, dst=None):
+        """
+        Frame of `move` at `progress` from a pyramid of a source_size()
+        image: one affine warp from the coarsest level that still has at
+        least one pixel per output pixel. Returns an RGB array, written to
+        `dst` when given.
+        """
+        zoom, x, y = self.view(move, progress)
+        base = pyramid.level(0)
+        height, width = base.shape[:2]
+
+        # visible window in level 0 pixels
+        view_w, view_h = width / zoom, height / zoom
+        left = x * (width - view_w)
+        top = y * (height - view_h)
+
+        scale = self.size[0] / view_w  # output pixels per level 0 pixel
+        level = max(0, int(math.floor(math.log2(1 / scale)))) if scale < 1 else 0
+        source = pyramid.level(level)
+        scale *= 2 ** level
+        left /= 2 ** level
+        top /= 2 ** level
+
+        matrix = np.array([[scale, 0, -scale * left], [0, scale, -scale * top]], dtype=np.float32)
+        frame = cv2.warpAffine(
+            source, matrix, self.size, flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE,
+        )
+        return cv2.cvtColor(frame, cv2.COLOR_RGBA2RGB, dst=dst)
+
@@ -0,0 +1,153 @@
+"""
+Several deliverables from one render. The looks are graded once, on a
+master image that contains the centred crop of every output; each output
+then fits every graded keyframe once to its own size and blends its
+crossfades there. Crossfades and crop/scale are both linear, so this is
+the same picture as scaling every blended master frame, without a
+full-size resize per frame and output. Per frame each output only pays its
+blend, its own captions and its encode; every writer is its own ffmpeg
+process, so the encodes run side by side.
+
+    outputs = [Output("a_9x16.mp4", (1088, 1920)), Output("a_1x1.mp4", (1088, 1088))]
+    master = fit_master(img, [o.size for o in outputs])
+    Renderer(timeline_of(master)).write_outputs(outputs, fps)
+"""
+from lazy_imports import lazy_import
+from render_profile import RenderProfiler
+
+from .backends import cover_box, get_backend
+from .timeline import Timeline
+
+imageio = lazy_import("imageio")
+
+
+def master_plan(source_size, sizes):
+    """
+    (box, size) of the master frame for outputs of `sizes`: `box` is the
+    union of the outputs' centred crops of the source, `size` is that box
+    scaled so every output's crop of it has at least the output's pixels
+    (rounded up to even dimensions).
+    """
+    width, height = source_size
+    crops = [cover_box(width, height, size) for size in sizes]
+
+    left = min(crop[0] for crop in crops)
+    top = min(crop[1] for crop in crops)
+    right = max(crop[0] + crop[2] for crop in crops)
+    bottom = max(crop[1] + crop[3] for crop in crops)
+
+    scale = max(
+        max(size[0] / crop[2], size[1] / crop[3])
+        for size, crop in zip(sizes, crops)
+    )
+    master = (
+        2 * -(-int(round((right - left) * scale)) // 2),
+        2 * -(-int(round((bottom - top) * scale)) // 2),
+    )
+    return (left, top, right, bottom), master
+
+
+def fit_master(img, sizes):
+    """
+    The master image for outputs of `sizes` from a PIL source image.
+    """
+    box, size = master_plan(img.size, sizes)
+    return img.crop(box).resize(size)
+
+
+class FittedKeyframe:
+    """
+    Picklable `render(i)` for an output's timeline: master keyframe i,
+    centre-cropped and scaled to `size`.
+    """
+
+    def __init__(self, master, size, backend):
+        self.master = master
+        self.size = size
+        self.backend = backend
+
+    def __call__(self, i):
+        return self.backend.fit_frame(self.master.keyframe(i), self.size)
+
+
+class Output:
+    """
+    One deliverable: `path` at `size`, with its own caption overlays and
+    imageio writer settings.
+    """
+
+    def __init__(self, path, size, overlays=(), writer_kwargs=None, backend=None):
+        self.path = path
+        self.size = tuple(size)
+        self.overlays = list(overlays)
+        self.writer_kwargs = writer_kwargs or {}
+        self.backend = backend or get_backend()
+        self.writer = None
+
+    def __repr__(self):
+        return f"Output({self.path!r}, {self.size})"
+
+    def timeline(self, master):
+        """
+        `master`'s timeline at this output's size.
+        """
+        return Timeline(
+            FittedKeyframe(master, self.size, self.backend),
+            range(len(master.keyframes)),
+            master.steps,
+            master.lead,
+            master.hold,
+            master.total,
+            self.backend,
+        )
+
+    def open(self, fps):
+        self.writer = imageio.get_writer(self.path, fps=fps, **self.writer_kwargs)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+def write_outputs(renderers, outputs, fps, job=None, profiler=None, progress=None, workers=1):
+    """
+    Encode each output from its renderer, frame by frame in lockstep. With
+    workers > 1 the workers are shared out between the outputs' frame
+    pipelines, as is the job's memory budget. `progress(done, count)` is
+    called per segment; a cancelled `job` stops between frames and every
+    writer is closed either way.
+    """
+    profiler = profiler or RenderProfiler()
+    count = len(renderers[0].segment_sizes())
+    per_output = max(1, workers // len(renderers)) if workers > 1 else 1
+    budget = job.budget.share(len(renderers)) if job else None
+    streams = [renderer.frames(per_output, profiler, budget) for renderer in renderers]
+
+    for output in outputs:
+        output.open(fps)
+
+    try:
+        current = 0
+        for frames in zip(*streams):
+            if job:
+                job.check()
+            segment = frames[0][0]
+            if progress and segment != current:
+                progress(segment, count)
+                current = segment
+            for output, (_, frame) in zip(outputs, frames):
+                with profiler.stage("encode"):
+                    output.writer.append_data(frame)
+    except BaseException:
+        for stream in streams:
+            stream.close()
+        for output in outputs:
+            output.close()
+        raise
+
+    with profiler.stage("encode_flush"):
+        for output in outputs:
+            output.close()
+    if progress:
+        progress(count, count)
@@ -0,0 +1,68 @@
+"""
+Caption overlays drawn on finished frames. Each overlay is a picklable
+callable `overlay(frame, index)` returning the captioned frame; `index` is
+the full-rate timeline frame number, so animations run at the same speed in
+drafts. `scale` shrinks text, bars and animation offsets for draft-size
+frames. Text is drawn from cached TrueType sprites (render_engine.text),
+so a caption costs one small blend per frame.
+"""
+import numpy as np
+
+from .text import caption_sprite, font_px
+
+
+def floating_caption(frame, text, frame_index, scale=1.0, x=0.15, y=0.9, amplitude=25, font_scale=1.1,
+                     opacity=0.6, outline=0, shadow=False):
+    """
+    White caption that floats up and down around (x, y), given as fractions
+    of the frame size, blended in at `opacity` for a soft look. `outline`
+    (pixels at full size) and `shadow` make it stand out on busy frames.
+    """
+    if not text:
+        return frame
+
+    h, w, _ = frame.shape
+    baseline = int(h * y + amplitude * scale * np.sin(frame_index / 12))
+    sprite = caption_sprite(
+        text, font_px(font_scale, scale), opacity=opacity, outline=round(outline * scale), shadow=shadow,
+    )
+    return sprite.blit(frame.copy(), int(w * x), baseline)
+
+
+def caption_bars(frame, top_text, bottom_text, scale=1.0):
+    """
+    Dark bars across the top and bottom with white captions in them.
+    """
+    h, w, _ = frame.shape
+    bar_h = int(h * 0.12)
+
+    out = frame.copy()
+    out[:bar_h] >>= 2
+    out[h - bar_h:] >>= 2
+
+    px = font_px(1.1, scale)
+    if top_text:
+        caption_sprite(top_text, px, opacity=0.75).blit(out, int(w * 0.03), int(bar_h * 0.65))
+    if bottom_text:
+        caption_sprite(bottom_text, px, opacity=0.75).blit(out, int(w * 0.03), int(h - bar_h * 0.35))
+    return out
+
+
+class FloatingCaption:
+    def __init__(self, text, scale=1.0, **style):
+        self.text = text
+        self.scale = scale
+        self.style = style
+
+    def __call__(self, frame, index):
+        return floating_caption(frame, self.text, index, self.scale, **self.style)
+
+
+class CaptionBars:
+    def __init__(self, top_text, bottom_text, scale=1.0):
+        self.top_text = top_text
+        self.bottom_text = bottom_text
+        self.scale = scale
+
+    def __call__(self, frame, index):
+        return caption_bars(frame, self.top_text, self.bottom_text, self.scale)
@@ -0,0 +1,146 @@
+"""
+Turns a Timeline plus caption overlays into encoded video: frame by frame,
+one segment at a time for SegmentedRender, or straight into shared-memory
+rings for a FramePipeline.
+"""
+import numpy as np
+
+from frame_transport import FramePipeline
+from lazy_imports import lazy_import
+from render_profile import RenderProfiler
+
+from .outputs import write_outputs
+
+imageio = lazy_import("imageio")
+
+
+class Renderer:
+    """
+        renderer = Renderer(timeline, [FloatingCaption("Follow", mode.scale)],
+                            index_step=mode.fps_divisor)
+        renderer.write(path, fps, mode.writer_kwargs(), job, profiler, progress, workers)
+
+    Overlays are `overlay(frame, index)` callables run in order on every
+    frame; `index` is the frame number times `index_step`, so a draft at a
+    reduced frame rate animates at full-rate speed. Renderers are picklable
+    when the timeline and overlays are, so `fill_segment` and
+    `segment_frames` can be handed to worker processes.
+    """
+
+    def __init__(self, timeline, overlays=(), index_step=1):
+        self.timeline = timeline
+        self.overlays = list(overlays)
+        self.index_step = index_step
+
+    def __len__(self):
+        return len(self.timeline)
+
+    def frame(self, index, dst=None, profiler=None):
+        profiler = profiler or RenderProfiler()
+        frame = self.timeline.frame(index, dst, profiler)
+
+        if self.overlays:
+            with profiler.stage("captions"):
+                for overlay in self.overlays:
+                    frame = overlay(frame, index * self.index_step)
+            if dst is not None and frame is not dst:
+                np.copyto(dst, frame)
+                frame = dst
+        return frame
+
+    # -------------------------
+    def segment_sizes(self):
+        return self.timeline.segment_sizes()
+
+    def segment_frames(self, i, profiler=None):
+        """
+        Yield the frames of segment i (see Timeline.segment_sizes).
+        """
+        start = self.timeline.segment_starts()[i]
+        for index in range(start, start + self.segment_sizes()[i]):
+            yield self.frame(index, profiler=profiler)
+
+    def fill_segment(self, i, ring):
+        """
+        FramePipeline worker: render segment i straight into the ring's
+        shared-memory slots.
+        """
+        start = self.timeline.segment_starts()[i]
+        for index in range(start, start + self.segment_sizes()[i]):
+            with ring.write_slot() as slot:
+                self.frame(index, dst=slot)
+
+    def limit_memory(self, budget, workers=1):
+        """
+        Cap the timeline's memoized keyframes in each of `workers`
+        processes to their part of the MemoryBudget `budget`.
+        """
+        self.timeline.memo_bytes = budget.share(workers).cache_bytes()
+
+    # -------------------------
+    def frames(self, workers=1, profiler=None, budget=None):
+        """
+        Yield (segment, frame) for the whole timeline in order. With
+        workers > 1 segments are rendered by a FramePipeline (sized to the
+        MemoryBudget `budget`) and each frame is a shared-memory view that
+        is recycled on the next iteration.
+        """
+        if budget is not None:
+            self.limit_memory(budget, workers)
+        if workers <= 1:
+            for i in range(len(self.segment_sizes())):
+                for frame in self.segment_frames(i, profiler):
+                    yield i, frame
+            return
+
+        shape = self.frame(0).shape
+        sizes = self.segment_sizes()
+        with FramePipeline(shape, sizes, self.fill_segment, workers, budget=budget) as frames:
+            frames = iter(frames)
+            for i, size in enumerate(sizes):
+                for _ in range(size):
+                    yield i, next(frames)
+
+    def write(self, path, fps, writer_kwargs=None, job=None, profiler=None, progress=None, workers=1):
+        """
+        Encode the whole timeline to `path`. `progress(done, count)` is
+        called after each segment; a cancelled `job` stops between frames.
+        With workers > 1 only encoding runs in this process (stage timings
+        then only cover it).
+        """
+        profiler = profiler or RenderProfiler()
+        count = len(self.segment_sizes())
+
+        writer = imageio.get_writer(path, fps=fps, **(writer_kwargs or {}))
+        frames = self.frames(workers, profiler, job and job.budget)
+        try:
+            current = 0
+            for i, frame in frames:
+                if job:
+                    job.check()
+                if progress and i != current:
+                    progress(i, count)
+                    current = i
+                with profiler.stage("encode"):
+                    writer.append_data(frame)
+        except BaseException:
+            frames.close()  # stops the pipeline workers
+            writer.close()
+            raise
+
+        with profiler.stage("encode_flush"):
+            writer.close()
+        if progress:
+            progress(count, count)
+
+    def write_outputs(self, outputs, fps, job=None, profiler=None, progress=None, workers=1):
+        """
+        Render this (master) timeline once into every Output in `outputs`,
+        each with its own captions; see render_engine.outputs. The
+        renderer's own overlays are not used.
+        """
+        renderers = [
+            Renderer(output.timeline(self.timeline), output.overlays, self.index_step)
+            for output in outputs
+        ]
+        write_outputs(renderers, outputs, fps, job, profiler, progress, workers)
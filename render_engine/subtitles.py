@@ -0,0 +1,179 @@
+"""
+Burned-in subtitle tracks from SRT or WebVTT files. Every cue is wrapped
+and rasterized into caption sprites once (render_engine.text), and an
+interval index maps a time to its active cues with one binary search, so
+frames outside every cue cost a lookup and nothing else.
+
+    track = CaptionTrack.load("talk.srt")
+    track.prepare(width, scale)           # rasterize every cue up front
+    frame = track.draw(frame, seconds, scale)
+"""
+import re
+from bisect import bisect_right
+
+from .text import caption_sprite, font_px, glyph_atlas, font_names
+
+SUBTITLE_FONT_SCALE = 1.5
+SUBTITLE_BOTTOM = 0.84  # baseline of a cue's last line, as a fraction of the frame height
+SUBTITLE_WIDTH = 0.88  # longest line, as a fraction of the frame width
+SUBTITLE_OUTLINE = 3  # pixels at full size
+LINE_SPACING = 1.25  # line pitch in font sizes
+
+_TIMING = re.compile(
+    r"(?:(\d+):)?(\d{1,2}):(\d{2})[,.](\d{3})\s*-->\s*(?:(\d+):)?(\d{1,2}):(\d{2})[,.](\d{3})"
+)
+_TAGS = re.compile(r"<[^>]*>|\{\\[^}]*\}")
+
+
+class Cue:
+    def __init__(self, start, end, text):
+        self.start = start
+        self.end = end
+        self.text = text
+
+    def __repr__(self):
+        return f"Cue({self.start:.3f}, {self.end:.3f}, {self.text!r})"
+
+
+def _seconds(hours, minutes, seconds, millis):
+    return int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds) + int(millis) / 1000
+
+
+def parse_cues(text):
+    """
+    Cues of an SRT or WebVTT document: every block with a timing line.
+    Cue numbers, identifiers, VTT settings, NOTE/STYLE blocks and markup
+    tags are dropped.
+    """
+    cues = []
+    for block in re.split(r"\n\s*\n", text.replace("\r\n", "\n").replace("\r", "\n")):
+        lines = block.strip("\n").split("\n")
+        for i, line in enumerate(lines):
+            match = _TIMING.search(line)
+            if match:
+                body = "\n".join(_TAGS.sub("", l).strip() for l in lines[i + 1:]).strip()
+                start = _seconds(*match.groups()[:4])
+                end = _seconds(*match.groups()[4:])
+                if body and end > start:
+                    cues.append(Cue(start, end, body))
+                break
+    return cues
+
+
+class IntervalIndex:
+    """
+    Active interval ids per time: the interval end points split the line
+    into elementary spans whose active sets are computed once, and a
+    lookup is one bisect over the span starts.
+    """
+
+    def __init__(self, intervals):
+        opening, closing = {}, {}
+        for i, (start, end) in enumerate(intervals):
+            opening.setdefault(start, []).append(i)
+            closing.setdefault(end, []).append(i)
+
+        self.bounds = sorted(set(opening) | set(closing))
+        self.active = []
+        current = set()
+        for t in self.bounds:
+            current.difference_update(closing.get(t, ()))
+            current.update(opening.get(t, ()))
+            self.active.append(tuple(sorted(current)))
+
+    def at(self, t):
+        i = bisect_right(self.bounds, t) - 1
+        return self.active[i] if i >= 0 else ()
+
+
+def wrap(text, px, max_width):
+    """
+    Lines of `text` no wider than `max_width` pixels at `px`, breaking
+    between words (a single long word keeps its own line).
+    """
+    atlas = glyph_atlas(px, font_names())
+
+    def width(s):
+        return sum(atlas.glyph(ch).advance for ch in s)
+
+    lines = []
+    for paragraph in text.split("\n"):
+        line = ""
+        for word in paragraph.split():
+            candidate = f"{line} {word}" if line else word
+            if line and width(candidate) > max_width:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        if line:
+            lines.append(line)
+    return lines
+
+
+class CaptionTrack:
+    """
+    Timed captions drawn centred near the bottom of the frame, white with
+    an outline and a shadow. Sprites are built per frame width and scale
+    on first use (or up front with prepare) and are not pickled, so worker
+    processes only rasterize the cues they draw.
+    """
+
+    def __init__(self, cues):
+        self.cues = sorted(cues, key=lambda cue: cue.start)
+        self.index = IntervalIndex([(cue.start, cue.end) for cue in self.cues])
+        self._sprites = {}
+
+    def __len__(self):
+        return len(self.cues)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_sprites"] = {}
+        return state
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8-sig", errors="replace") as f:
+            return cls(parse_cues(f.read()))
+
+    def sprites(self, i, width, scale=1.0):
+        """
+        (line sprites, pixel size) of cue i for frames `width` pixels wide.
+        """
+        key = (i, width, scale)
+        sprites = self._sprites.get(key)
+        if sprites is None:
+            px = font_px(SUBTITLE_FONT_SCALE, scale)
+            lines = wrap(self.cues[i].text, px, width * SUBTITLE_WIDTH)
+            sprites = self._sprites[key] = [
+                caption_sprite(line, px, outline=max(1, round(SUBTITLE_OUTLINE * scale)), shadow=True)
+                for line in lines
+            ], px
+        return sprites
+
+    def prepare(self, width, scale=1.0):
+        """
+        Rasterize every cue now (when the track is loaded) rather than
+        during the render.
+        """
+        for i in range(len(self.cues)):
+            self.sprites(i, width, scale)
+
+    def draw(self, frame, seconds, scale=1.0):
+        """
+        Draw the cues active at `seconds` onto `frame` in place; later
+        cues stack above earlier ones. Returns the frame.
+        """
+        active = self.index.at(seconds)
+        if not active:
+            return frame
+
+        h, w = frame.shape[:2]
+        baseline = int(h * SUBTITLE_BOTTOM)
+        for i in active:
+            sprites, px = self.sprites(i, w, scale)
+            for sprite in reversed(sprites):
+                sprite.blit(frame, (w - sprite.width) // 2 + sprite.left, baseline)
+                baseline -= int(px * LINE_SPACING)
+        return frame
@@ -0,0 +1,275 @@
+"""
+TrueType captions. cv2.putText only knows its Hershey fonts (ASCII), so
+captions are drawn from real TTF/OTF fonts instead:
+
+* a GlyphAtlas rasterizes each glyph of a font stack once per pixel size,
+  with outline and shadow variants, falling back through the stack for
+  characters a font lacks (emoji, CJK, Arabic...);
+* caption_sprite() composes a caption from the atlas into a Sprite once
+  per text and style (cached);
+* Sprite.blit() is the only per-frame cost: one small alpha blend of the
+  sprite's rectangle.
+
+Fonts are looked up by file name in the system font folders (or by path);
+$SHORTS_CAPTION_FONTS puts your own fonts (os.pathsep-separated) in front
+of DEFAULT_FONTS. Colour bitmap emoji fonts such as Noto Color Emoji only
+load at one size and are scaled. Scripts that need shaping (Arabic, Indic)
+are drawn as whole runs by PIL's Raqm layout when it is installed, and
+glyph by glyph (unjoined) otherwise.
+"""
+import os
+import unicodedata
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont, features
+
+from lazy_imports import lazy_import
+
+cv2 = lazy_import("cv2")
+
+FONT_ENV = "SHORTS_CAPTION_FONTS"
+DEFAULT_FONTS = [
+    "DejaVuSans-Bold.ttf", "NotoSans-Bold.ttf", "arialbd.ttf", "Arial Bold.ttf",
+    "NotoSansCJK-Bold.ttc", "NotoSansArabic-Bold.ttf", "NotoSansDevanagari-Bold.ttf", "msyhbd.ttc",
+    "NotoColorEmoji.ttf", "seguiemj.ttf", "Apple Color Emoji.ttc",
+    "DejaVuSans.ttf", "arial.ttf",
+]
+FONT_PX = 30  # pixel size of font_scale 1.0, close to cv2's Hershey simplex
+BITMAP_EMOJI_PX = 109  # the only size colour bitmap (CBDT) emoji fonts load at
+SHADOW_OFFSET = 0.08  # shadow offset and blur, as fractions of the pixel size
+SHADOW_OPACITY = 0.6
+ATLASES = 8  # cached glyph atlases (one per font stack and pixel size)
+SPRITES = 128  # cached caption sprites
+SHAPED_BIDI = {"R", "AL", "AN"}  # bidi classes that need a shaping layout
+
+
+def font_names():
+    """
+    $SHORTS_CAPTION_FONTS, then DEFAULT_FONTS.
+    """
+    custom = [name for name in os.environ.get(FONT_ENV, "").split(os.pathsep) if name]
+    return tuple(custom + DEFAULT_FONTS)
+
+
+def _load_font(name, px):
+    """
+    (font, scale) for `name` at `px`, or None when it is not installed.
+    Bitmap emoji fonts are loaded at their own size; `scale` maps them to `px`.
+    """
+    try:
+        return ImageFont.truetype(name, px), 1.0
+    except OSError:
+        pass
+    try:
+        return ImageFont.truetype(name, BITMAP_EMOJI_PX), px / BITMAP_EMOJI_PX
+    except OSError:
+        return None
+
+
+def _needs_shaping(text):
+    return any(
+        unicodedata.bidirectional(ch) in SHAPED_BIDI or unicodedata.category(ch) == "Mc"
+        for ch in text
+    )
+
+
+class Glyph:
+    """
+    One rasterized glyph: `image` is an L mask (or RGBA for colour
+    glyphs) whose top-left sits at (left, top) from the pen position on
+    the baseline; the pen then moves `advance` pixels.
+    """
+
+    def __init__(self, image, left, top, advance):
+        self.image = image
+        self.left = left
+        self.top = top
+        self.advance = advance
+
+    @property
+    def colour(self):
+        return self.image.ndim == 3
+
+
+def _rasterize(font, scale, text, outline=0):
+    """
+    Glyph for `text` (a character, or a shaped run) drawn with `font`.
+    """
+    left, top, right, bottom = font.getbbox(text, anchor="ls", stroke_width=outline)
+    width, height = max(1, right - left), max(1, bottom - top)
+
+    img = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    ImageDraw.Draw(img).text(
+        (-left, -top), text, font=font, anchor="ls", fill=(255, 255, 255, 255),
+        stroke_width=outline, stroke_fill=(255, 255, 255, 255), embedded_color=True,
+    )
+    rgba = np.asarray(img)
+    colour = bool((rgba[..., :3] != 255)[rgba[..., 3] > 0].any())
+    advance = font.getlength(text)
+
+    if scale != 1.0:
+        img = img.resize((max(1, round(width * scale)), max(1, round(height * scale))), Image.LANCZOS)
+        rgba = np.asarray(img)
+        left, top, advance = left * scale, top * scale, advance * scale
+
+    image = rgba if colour else np.ascontiguousarray(rgba[..., 3])
+    return Glyph(image, int(round(left)), int(round(top)), advance)
+
+
+class GlyphAtlas:
+    """
+    Glyphs of one font stack at one pixel size, each rasterized once per
+    variant: plain, or with an `outline` stroke in pixels. The first font
+    of the stack that has a character draws it.
+    """
+
+    def __init__(self, names, px):
+        self.px = px
+        self.fonts = [font for font in (_load_font(name, px) for name in names) if font]
+        if not self.fonts:
+            self.fonts = [(ImageFont.load_default(size=px), 1.0)]
+        self._notdef = [np.asarray(font.getmask("\U0010ffff")) for font, _ in self.fonts]
+        self._glyphs = {}
+
+    def font_for(self, ch):
+        """
+        (font, scale) of the first font in the stack with a glyph for `ch`.
+        """
+        if ch.isspace():
+            return self.fonts[0]
+        for (font, scale), notdef in zip(self.fonts, self._notdef):
+            if not np.array_equal(np.asarray(font.getmask(ch)), notdef):
+                return font, scale
+        return self.fonts[0]  # nobody has it: the first font's missing-glyph box
+
+    def glyph(self, text, outline=0):
+        key = (text, outline)
+        glyph = self._glyphs.get(key)
+        if glyph is None:
+            font, scale = self.font_for(text[0])
+            glyph = self._glyphs[key] = _rasterize(font, scale, text, round(outline / scale))
+        return glyph
+
+    def runs(self, text):
+        """
+        The pieces `text` is drawn in: single characters, or whole words
+        that need shaping when Raqm is available.
+        """
+        if not features.check("raqm"):
+            return list(text)
+        pieces = []
+        for word in text.split(" "):
+            pieces += [word] if _needs_shaping(word) else list(word)
+            pieces.append(" ")
+        return pieces[:-1]
+
+
+@lru_cache(maxsize=ATLASES)
+def glyph_atlas(px, names):
+    return GlyphAtlas(names, px)
+
+
+class Sprite:
+    """
+    A rendered caption, from a premultiplied float RGBA image (0..1),
+    kept as 8-bit premultiplied colour and alpha (4 bytes a pixel, so
+    hundreds of cached cues stay small). (left, baseline) is the pen
+    origin inside the sprite.
+    """
+
+    def __init__(self, rgba, left, baseline):
+        self.colour = np.rint(rgba[..., :3] * 255).astype(np.uint8)
+        self.alpha = np.rint(rgba[..., 3:] * 255).astype(np.uint8)
+        self.left = left
+        self.baseline = baseline
+        self.height, self.width = rgba.shape[:2]
+
+    def blit(self, frame, x, y):
+        """
+        Blend the sprite into `frame` in place with its pen origin at (x, y)
+        (y on the baseline), clipped to the frame.
+        """
+        top, left = y - self.baseline, x - self.left
+        h, w = frame.shape[:2]
+        y0, x0 = max(0, top), max(0, left)
+        y1, x1 = min(h, top + self.height), min(w, left + self.width)
+        if y0 >= y1 or x0 >= x1:
+            return frame
+
+        sy, sx = y0 - top, x0 - left
+        colour = self.colour[sy:sy + y1 - y0, sx:sx + x1 - x0].astype(np.uint16)
+        inverse = 255 - self.alpha[sy:sy + y1 - y0, sx:sx + x1 - x0].astype(np.uint16)
+        roi = frame[y0:y1, x0:x1]
+        roi[...] = (roi * inverse + colour * 255 + 127) // 255
+        return frame
+
+
+def _paste(canvas, mask, x, y, colour, opacity=1.0):
+    """
+    Composite an L `mask` in `colour` (or an RGBA image) over the
+    premultiplied float RGBA canvas.
+    """
+    h, w = mask.shape[:2]
+    region = canvas[y:y + h, x:x + w]
+    if mask.ndim == 3:
+        rgb, alpha = mask[..., :3] / 255.0, mask[..., 3:] / 255.0 * opacity
+    else:
+        rgb, alpha = np.asarray(colour, dtype=np.float32) / 255.0, mask[..., None] / 255.0 * opacity
+    region[..., :3] = rgb * alpha + region[..., :3] * (1 - alpha)
+    region[..., 3:] = alpha + region[..., 3:] * (1 - alpha)
+
+
+@lru_cache(maxsize=SPRITES)
+def caption_sprite(text, px, colour=(255, 255, 255), opacity=1.0, outline=0, outline_colour=(0, 0, 0),
+                   shadow=False):
+    """
+    Sprite of one line of `text` at `px` pixels, optionally with an
+    `outline` (stroke width in pixels) and a soft drop shadow, at
+    `opacity`. Cached, so animated captions only pay Sprite.blit per frame.
+    """
+    atlas = glyph_atlas(px, font_names())
+    placed = []
+    pen = 0.0
+    for piece in atlas.runs(text):
+        placed.append((int(round(pen)), atlas.glyph(piece), atlas.glyph(piece, outline) if outline else None))
+        pen += atlas.glyph(piece).advance
+
+    boxes = [(x + g.left, g.top, x + g.left + g.image.shape[1], g.top + g.image.shape[0])
+             for x, glyph, stroked in placed for g in filter(None, (glyph, stroked))]
+    if not boxes:
+        return Sprite(np.zeros((1, 1, 4), np.float32), 0, 0)
+
+    offset = max(1, round(px * SHADOW_OFFSET)) if shadow else 0
+    pad = 2 * offset
+    left = min(b[0] for b in boxes) - pad
+    top = min(b[1] for b in boxes) - pad
+    width = max(b[2] for b in boxes) - left + 2 * pad
+    height = max(b[3] for b in boxes) - top + 2 * pad
+    canvas = np.zeros((height, width, 4), np.float32)
+
+    if shadow:
+        layer = np.zeros((height, width), np.float32)
+        for x, glyph, stroked in placed:
+            g = stroked or glyph
+            mask = g.image[..., 3] if g.colour else g.image
+            gx, gy = x + g.left - left + offset, g.top - top + offset
+            region = layer[gy:gy + mask.shape[0], gx:gx + mask.shape[1]]
+            np.maximum(region, mask, out=region)
+        layer = cv2.GaussianBlur(layer, (0, 0), offset)
+        _paste(canvas, layer, 0, 0, (0, 0, 0), SHADOW_OPACITY)
+
+    for x, glyph, stroked in placed:
+        if stroked is not None and not stroked.colour:
+            _paste(canvas, stroked.image, x + stroked.left - left, stroked.top - top, outline_colour)
+        _paste(canvas, glyph.image, x + glyph.left - left, glyph.top - top, colour)
+
+    canvas *= opacity
+    return Sprite(canvas, -left, -top)
+
+
+def font_px(font_scale, scale=1.0):
+    """
+    Pixel size for a cv2-style `font_scale` on a frame drawn at `scale`.
+    """
+    return max(6, round(FONT_PX * font_scale * scale))
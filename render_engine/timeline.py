@@ -0,0 +1,240 @@
+"""
+The keyframe/crossfade timeline every still-image exporter renders:
+
+    [keyframe 0] * lead
+    for each next keyframe i:
+        `steps` transition frames (i-1 -> i, alpha = step / steps)
+        [keyframe i] * hold
+    padded with the last keyframe up to `total` frames
+
+Keyframes are graded lazily and memoized, so each look is computed once
+(per process) and a crossfade costs one backend blend per frame. Other
+transitions (render_engine.transitions) replace the crossfade in turn,
+one per keyframe change. With a
+`motion` (render_engine.motion.KenBurns) keyframes are rendered at the
+motion's source size and memoized as image pyramids; every frame then
+warps each visible keyframe to the output size before blending.
+"""
+import threading
+from collections import OrderedDict
+
+from image_cache import open_fitted
+from render_profile import RenderProfiler
+
+from .backends import get_backend
+
+KEYFRAME_MEMO = 4  # graded keyframes kept per timeline (6 MB each at 1088x1920)
+MIN_KEYFRAME_MEMO = 2  # both sides of a crossfade, whatever `memo_bytes` says
+
+
+class Grader:
+    """
+    Picklable `render(look)` for a Timeline: grades one base image with the
+    backend. `base` is a PIL image or a FittedImageCache reference, which
+    is only opened when the first look is graded (in the worker process
+    when the timeline is sent to one).
+    """
+
+    def __init__(self, base, backend=None, baker=None):
+        self.base = base
+        self.backend = backend or get_backend()
+        self.baker = baker
+        self._img = None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_img"] = None
+        return state
+
+    @property
+    def image(self):
+        if self._img is None:
+            self._img = open_fitted(self.base)
+        return self._img
+
+    def __call__(self, look):
+        return self.backend.grade(self.image, look, self.baker)
+
+
+class Timeline:
+    """
+    `render(keyframe)` returns a uint8 RGB array; `frame(index)` returns
+    the timeline frame at `index`. The timeline is picklable when `render`
+    is (a Grader, a module-level function or a functools.partial of one).
+    At most KEYFRAME_MEMO keyframes are memoized, fewer when they would
+    exceed `memo_bytes` (set from the job's MemoryBudget by the Renderer).
+    """
+
+    def __init__(self, render, keyframes, steps, lead=0, hold=0, total=None, backend=None, motion=None,
+                 transitions=()):
+        self.render = render
+        self.keyframes = list(keyframes)
+        self.steps = steps
+        self.lead = lead
+        self.hold = hold
+        self.backend = backend or get_backend()
+        self.motion = motion
+        self.transitions = list(transitions)
+        self.memo_bytes = None
+
+        natural = lead + (len(self.keyframes) - 1) * (steps + hold)
+        self.total = max(natural, total or 0)
+        self._rendered = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.total
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state["_rendered"], state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._rendered = OrderedDict()
+        self._lock = threading.Lock()
+
+    def keyframe(self, i):
+        # the preview cache and the preview player read frames from two threads
+        with self._lock:
+            frame = self._rendered.get(i)
+            if frame is not None:
+                self._rendered.move_to_end(i)
+                return frame
+
+        frame = self.render(self.keyframes[i])
+        if self.motion is not None:
+            frame = self.motion.pyramid(frame)
+        with self._lock:
+            self._rendered[i] = frame
+            while self._memo_full():
+                self._rendered.popitem(last=False)
+        return frame
+
+    def _memo_full(self):
+        count = len(self._rendered)
+        if count > KEYFRAME_MEMO:
+            return True
+        if self.memo_bytes is None or count <= MIN_KEYFRAME_MEMO:
+            return False
+        return sum(frame.nbytes for frame in self._rendered.values()) > self.memo_bytes
+
+    def locate(self, index):
+        """
+        Map a frame index to (from_keyframe, to_keyframe, alpha).
+        """
+        last = len(self.keyframes) - 1
+        if index < self.lead or last == 0:
+            return 0, 0, 0.0
+
+        segment = self.steps + self.hold
+        i, r = divmod(index - self.lead, segment)
+        i += 1
+        if i > last:
+            return last, last, 0.0
+        if r < self.steps:
+            return i - 1, i, r / self.steps
+        return i, i, 0.0
+
+    def keyframe_span(self, i):
+        """
+        (first, end) frames during which keyframe i is on screen, from the
+        start of its fade in to the end of its fade out.
+        """
+        first = 0 if i == 0 else self.lead + (i - 1) * (self.steps + self.hold)
+        if i == len(self.keyframes) - 1:
+            return first, self.total
+        return first, self.lead + i * (self.steps + self.hold) + self.steps
+
+    def moving(self, i, pyramid, index, dst=None):
+        """
+        Keyframe i (as `pyramid`) warped by the motion for frame `index`.
+        """
+        if self.motion.per_keyframe:
+            first, end = self.keyframe_span(i)
+            move = i
+        else:
+            first, end = 0, self.total
+            move = 0
+        progress = min(1.0, max(0.0, (index - first) / max(1, end - 1 - first)))
+        return self.motion.warp(pyramid, move, progress, dst)
+
+    def frame(self, index, dst=None, profiler=None):
+        """
+        Frame `index` as a uint8 array, blended into `dst` when given.
+        Frames that are not crossfades are the memoized keyframe itself
+        (without `dst`, and without motion), so do not modify them in
+        place.
+        """
+        profiler = profiler or RenderProfiler()
+        a, b, alpha = self.locate(index)
+
+        if self.motion is not None:
+            return self.moving_frame(a, b, alpha, index, dst, profiler)
+
+        with profiler.stage("effects"):
+            frame_a = self.keyframe(a)
+            frame_b = self.keyframe(b) if alpha else None
+
+        if frame_b is None:
+            if dst is None:
+                return frame_a
+            dst[...] = frame_a
+            return dst
+
+        with profiler.stage("blend"):
+            return self.blend(b, frame_a, frame_b, alpha, dst)
+
+    def blend(self, i, a, b, alpha, dst=None):
+        """
+        Frame `alpha` of the way through the transition into keyframe i,
+        a backend crossfade unless the timeline has transitions.
+        """
+        if self.transitions:
+            transition = self.transitions[(i - 1) % len(self.transitions)]
+            return transition(a, b, alpha, dst)
+        return self.backend.blend(a, b, alpha, dst)
+
+    def moving_frame(self, a, b, alpha, index, dst, profiler):
+        """
+        Each visible keyframe warped from its memoized pyramid, then the
+        two output-size frames blended; nothing full-size is redone per
+        frame.
+        """
+        with profiler.stage("effects"):
+            pyramid_a = self.keyframe(a)
+            pyramid_b = self.keyframe(b) if alpha else None
+
+        with profiler.stage("motion"):
+            frame_a = self.moving(a, pyramid_a, index, dst)
+            if pyramid_b is None:
+                return frame_a
+            frame_b = self.moving(b, pyramid_b, index)
+
+        with profiler.stage("blend"):
+            return self.blend(b, frame_a, frame_b, alpha, frame_a)
+
+    # -------------------------
+    def segment_sizes(self):
+        """
+        Frame counts of the natural render segments: one per transition
+        (its crossfade and hold), the lead in the first and the padding up
+        to `total` in the last.
+        """
+        transitions = len(self.keyframes) - 1
+        if transitions == 0:
+            return [self.total]
+
+        sizes = [self.steps + self.hold] * transitions
+        sizes[0] += self.lead
+        sizes[-1] += self.total - sum(sizes)
+        return sizes
+
+    def segment_starts(self):
+        starts = []
+        start = 0
+        for size in self.segment_sizes():
+            starts.append(start)
+            start += size
+        return starts
@@ -0,0 +1,336 @@
+"""
+Multi-node render farm over a shared directory, with no broker.
+
+A batch is written once into a queue dir on a filesystem every node can see
+(NFS, SMB, a synced volume):
+
+    queue.json          handler module, batch settings and the item list
+    leases/<id>.lease   held by the node rendering item <id>
+    done/<id>.json      written when the item's output is in place, with
+                        its render time and peak memory
+    failed/<id>.json    the error, when rendering raised
+
+A node claims an item by creating its lease with O_CREAT|O_EXCL, which only
+one node can win. While it renders, it touches the lease every
+HEARTBEAT_SECONDS. A lease that has not been touched for LEASE_SECONDS
+belongs to a dead node: the next node renames it aside and claims the item
+itself. If a node finds its own lease gone or taken over, it abandons the
+item. Outputs are rendered under a node-unique temp name and renamed into
+place, so the output dir never holds a half-written file, even if two nodes
+briefly render the same item.
+
+Lease expiry compares file mtimes with the local clock, so keep the nodes'
+clocks in sync (NTP).
+
+The handler module renders the items. `render_farm_item(settings, item,
+temp_path, job, workers)` must leave `item["output"]` complete; see
+batch_vertical_60s_text_random.py.
+
+Usage:
+    python render_farm.py node QUEUE_DIR [--workers N]
+    python render_farm.py local QUEUE_DIR --nodes 4     # test farm on one box
+    python render_farm.py status QUEUE_DIR
+"""
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+from memory_budget import MemoryBudget
+from render_jobs import RenderCancelled, RenderJob
+
+QUEUE_FILE = "queue.json"
+LEASE_SECONDS = 60
+HEARTBEAT_SECONDS = 10
+POLL_SECONDS = 5
+
+
+def node_name():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def write_json_atomic(path, data):
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=".farm-", suffix=".json", dir=folder)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=2)
+        os.chmod(tmp, 0o644)  # readable by nodes running as other users
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+# =========================
+# QUEUE
+# =========================
+def create_queue(queue_dir, module, settings, items):
+    """
+    Write a queue of `items` (dicts with at least "output") for nodes to
+    render with `module.render_farm_item`. Returns the item count.
+    """
+    for sub in ("leases", "done", "failed"):
+        os.makedirs(os.path.join(queue_dir, sub), exist_ok=True)
+
+    items = [{"id": f"{i:05d}", **item} for i, item in enumerate(items)]
+    write_json_atomic(os.path.join(queue_dir, QUEUE_FILE), {
+        "module": module,
+        "settings": settings,
+        "items": items,
+    })
+    return len(items)
+
+
+def load_queue(queue_dir):
+    with open(os.path.join(queue_dir, QUEUE_FILE)) as f:
+        return json.load(f)
+
+
+def item_state(queue_dir, item_id):
+    if os.path.exists(os.path.join(queue_dir, "done", item_id + ".json")):
+        return "done"
+    if os.path.exists(os.path.join(queue_dir, "failed", item_id + ".json")):
+        return "failed"
+    if os.path.exists(os.path.join(queue_dir, "leases", item_id + ".lease")):
+        return "leased"
+    return "pending"
+
+
+# =========================
+# LEASES
+# =========================
+class Lease:
+    def __init__(self, queue_dir, item_id, node):
+        self.path = os.path.join(queue_dir, "leases", item_id + ".lease")
+        self.node = node
+
+    @staticmethod
+    def _expired(path):
+        return time.time() - os.stat(path).st_mtime > LEASE_SECONDS
+
+    def acquire(self):
+        for _ in range(2):
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if not self._reclaim():
+                    return False
+                continue
+            with os.fdopen(fd, "w") as f:
+                json.dump({"node": self.node, "acquired": time.time()}, f)
+            return True
+        return False
+
+    def _reclaim(self):
+        """
+        Move an expired lease aside so it can be claimed again. Returns
+        True when the item is free to claim.
+        """
+        try:
+            if not self._expired(self.path):
+                return False
+        except FileNotFoundError:
+            return True
+
+        tombstone = f"{self.path}.expired-{self.node}"
+        try:
+            os.rename(self.path, tombstone)
+        except FileNotFoundError:
+            return True  # another node moved it first
+
+        try:
+            if not self._expired(tombstone):
+                # lost a race: this is a lease another node just took
+                try:
+                    os.link(tombstone, self.path)
+                except FileExistsError:
+                    pass
+                return False
+            return True
+        finally:
+            os.remove(tombstone)
+
+    def owned(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f).get("node") == self.node
+        except (OSError, ValueError):
+            return False
+
+    def heartbeat(self):
+        if not self.owned():
+            return False
+        os.utime(self.path)
+        return True
+
+    def release(self):
+        if self.owned():
+            os.remove(self.path)
+
+
+# =========================
+# NODE
+# =========================
+def _render_leased(queue_dir, handler, settings, item, lease, workers, job):
+    """
+    Render one leased item, heartbeating the lease meanwhile. Returns
+    False when the lease was lost and the item abandoned.
+    """
+    item_job = RenderJob(job.budget)
+    temp_path = item_job.track(f"{item['output']}.{lease.node}.partial.mp4")
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(HEARTBEAT_SECONDS):
+            if not lease.heartbeat():
+                print("Lease lost, abandoning item", item["id"])
+                item_job.cancel()
+                return
+
+    heartbeat = threading.Thread(target=beat, daemon=True)
+    heartbeat.start()
+    start = time.time()
+    try:
+        with job.cancel_hook(item_job.cancel), item_job.measure():
+            handler.render_farm_item(settings, item, temp_path, item_job, workers)
+        write_json_atomic(os.path.join(queue_dir, "done", item["id"] + ".json"), {
+            "node": lease.node,
+            "output": item["output"],
+            "seconds": time.time() - start,
+            "peak_rss_bytes": item_job.peak_rss_bytes,
+        })
+        return True
+    except RenderCancelled:
+        job.check()
+        return False
+    except Exception as e:
+        print("ERROR:", e)
+        write_json_atomic(os.path.join(queue_dir, "failed", item["id"] + ".json"), {
+            "node": lease.node,
+            "error": f"{type(e).__name__}: {e}",
+        })
+        return True
+    finally:
+        stop.set()
+        heartbeat.join()
+        item_job.cleanup()
+
+
+def run_node(queue_dir, workers=1, node=None, job=None):
+    """
+    Claim and render items until every item is done or failed. Returns the
+    number of items this node finished.
+    """
+    job = job or RenderJob()
+    node = node or node_name()
+    queue = load_queue(queue_dir)
+    handler = importlib.import_module(queue["module"])
+    finished = 0
+
+    while True:
+        job.check()
+        pending = [
+            item for item in queue["items"]
+            if item_state(queue_dir, item["id"]) not in ("done", "failed")
+        ]
+        if not pending:
+            return finished
+
+        claimed = False
+        for item in pending:
+            if item_state(queue_dir, item["id"]) in ("done", "failed"):
+                continue
+            lease = Lease(queue_dir, item["id"], node)
+            if not lease.acquire():
+                continue
+
+            claimed = True
+            try:
+                # another node may have finished it between the scan and the claim
+                if item_state(queue_dir, item["id"]) == "leased":
+                    print(f"[{node}] rendering item {item['id']}")
+                    if _render_leased(queue_dir, handler, queue["settings"], item, lease, workers, job):
+                        finished += 1
+            finally:
+                lease.release()
+            break
+
+        if not claimed:
+            # everything left is leased by other nodes; wait for them to
+            # finish or for their leases to expire
+            time.sleep(POLL_SECONDS)
+
+
+def _node_process(queue_dir, workers, budget):
+    try:
+        count = run_node(queue_dir, workers, job=RenderJob(budget))
+        print(f"[{node_name()}] finished {count} item(s)")
+    except KeyboardInterrupt:
+        pass
+
+
+def run_local(queue_dir, nodes, workers=1):
+    """
+    Stand-in farm: `nodes` processes on this machine, each behaving like a
+    separate render node on the shared queue, with an equal share of the
+    memory budget.
+    """
+    context = multiprocessing.get_context("spawn")
+    budget = MemoryBudget.from_env().share(nodes)
+    procs = [context.Process(target=_node_process, args=(queue_dir, workers, budget)) for _ in range(nodes)]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+
+
+def queue_status(queue_dir):
+    counts = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+    for item in load_queue(queue_dir)["items"]:
+        counts[item_state(queue_dir, item["id"])] += 1
+    return counts
+
+
+# =========================
+# CLI
+# =========================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("node", help="render items from a queue until it is empty")
+    p.add_argument("queue_dir")
+    p.add_argument("--workers", type=int, default=1, help="frame producers per item")
+
+    p = commands.add_parser("local", help="run several nodes on this machine")
+    p.add_argument("queue_dir")
+    p.add_argument("--nodes", type=int, default=os.cpu_count() or 1)
+    p.add_argument("--workers", type=int, default=1)
+
+    p = commands.add_parser("status", help="count items by state")
+    p.add_argument("queue_dir")
+
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "node":
+            print(f"Finished {run_node(args.queue_dir, args.workers)} item(s)")
+        elif args.command == "local":
+            run_local(args.queue_dir, args.nodes, args.workers)
+        elif args.command == "status":
+            print(json.dumps(queue_status(args.queue_dir), indent=2))
+    except (OSError, ValueError) as e:
+        print("ERROR:", e)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""
+Cooperative cancellation for render jobs started from the GUIs.
+
+A RenderJob is created per export and passed down the render path. Frame
+loops call `job.check()`, which raises RenderCancelled once Cancel has been
+clicked; blocking work (ffmpeg children, process pools) registers a
+`cancel_hook` so it is terminated immediately instead of at the next check.
+Temp files and partial outputs are registered with `job.track(path)` and
+removed when the job ends, so a cancelled or failed export leaves nothing
+behind. Paths tracked as resumable (segment work dirs) survive a crash so
+the next run can resume, and are only removed on cancel.
+
+Each job also carries a MemoryBudget (memory_budget.py) that the render
+paths size their workers and buffers to, and records the peak resident
+memory of the job's processes while it runs.
+"""
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+
+from memory_budget import MemoryBudget, MemoryMonitor
+
+
+class RenderCancelled(Exception):
+    pass
+
+
+class RenderJob:
+    """
+        job = RenderJob()
+        threading.Thread(target=job.run, args=(self.export_video, self.cancelled)).start()
+        ...
+        job.cancel()   # from the Cancel button
+    """
+
+    def __init__(self, budget=None):
+        self.budget = budget or MemoryBudget.from_env()
+        self.peak_rss_bytes = None
+        self._monitor = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._hooks = {}
+        self._next_hook = 0
+        self._paths = {}
+
+    # -------------------------
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+        with self._lock:
+            hooks = list(self._hooks.values())
+        for hook in hooks:
+            try:
+                hook()
+            except Exception as e:
+                print("Cancel hook failed:", e)
+
+    def check(self):
+        if self._cancel.is_set():
+            raise RenderCancelled()
+
+    @contextmanager
+    def cancel_hook(self, callback):
+        """
+        Call `callback` if the job is cancelled while the block runs (or
+        right away if it already is).
+        """
+        with self._lock:
+            hook_id = self._next_hook
+            self._next_hook += 1
+            self._hooks[hook_id] = callback
+
+        if self.cancelled:
+            callback()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._hooks.pop(hook_id, None)
+
+    # -------------------------
+    def track(self, path, resumable=False):
+        """
+        Remove `path` (file or dir) when the job ends unless it is released
+        first. Returns the path.
+        """
+        self._paths[path] = resumable
+        return path
+
+    def release(self, path):
+        self._paths.pop(path, None)
+
+    def cleanup(self):
+        for path, resumable in list(self._paths.items()):
+            if resumable and not self.cancelled:
+                continue
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            elif os.path.exists(path):
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    print("Cleanup failed:", path, e)
+            self._paths.pop(path, None)
+
+    # -------------------------
+    def start_measuring(self):
+        """
+        Start recording the peak resident memory of this process and its
+        children (workers, ffmpeg). GUI exports call this once their file
+        dialogs have closed, so the peak covers the render only.
+        """
+        if self._monitor is None:
+            self._monitor = MemoryMonitor().start()
+
+    def stop_measuring(self):
+        """
+        Stop recording; returns the peak, also kept in `peak_rss_bytes`.
+        """
+        if self._monitor is not None:
+            self.peak_rss_bytes = self._monitor.stop()
+            self._monitor = None
+        return self.peak_rss_bytes
+
+    @contextmanager
+    def measure(self):
+        """
+        Record the peak resident memory while the block runs.
+        """
+        self.start_measuring()
+        try:
+            yield
+        finally:
+            self.stop_measuring()
+
+    def run(self, target, on_cancelled=None):
+        """
+        Thread entry point: `target(job)`, then cleanup. A cancellation ends
+        quietly with `on_cancelled()`; other errors still propagate.
+        """
+        try:
+            target(self)
+        except RenderCancelled:
+            if on_cancelled:
+                on_cancelled()
+        finally:
+            self.stop_measuring()
+            self.cleanup()
@@ -0,0 +1,69 @@
+"""
+Final vs draft render settings shared by the exporters.
+
+A draft runs the same timeline at half resolution and half frame rate with
+x264's fastest preset, which is enough to check pacing and captions at
+roughly a tenth of the final render time. Exporters ask the mode for their
+output size, frame rate and writer settings, and pass `mode.scale` to the
+caption drawing so text, bars and animation offsets shrink with the frame.
+Exporters build their Renderer with `index_step=mode.fps_divisor`, so
+animated captions see full-rate frame numbers and move at the same speed
+whatever the frame rate.
+"""
+
+MACRO_BLOCK = 16  # codec-friendly frame dimensions
+
+DRAFT_SCALE = 0.5
+DRAFT_FPS_DIVISOR = 2
+DRAFT_CRF = 30
+
+
+class RenderMode:
+    def __init__(self, name, scale=1.0, fps_divisor=1, x264_preset=None, crf=None):
+        self.name = name
+        self.scale = scale
+        self.fps_divisor = fps_divisor
+        self.x264_preset = x264_preset
+        self.crf = crf
+
+    def __repr__(self):
+        return f"RenderMode({self.name!r})"
+
+    @property
+    def is_draft(self):
+        return self.scale != 1.0 or self.fps_divisor != 1
+
+    def size(self, width, height):
+        """
+        Output size for a final size of width x height, rounded to whole
+        macro blocks so the encoder does not pad it again.
+        """
+        if self.scale == 1.0:
+            return width, height
+
+        def snap(n):
+            return max(MACRO_BLOCK, int(round(n * self.scale / MACRO_BLOCK)) * MACRO_BLOCK)
+
+        return snap(width), snap(height)
+
+    def fps(self, fps):
+        return max(1, fps // self.fps_divisor)
+
+    def writer_kwargs(self, final=None):
+        """
+        imageio writer settings: the exporter's own `final` settings, with
+        the fast preset and a high CRF on top for drafts.
+        """
+        kwargs = dict(final or {})
+        if self.x264_preset:
+            kwargs.pop("quality", None)
+            kwargs["codec"] = "libx264"
+            kwargs["ffmpeg_params"] = ["-preset", self.x264_preset, "-crf", str(self.crf)]
+        return kwargs
+
+    def fingerprint(self):
+        return [self.name, self.scale, self.fps_divisor, self.x264_preset, self.crf]
+
+
+FINAL = RenderMode("final")
+DRAFT = RenderMode("draft", DRAFT_SCALE, DRAFT_FPS_DIVISOR, "ultrafast", DRAFT_CRF)
@@ -0,0 +1,178 @@
+"""
+Opt-in per-stage render profiling for the exporters.
+
+Set SHORTS_PROFILE=1 to record wall time, CPU time, call counts and peak
+traced memory per render stage, written as `<output>.profile.json` next to
+each exported video. Set SHORTS_PROFILE=cprofile to also run every stage
+under cProfile and dump the stats of the slowest stage to
+`<output>.<stage>.prof` (open with `python -m pstats`).
+
+When profiling is off, `stage()` returns a shared no-op context manager so
+the instrumented frame loops cost nothing extra.
+"""
+import contextlib
+import cProfile
+import json
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+
+PROFILE_ENV = "SHORTS_PROFILE"
+
+_NULL_STAGE = contextlib.nullcontext()
+
+
+def max_rss_bytes():
+    """
+    Peak resident set size of this process, or None where `resource` is
+    unavailable (Windows).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+class _StageStats:
+    __slots__ = ("calls", "wall_s", "cpu_s", "child_cpu_s", "peak_bytes", "profile")
+
+    def __init__(self, use_cprofile):
+        self.calls = 0
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+        self.child_cpu_s = 0.0
+        self.peak_bytes = 0
+        self.profile = cProfile.Profile() if use_cprofile else None
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "wall_s": round(self.wall_s, 6),
+            "cpu_s": round(self.cpu_s, 6),
+            "child_cpu_s": round(self.child_cpu_s, 6),
+            "peak_traced_bytes": self.peak_bytes,
+        }
+
+
+def _child_cpu():
+    t = os.times()
+    return t.children_user + t.children_system
+
+
+class RenderProfiler:
+    """
+    Collects per-stage timings for one render. Stages may nest; each stage
+    accumulates across all of its calls.
+
+        profiler = RenderProfiler.from_env()
+        with profiler.stage("effects"):
+            ...
+        profiler.write(save_path)
+    """
+
+    def __init__(self, enabled=False, use_cprofile=False):
+        self.enabled = enabled
+        self.use_cprofile = enabled and use_cprofile
+        self.stages = {}
+        self._stack = []
+        self._started = time.perf_counter()
+        self._owns_tracemalloc = False
+
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracemalloc = True
+
+    @classmethod
+    def from_env(cls):
+        mode = os.environ.get(PROFILE_ENV, "").strip().lower()
+        if mode in ("", "0", "off", "false", "no"):
+            return cls(enabled=False)
+        return cls(enabled=True, use_cprofile=(mode == "cprofile"))
+
+    # -------------------------
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL_STAGE
+        return self._measure(name)
+
+    def _bump_peaks(self):
+        peak = tracemalloc.get_traced_memory()[1]
+        for stats in self._stack:
+            stats.peak_bytes = max(stats.peak_bytes, peak)
+        return peak
+
+    @contextlib.contextmanager
+    def _measure(self, name):
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = _StageStats(self.use_cprofile)
+
+        # only one cProfile can be active at a time: pause the enclosing stage
+        outer = self._stack[-1] if self._stack else None
+        if outer is not None and outer.profile is not None:
+            outer.profile.disable()
+
+        self._bump_peaks()
+        tracemalloc.reset_peak()
+        self._stack.append(stats)
+
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        child = _child_cpu()
+        if stats.profile is not None:
+            stats.profile.enable()
+        try:
+            yield
+        finally:
+            if stats.profile is not None:
+                stats.profile.disable()
+            stats.calls += 1
+            stats.wall_s += time.perf_counter() - wall
+            stats.cpu_s += time.process_time() - cpu
+            stats.child_cpu_s += _child_cpu() - child
+
+            self._bump_peaks()
+            self._stack.pop()
+            if outer is not None and outer.profile is not None:
+                outer.profile.enable()
+
+    # -------------------------
+    def report(self):
+        return {
+            "total_wall_s": round(time.perf_counter() - self._started, 6),
+            "stages": {name: s.as_dict() for name, s in self.stages.items()},
+            "max_rss_bytes": max_rss_bytes(),
+        }
+
+    def write(self, output_path):
+        """
+        Write `<output_path>.profile.json` (and the slowest stage's cProfile
+        dump when enabled). Returns the JSON path, or None when disabled.
+        """
+        if not self.enabled:
+            return None
+
+        report = self.report()
+        report["output"] = os.path.abspath(output_path)
+
+        if self.use_cprofile and self.stages:
+            slowest = max(self.stages, key=lambda n: self.stages[n].wall_s)
+            prof_path = f"{output_path}.{slowest}.prof"
+            pstats.Stats(self.stages[slowest].profile).dump_stats(prof_path)
+            report["cprofile"] = {"stage": slowest, "stats": os.path.abspath(prof_path)}
+
+        json_path = output_path + ".profile.json"
+        with open(json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+            self._owns_tracemalloc = False
+
+        return json_path
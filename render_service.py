@@ -0,0 +1,524 @@
+"""
+Local render service: one long-running process that renders exports for
+every GUI and script on the machine.
+
+Each GUI used to start cold (importing moviepy/cv2/imageio and spawning its
+own encoders), and two GUIs exporting at once fought over the same cores.
+The service keeps one warm worker process per core, with the render modules
+already imported, and feeds them from a single priority queue, so exports
+from every operator share the machine without oversubscribing it.
+
+Clients talk to it over localhost HTTP with JSON:
+
+    POST /jobs               submit {"kind", "image", "output", ...} -> {"id"}
+    GET  /jobs               all jobs, newest first
+    GET  /jobs/<id>          one job's state and progress
+    POST /jobs/<id>/cancel   cancel a queued or running job
+
+POSTs must be sent as Content-Type: application/json, which a web page can
+only do after a CORS preflight this server never answers, so a page open
+in a browser cannot queue renders or overwrite files. Outputs must be .mp4
+files.
+
+A job's "kind" names the script that renders it (see RENDER_KINDS); the
+script's `service_render(spec, progress, job)` does the work. Higher
+"priority" runs first, FIFO within a priority.
+
+Each job has a memory budget ("memory_budget", e.g. "2G"; by default the
+service's memory split evenly between its workers) that its render is
+sized to. A job only starts while the budgets of the running jobs leave
+room for it, so a queue of heavy jobs waits instead of being OOM-killed;
+finished jobs report their peak resident memory ("peak_rss_bytes").
+
+Usage:
+    python render_service.py serve [--workers N] [--port 8765] [--memory 12G]
+    python render_service.py submit 60_seconds --image in.jpg --output out.mp4 [--draft]
+    python render_service.py status [JOB_ID]
+    python render_service.py cancel JOB_ID
+"""
+import argparse
+import heapq
+import importlib
+import itertools
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+import traceback
+import urllib.error
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from memory_budget import MemoryBudget, format_bytes, parse_bytes, physical_memory
+from render_jobs import RenderCancelled, RenderJob
+
+SERVICE_ENV = "SHORTS_RENDER_SERVICE"
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8765
+SERVICE_WORKERS = os.cpu_count() or 1  # one single-threaded render per core
+SERVICE_MEMORY_FRACTION = 0.8  # of physical RAM shared by the running jobs, unless --memory is given
+POLL_SECONDS = 0.5
+
+# job kind -> module whose service_render(spec, progress, job) renders it
+RENDER_KINDS = {
+    "60_seconds": "60_seconds",
+    "music_vid_60": "music_vid_60",
+}
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+def service_url():
+    return os.environ.get(SERVICE_ENV) or f"http://{SERVICE_HOST}:{SERVICE_PORT}"
+
+
+# =========================
+# WORKER PROCESSES
+# =========================
+def _worker_main(tasks, events, cancel_flag):
+    """
+    Warm worker: imports every render module once, then runs jobs until it
+    receives None. Cancellation arrives through `cancel_flag` and is turned
+    into the usual RenderJob cancel inside the worker.
+    """
+    for module in RENDER_KINDS.values():
+        importlib.import_module(module)
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+
+        job_id, spec, budget = task
+        job = RenderJob(MemoryBudget(budget))
+        finished = threading.Event()
+
+        def watch_cancel():
+            while not finished.is_set():
+                if cancel_flag.wait(POLL_SECONDS):
+                    job.cancel()
+                    return
+
+        threading.Thread(target=watch_cancel, daemon=True).start()
+
+        def progress(done, count):
+            events.put(("progress", job_id, done, count))
+
+        try:
+            with job.measure():
+                module = importlib.import_module(RENDER_KINDS[spec["kind"]])
+                module.service_render(spec, progress, job)
+            events.put((DONE, job_id, None, job.peak_rss_bytes))
+        except RenderCancelled:
+            events.put((CANCELLED, job_id, None, job.peak_rss_bytes))
+        except Exception as e:
+            traceback.print_exc()
+            events.put((FAILED, job_id, f"{type(e).__name__}: {e}", job.peak_rss_bytes))
+        finally:
+            finished.set()
+            job.cleanup()
+
+
+class _Worker:
+    def __init__(self, context, events):
+        self.tasks = context.Queue()
+        self.cancel_flag = context.Event()
+        self.job_id = None
+        self.proc = context.Process(
+            target=_worker_main, args=(self.tasks, events, self.cancel_flag), daemon=True,
+        )
+        self.proc.start()
+
+
+# =========================
+# SCHEDULER
+# =========================
+class RenderService:
+    """
+    Priority queue of jobs in front of a fixed pool of warm workers. At
+    most one job runs per worker, and the running jobs' memory budgets
+    add up to at most `memory` bytes (a job bigger than that runs alone).
+    """
+
+    def __init__(self, workers=SERVICE_WORKERS, memory=None):
+        ram = physical_memory()
+        self.memory = memory or (int(ram * SERVICE_MEMORY_FRACTION) if ram else None)
+        self.job_budget = self.memory // max(1, workers) if self.memory else None
+        self._context = multiprocessing.get_context("spawn")
+        self._events = self._context.Queue()
+        self._lock = threading.Condition()
+        self._queue = []  # (-priority, seq, job_id)
+        self._seq = itertools.count()
+        self._jobs = {}
+        self._workers = [_Worker(self._context, self._events) for _ in range(max(1, workers))]
+        self._stopping = False
+
+        threading.Thread(target=self._dispatch, daemon=True).start()
+        threading.Thread(target=self._collect, daemon=True).start()
+
+    # -------------------------
+    def submit(self, spec):
+        kind = spec.get("kind")
+        if kind not in RENDER_KINDS:
+            raise ValueError(f"unknown job kind {kind!r} (expected one of {sorted(RENDER_KINDS)})")
+        for field in ("image", "output"):
+            if not spec.get(field):
+                raise ValueError(f"missing {field!r}")
+        if not str(spec["output"]).lower().endswith(".mp4"):
+            raise ValueError(f"output must be an .mp4 file, not {spec['output']!r}")
+
+        job_id = uuid.uuid4().hex[:12]
+        priority = int(spec.get("priority", 0))
+        budget = parse_bytes(spec["memory_budget"]) if spec.get("memory_budget") else self.job_budget
+        with self._lock:
+            self._jobs[job_id] = {
+                "id": job_id,
+                "kind": kind,
+                "priority": priority,
+                "output": spec["output"],
+                "state": QUEUED,
+                "progress": 0.0,
+                "error": None,
+                "memory_budget": budget,
+                "peak_rss_bytes": None,
+                "submitted": time.time(),
+                "started": None,
+                "finished": None,
+                "spec": spec,
+            }
+            heapq.heappush(self._queue, (-priority, next(self._seq), job_id))
+            self._lock.notify_all()
+        return job_id
+
+    def status(self, job_id=None):
+        with self._lock:
+            if job_id is not None:
+                job = self._jobs.get(job_id)
+                return self._public(job) if job else None
+            jobs = sorted(self._jobs.values(), key=lambda j: j["submitted"], reverse=True)
+            return [self._public(job) for job in jobs]
+
+    def cancel(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job["state"] == QUEUED:
+                self._finish(job, CANCELLED)
+            elif job["state"] == RUNNING:
+                for worker in self._workers:
+                    if worker.job_id == job_id:
+                        worker.cancel_flag.set()
+            return self._public(job)
+
+    def stop(self):
+        with self._lock:
+            self._stopping = True
+            self._lock.notify_all()
+        for worker in self._workers:
+            worker.cancel_flag.set()
+            worker.tasks.put(None)
+        for worker in self._workers:
+            worker.proc.join(timeout=5)
+            if worker.proc.is_alive():
+                worker.proc.terminate()
+
+    # -------------------------
+    @staticmethod
+    def _public(job):
+        return {k: v for k, v in job.items() if k != "spec"}
+
+    def _finish(self, job, state, error=None):
+        job["state"] = state
+        job["error"] = error
+        job["finished"] = time.time()
+        if state == DONE:
+            job["progress"] = 1.0
+
+    def _next_job(self):
+        """
+        The highest-priority job that is still queued, left at the top of
+        the heap (cancelled jobs stay in the heap until they surface).
+        """
+        while self._queue:
+            job = self._jobs[self._queue[0][2]]
+            if job["state"] == QUEUED:
+                return job
+            heapq.heappop(self._queue)
+        return None
+
+    def _fits(self, job):
+        """
+        True when `job` may start next to the running jobs within the
+        service's memory. Queued jobs wait for it in priority order.
+        """
+        running = [j["memory_budget"] or 0 for j in self._jobs.values() if j["state"] == RUNNING]
+        if not running or self.memory is None or job["memory_budget"] is None:
+            return True
+        return sum(running) + job["memory_budget"] <= self.memory
+
+    def _dispatch(self):
+        with self._lock:
+            while not self._stopping:
+                idle = [w for w in self._workers if w.job_id is None and w.proc.is_alive()]
+                job = self._next_job() if idle else None
+                if job is None or not self._fits(job):
+                    self._lock.wait()
+                    continue
+
+                heapq.heappop(self._queue)
+                worker = idle[0]
+                worker.job_id = job["id"]
+                job["state"] = RUNNING
+                job["started"] = time.time()
+                worker.tasks.put((job["id"], job["spec"], job["memory_budget"]))
+
+    def _collect(self):
+        while not self._stopping:
+            try:
+                event = self._events.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                self._reap_dead_workers()
+                continue
+
+            with self._lock:
+                job = self._jobs.get(event[1])
+                if event[0] == "progress":
+                    done, count = event[2], event[3]
+                    if job and job["state"] == RUNNING:
+                        job["progress"] = done / count if count else 0.0
+                    continue
+
+                if job:
+                    self._finish(job, event[0], event[2])
+                    job["peak_rss_bytes"] = event[3]
+                for worker in self._workers:
+                    if worker.job_id == event[1]:
+                        worker.cancel_flag.clear()
+                        worker.job_id = None
+                self._lock.notify_all()
+
+    def _reap_dead_workers(self):
+        """
+        A worker that crashed (e.g. killed by the OOM killer) fails its job
+        and is replaced by a fresh one.
+        """
+        with self._lock:
+            if self._stopping:
+                return
+            for i, worker in enumerate(self._workers):
+                if worker.proc.is_alive():
+                    continue
+                job = self._jobs.get(worker.job_id)
+                if job and job["state"] == RUNNING:
+                    self._finish(job, FAILED, f"worker exited with code {worker.proc.exitcode}")
+                self._workers[i] = _Worker(self._context, self._events)
+            self._lock.notify_all()
+
+
+# =========================
+# HTTP API
+# =========================
+class _Handler(BaseHTTPRequestHandler):
+    service = None
+
+    def _reply(self, code, body):
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _parts(self):
+        return [p for p in self.path.split("?")[0].split("/") if p]
+
+    def do_GET(self):
+        parts = self._parts()
+        if parts == ["jobs"]:
+            self._reply(200, self.service.status())
+        elif len(parts) == 2 and parts[0] == "jobs":
+            job = self.service.status(parts[1])
+            self._reply(200, job) if job else self._reply(404, {"error": "no such job"})
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        # browsers may send text/plain or form POSTs to localhost from any
+        # page without asking; a JSON body needs a CORS preflight, which
+        # this server never grants
+        content_type = self.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if content_type != "application/json":
+            self._reply(415, {"error": "expected Content-Type: application/json"})
+            return
+
+        parts = self._parts()
+        if parts == ["jobs"]:
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                spec = json.loads(self.rfile.read(length) or b"{}")
+                self._reply(202, {"id": self.service.submit(spec)})
+            except (ValueError, TypeError) as e:
+                self._reply(400, {"error": str(e)})
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "cancel":
+            job = self.service.cancel(parts[1])
+            self._reply(200, job) if job else self._reply(404, {"error": "no such job"})
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host=SERVICE_HOST, port=SERVICE_PORT, workers=SERVICE_WORKERS, memory=None):
+    service = RenderService(workers, memory)
+    handler = type("Handler", (_Handler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    print(
+        f"Render service on http://{host}:{port} with {workers} worker(s),"
+        f" {format_bytes(service.memory)} for running jobs"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+
+
+# =========================
+# CLIENT
+# =========================
+class RenderServiceClient:
+    def __init__(self, url=None, timeout=5):
+        self.url = (url or service_url()).rstrip("/")
+        self.timeout = timeout
+
+    def _call(self, method, path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(
+            self.url + path, data=data, method=method, headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            raise RuntimeError(json.loads(e.read()).get("error", str(e))) from None
+
+    def available(self):
+        try:
+            self._call("GET", "/jobs")
+            return True
+        except (OSError, RuntimeError):
+            return False
+
+    def submit(self, spec):
+        return self._call("POST", "/jobs", spec)["id"]
+
+    def status(self, job_id=None):
+        return self._call("GET", f"/jobs/{job_id}" if job_id else "/jobs")
+
+    def cancel(self, job_id):
+        return self._call("POST", f"/jobs/{job_id}/cancel", {})
+
+    def run(self, spec, progress=None, job=None):
+        """
+        Submit `spec` and wait for it, reporting progress as (done, 100).
+        Cancelling `job` cancels the remote job; a failed job raises
+        RuntimeError with the service's error.
+        """
+        job_id = self.submit(spec)
+        while True:
+            if job and job.cancelled:
+                self.cancel(job_id)
+            state = self.status(job_id)
+            if progress:
+                progress(int(state["progress"] * 100), 100)
+            if state["state"] == DONE:
+                return state
+            if state["state"] == CANCELLED:
+                raise RenderCancelled()
+            if state["state"] == FAILED:
+                raise RuntimeError(state["error"])
+            time.sleep(POLL_SECONDS)
+
+
+# =========================
+# CLI
+# =========================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("serve", help="run the render service")
+    p.add_argument("--host", default=SERVICE_HOST)
+    p.add_argument("--port", type=int, default=SERVICE_PORT)
+    p.add_argument("--workers", type=int, default=SERVICE_WORKERS)
+    p.add_argument("--memory", type=parse_bytes, help="memory shared by the running jobs, e.g. 12G")
+
+    p = commands.add_parser("submit", help="queue a render and wait for it")
+    p.add_argument("kind", choices=sorted(RENDER_KINDS))
+    p.add_argument("--image", required=True)
+    p.add_argument("--output", required=True)
+    p.add_argument("--audio")
+    p.add_argument("--lut", action="append", default=[], help=".cube look (repeatable)")
+    p.add_argument("--draft", action="store_true")
+    p.add_argument("--caption", default="")
+    p.add_argument("--all-formats", action="store_true", help="music_vid_60: 9:16, 1:1 and 4:5 from one render")
+    p.add_argument("--priority", type=int, default=0)
+    p.add_argument("--memory-budget", help="memory budget of this job, e.g. 2G")
+    p.add_argument("--no-wait", action="store_true")
+
+    p = commands.add_parser("status", help="show one job or all jobs")
+    p.add_argument("job_id", nargs="?")
+
+    p = commands.add_parser("cancel", help="cancel a job")
+    p.add_argument("job_id")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        serve(args.host, args.port, args.workers, args.memory)
+        return 0
+
+    client = RenderServiceClient()
+    try:
+        if args.command == "submit":
+            spec = {
+                "kind": args.kind,
+                "image": os.path.abspath(args.image),
+                "output": os.path.abspath(args.output),
+                "audio": os.path.abspath(args.audio) if args.audio else None,
+                "luts": [os.path.abspath(p) for p in args.lut],
+                "draft": args.draft,
+                "caption": args.caption,
+                "formats": args.all_formats,
+                "priority": args.priority,
+                "memory_budget": args.memory_budget,
+            }
+            if args.no_wait:
+                print(client.submit(spec))
+            else:
+                client.run(spec, lambda done, count: print(f"\r{done:3d}%", end="", flush=True))
+                print("\n✅", spec["output"])
+        elif args.command == "status":
+            print(json.dumps(client.status(args.job_id), indent=2))
+        elif args.command == "cancel":
+            print(json.dumps(client.cancel(args.job_id), indent=2))
+    except (OSError, RuntimeError) as e:
+        print("ERROR:", e)
+        return 1
+    except RenderCancelled:
+        print("\nCancelled ⛔")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
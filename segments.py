@@ -0,0 +1,238 @@
+"""
+Checkpointed, resumable rendering in independently encoded segments.
+
+A long render is split into segments (one per effect transition, or one per
+slideshow image). Each segment is encoded to its own MP4 in a work dir next
+to the output, written under a `.partial` name and renamed when complete,
+and recorded in a small `manifest.json`. If the render crashes or is killed,
+re-running it with the same fingerprint finds the finished segments and
+renders only the missing ones. The segments are then joined with the
+concat demuxer and stream copy, so nothing is re-encoded.
+
+Because every segment is a self-contained chunk that starts on an IDR frame
+(x264 GOPs are closed by default), segments can also be rendered out of
+order on a process pool with `render_parallel`, so one video's latency
+scales with the number of cores.
+"""
+import json
+import multiprocessing
+import os
+import shutil
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from ffmpeg_tools import concat_copy
+from lazy_imports import lazy_import
+from memory_budget import ENCODER_BYTES, WORKER_BYTES
+from render_jobs import RenderCancelled
+from render_profile import RenderProfiler
+
+imageio = lazy_import("imageio")
+
+MANIFEST = "manifest.json"
+
+# state handed to each pool worker once, instead of once per segment
+_worker_job = None
+_worker_frames = None
+_worker_cancel = None
+
+
+class _CancelEvent:
+    """
+    The `job` of a pool worker: cancelled through a multiprocessing Event
+    the parent sets.
+    """
+
+    def __init__(self, event):
+        self.event = event
+
+    def check(self):
+        if self.event.is_set():
+            raise RenderCancelled()
+
+
+def _init_worker(job, frames_for_segment, cancel):
+    global _worker_job, _worker_frames, _worker_cancel
+    _worker_job = job
+    _worker_frames = frames_for_segment
+    _worker_cancel = _CancelEvent(cancel)
+
+
+def _render_in_worker(index):
+    _worker_cancel.check()
+    _worker_job.encode_segment(index, _worker_frames(index), job=_worker_cancel)
+    return index
+
+
+class SegmentedRender:
+    """
+        job = SegmentedRender(save_path + ".parts", fingerprint, fps)
+        job.render(count, frames_for_segment, progress)
+        job.join(save_path)
+        job.cleanup()
+
+    `fingerprint` must change whenever the frames would (source image,
+    effects, captions, settings); a work dir with a different fingerprint is
+    discarded rather than resumed.
+    """
+
+    def __init__(self, work_dir, fingerprint, fps, writer_kwargs=None):
+        self.work_dir = work_dir
+        self.fingerprint = fingerprint
+        self.fps = fps
+        self.writer_kwargs = writer_kwargs or {}
+        self.done = set()
+        self.count = 0
+
+    # -------------------------
+    def segment_path(self, index):
+        return os.path.join(self.work_dir, f"seg_{index:05d}.mp4")
+
+    def _manifest_path(self):
+        return os.path.join(self.work_dir, MANIFEST)
+
+    def _load_manifest(self, count):
+        try:
+            with open(self._manifest_path()) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return set()
+
+        if manifest.get("fingerprint") != self.fingerprint or manifest.get("count") != count:
+            return set()
+
+        return {i for i in manifest.get("done", []) if os.path.exists(self.segment_path(i))}
+
+    def _save_manifest(self):
+        manifest = {
+            "fingerprint": self.fingerprint,
+            "fps": self.fps,
+            "count": self.count,
+            "done": sorted(self.done),
+        }
+        tmp = self._manifest_path() + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, self._manifest_path())
+
+    # -------------------------
+    def prepare(self, count):
+        """
+        Resume or reset the work dir for `count` segments. Returns the
+        indices still to render.
+        """
+        self.count = count
+        self.done = self._load_manifest(count)
+        if not self.done and os.path.isdir(self.work_dir):
+            shutil.rmtree(self.work_dir)
+
+        os.makedirs(self.work_dir, exist_ok=True)
+        self._save_manifest()
+        return [i for i in range(count) if i not in self.done]
+
+    def write_segment(self, index, frames, profiler=None, job=None):
+        """
+        Encode one segment's frames and mark it complete.
+        """
+        self.encode_segment(index, frames, profiler, job)
+        self.mark_done(index)
+
+    def encode_segment(self, index, frames, profiler=None, job=None):
+        """
+        Encode one segment to its final name without touching the manifest
+        (safe to call from pool workers). A cancelled `job` stops it between
+        frames and the partial file is removed.
+        """
+        profiler = profiler or RenderProfiler()
+        final = self.segment_path(index)
+        partial = final + ".partial.mp4"
+
+        writer = imageio.get_writer(partial, fps=self.fps, **self.writer_kwargs)
+        try:
+            for frame in frames:
+                if job:
+                    job.check()
+                with profiler.stage("encode"):
+                    writer.append_data(frame)
+        except BaseException:
+            writer.close()
+            os.remove(partial)
+            raise
+        with profiler.stage("encode_flush"):
+            writer.close()
+
+        os.replace(partial, final)
+
+    def mark_done(self, index):
+        self.done.add(index)
+        self._save_manifest()
+
+    def render(self, count, frames_for_segment, progress=None, profiler=None, job=None):
+        """
+        Render every missing segment in order. `frames_for_segment(i)`
+        returns an iterable of frames; `progress(done, count)` is called
+        after each segment, including the ones resumed from disk.
+        """
+        todo = self.prepare(count)
+        if progress and self.done:
+            progress(len(self.done), count)
+
+        for index in todo:
+            if job:
+                job.check()
+            self.write_segment(index, frames_for_segment(index), profiler, job)
+            if progress:
+                progress(len(self.done), count)
+
+    def render_parallel(self, count, frames_for_segment, workers, progress=None, job=None):
+        """
+        Like `render`, but spreads the missing segments over `workers`
+        processes. `frames_for_segment` must be picklable (a module-level
+        function or a functools.partial of one); it is sent to each worker
+        once. Workers are spawned, not forked, so this is safe to call from
+        a GUI's background thread. The manifest is only written here, in
+        the parent, as segments complete. Each worker encodes its own
+        segment, so the job's memory budget may allow fewer workers.
+        Cancelling `job` stops the workers at their next frame and removes
+        their unfinished `.partial` files.
+        """
+        todo = self.prepare(count)
+        if progress and self.done:
+            progress(len(self.done), count)
+        if not todo:
+            return
+
+        if job:
+            workers = job.budget.workers(workers, WORKER_BYTES + ENCODER_BYTES)
+
+        context = multiprocessing.get_context("spawn")
+        cancel = context.Event()
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(todo)),
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self, frames_for_segment, cancel),
+        ) as pool:
+            pending = {pool.submit(_render_in_worker, index) for index in todo}
+            while pending:
+                finished, pending = wait(pending, timeout=0.25, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    self.mark_done(future.result())
+                    if progress:
+                        progress(len(self.done), count)
+
+                if job and job.cancelled:
+                    cancel.set()
+                    pool.shutdown(cancel_futures=True)
+                    raise RenderCancelled()
+
+    def join(self, output_path, profiler=None):
+        profiler = profiler or RenderProfiler()
+        missing = [i for i in range(self.count) if i not in self.done]
+        if missing:
+            raise RuntimeError(f"cannot join: {len(missing)} segment(s) not rendered")
+
+        with profiler.stage("concat"):
+            concat_copy([self.segment_path(i) for i in range(self.count)], output_path)
+
+    def cleanup(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
@@ -1,25 +1,30 @@
 import tkinter as tk
 from tkinter import filedialog, ttk
 import os
-import math
-from moviepy import VideoFileClip, AudioFileClip, concatenate_videoclips
 import threading
 
+from ffmpeg_tools import remux
+from media_probe import MP4_AUDIO_CODECS, probe_media
+from memory_budget import format_bytes
+from render_jobs import RenderCancelled, RenderJob
+
 
 class AudioReplaceGUI:
     def __init__(self, root):
         self.root = root
         self.root.title("Video Audio Replacer – Loop Video to MP3 Length")
-        self.root.geometry("540x260")
+        self.root.geometry("540x290")
         self.root.resizable(False, False)
 
         self.video_folder = None
         self.audio_path = None
+        self.job = None
 
         # Buttons
         tk.Button(root, text="Select Videos Folder", command=self.select_folder).pack(pady=5)
         tk.Button(root, text="Select MP3 Audio", command=self.select_audio).pack(pady=5)
         tk.Button(root, text="Start Processing", command=self.start_thread).pack(pady=10)
+        tk.Button(root, text="Cancel", command=self.cancel_job).pack()
 
         # Progress + status
         self.progress = ttk.Progressbar(root, length=420)
@@ -52,10 +57,18 @@ class AudioReplaceGUI:
             self.update_ui("MP3 audio selected ✅", None, "green")
 
     def start_thread(self):
-        t = threading.Thread(target=self.process_videos, daemon=True)
+        self.job = RenderJob()
+        t = threading.Thread(target=self.job.run, args=(self.process_videos, self.job_cancelled), daemon=True)
         t.start()
 
-    def process_videos(self):
+    def cancel_job(self):
+        if self.job:
+            self.job.cancel()
+
+    def job_cancelled(self):
+        self.update_ui("Cancelled ⛔", 0, "red")
+
+    def process_videos(self, job):
         if not self.video_folder:
             self.update_ui("Select videos folder first ❌", None, "red")
             return
@@ -68,6 +81,7 @@ class AudioReplaceGUI:
         output_dir = filedialog.askdirectory()
         if not output_dir:
             return
+        job.start_measuring()
 
         # Collect mp4 files
         videos = sorted(
@@ -79,14 +93,15 @@ class AudioReplaceGUI:
             self.update_ui("No .mp4 files found in folder ❌", None, "red")
             return
 
-        # Load audio clip once
+        # Probe the audio once (cached across runs)
         try:
-            base_audio = AudioFileClip(self.audio_path)
-            target_duration = base_audio.duration
-        except Exception as e:
+            audio_info = probe_media(self.audio_path)
+            target_duration = audio_info.duration
+        except (OSError, RuntimeError) as e:
             print("Audio load error:", e)
             self.update_ui("Error loading audio ❌", None, "red")
             return
+        audio_codec = "copy" if audio_info.audio and audio_info.audio["codec"] in MP4_AUDIO_CODECS else "aac"
 
         total_videos = len(videos)
 
@@ -95,6 +110,7 @@ class AudioReplaceGUI:
             out_name = os.path.splitext(filename)[0] + "_with_audio.mp4"
             out_path = os.path.join(output_dir, out_name)
 
+            job.check()
             try:
                 self.update_ui(
                     text=f"Processing {idx}/{total_videos}: {filename}",
@@ -102,46 +118,23 @@ class AudioReplaceGUI:
                     color="orange"
                 )
 
-                # Load video
-                clip = VideoFileClip(video_path)
-
-                # Loop or trim video to match audio length
-                video_duration = clip.duration
-
-                if video_duration >= target_duration:
-                    # Just trim video to audio duration
-                    base_video = clip.subclipped(0, target_duration)
-                else:
-                    # Loop video enough times, then trim
-                    loops = math.ceil(target_duration / video_duration)
-                    clips = [clip] * loops
-                    long_video = concatenate_videoclips(clips)
-                    base_video = long_video.subclipped(0, target_duration)
-
-                # Attach audio (overwrite existing)
-                final_audio = base_audio  # same audio for all videos
-                final_clip = base_video.with_audio(final_audio)
-
-                # Write output
-                final_clip.write_videofile(
-                    out_path,
-                    fps=clip.fps,
-                    codec="libx264",
-                    audio_codec="aac"
+                # Loop or trim the video to the audio length and replace its
+                # audio, copying the video stream instead of re-encoding it
+                loop = probe_media(video_path).duration < target_duration
+                job.track(out_path)
+                remux(
+                    video_path, out_path, self.audio_path, duration=target_duration, loop_video=loop,
+                    audio_codec=audio_codec, job=job,
                 )
+                job.release(out_path)
 
-                # Close clips to free resources
-                clip.close()
-                base_video.close()
-                final_clip.close()
-
+            except RenderCancelled:
+                raise
             except Exception as e:
                 print("Error processing", filename, ":", e)
                 continue
 
-        self.update_ui("✅ All videos processed!", 100, "green")
-        # Close audio at the end
-        base_audio.close()
+        self.update_ui(f"✅ All videos processed! (peak memory {format_bytes(job.stop_measuring())})", 100, "green")
 
 
 if __name__ == "__main__":